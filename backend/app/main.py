@@ -1,11 +1,22 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import pricing, cashflow, roi_clean, roi, tax, debt
+from app.routers import pricing, cashflow, roi, tax, debt, debt_bulk, loans, budget
+from app.services.cache import result_cache
+from app.responses import FastJSONResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Cerrar los procesos del cálculo masivo al apagar o recargar
+    debt_bulk.shutdown_executor()
 
 app = FastAPI(
     title="Calculadoras Financieras API",
     description="API para cálculos financieros avanzados",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -20,10 +31,12 @@ app.add_middleware(
 # Incluir routers
 app.include_router(pricing.router)
 app.include_router(cashflow.router)
-app.include_router(roi_clean.router)
 app.include_router(roi.router)
 app.include_router(tax.router)
 app.include_router(debt.router)
+app.include_router(debt_bulk.router)
+app.include_router(loans.router)
+app.include_router(budget.router)
 
 @app.get("/")
 async def root():
@@ -32,3 +45,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
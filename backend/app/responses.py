@@ -0,0 +1,79 @@
+"""
+Codificación rápida de respuestas.
+
+`FastJSONResponse` serializa con orjson y es la clase de respuesta por
+defecto de la API. `encode_response` recibe el resultado ya validado de
+una calculadora y lo serializa directamente (JSON desde Pydantic, o
+MessagePack si el cliente envía `Accept: application/msgpack`), evitando
+que FastAPI vuelva a validar el modelo y lo pase por `jsonable_encoder`.
+Los resultados por lotes también pueden devolverse como Parquet.
+"""
+from typing import Any, Mapping, Optional
+import io
+import json
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional; sin él siempre se responde JSON
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional; sin él no se sirve Parquet
+    pa = pq = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+
+def _dumps(content: Any) -> bytes:
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
+
+def wants_msgpack(request: Optional[Request]) -> bool:
+    if request is None or msgpack is None:
+        return False
+    return MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def encode_response(result: Any, request: Optional[Request] = None, status_code: int = 200) -> Response:
+    """Serializa un resultado ya validado sin pasar otra vez por su modelo"""
+    if wants_msgpack(request):
+        content = result.model_dump(mode="json") if isinstance(result, BaseModel) else result
+        return Response(content=msgpack.packb(content), status_code=status_code, media_type=MSGPACK_MEDIA_TYPE)
+    return Response(content=_dumps(result), status_code=status_code, media_type="application/json")
+
+
+def wants_parquet(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    return PARQUET_MEDIA_TYPE in request.headers.get("accept", "") or request.query_params.get("format") == "parquet"
+
+
+def parquet_response(columns: Mapping[str, Any], status_code: int = 200) -> Response:
+    """Serializa columnas del mismo largo como un archivo Parquet (NaN se escribe como nulo)"""
+    if pq is None:
+        raise ValueError("La respuesta en Parquet requiere pyarrow")
+    buffer = io.BytesIO()
+    table = pa.table({name: pa.array(values, from_pandas=True) for name, values in columns.items()})
+    pq.write_table(table, buffer)
+    return Response(content=buffer.getvalue(), status_code=status_code, media_type=PARQUET_MEDIA_TYPE)
@@ -0,0 +1,370 @@
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Set
+from collections import OrderedDict
+import heapq
+import threading
+import uuid
+
+from app.services import budget_engine
+from app.services.static_responses import PrecomputedResponse
+from app.responses import encode_response
+
+router = APIRouter(prefix="/budget", tags=["budget"])
+
+class BudgetItem(BaseModel):
+    id: str = Field(..., description="ID único de la partida")
+    name: str = Field(..., description="Concepto")
+    amount: float = Field(..., ge=0, description="Monto mensual (o del mes indicado)")
+    category: str = Field(..., description="Categoría")
+    type: str = Field(..., description="income o expense")
+    is_essential: Optional[bool] = Field(None, description="Para gastos: esencial vs opcional")
+    month: Optional[str] = Field(None, description="Mes YYYY-MM de un movimiento puntual; sin mes la partida se repite cada mes")
+
+class BudgetInput(BaseModel):
+    items: List[BudgetItem] = Field(default_factory=list)
+    horizon_months: int = Field(6, ge=1, le=600, description="Meses de la proyección")
+    start_month: Optional[str] = Field(None, description="Primer mes YYYY-MM de la proyección (por defecto, el primer mes con movimientos)")
+
+class BudgetItemUpdate(BaseModel):
+    id: str = Field(..., description="ID de la partida a editar")
+    name: Optional[str] = None
+    amount: Optional[float] = Field(None, ge=0)
+    category: Optional[str] = None
+    type: Optional[str] = None
+    is_essential: Optional[bool] = None
+    month: Optional[str] = None
+
+class BudgetDiff(BaseModel):
+    base_version: Optional[int] = Field(None, description="Versión sobre la que se calcularon los cambios")
+    add: List[BudgetItem] = Field(default_factory=list, description="Partidas nuevas")
+    update: List[BudgetItemUpdate] = Field(default_factory=list, description="Ediciones parciales")
+    remove: List[str] = Field(default_factory=list, description="IDs de partidas a eliminar")
+
+class BudgetSummary(BaseModel):
+    total_income: float
+    total_expenses: float
+    balance: float
+    savings_rate: float = Field(..., description="Porcentaje de ahorro")
+    expenses_by_category: Dict[str, float]
+    income_by_category: Dict[str, float]
+    essential_expenses: float
+    optional_expenses: float
+    recurring_balance: float = Field(..., description="Saldo mensual de las partidas recurrentes (base de la proyección)")
+
+class BudgetAnalysis(BaseModel):
+    status: str
+    recommendations: List[str]
+    insights: List[str]
+    savings_goal: Optional[float] = None
+    emergency_fund_months: Optional[int] = None
+
+class MonthlyProjectionPoint(BaseModel):
+    month: str
+    balance: float
+    cumulative_balance: float
+
+class BudgetResult(BaseModel):
+    summary: BudgetSummary
+    analysis: BudgetAnalysis
+    monthly_projection: List[MonthlyProjectionPoint]
+
+class BudgetBookResult(BaseModel):
+    budget_id: str
+    version: int
+    result: BudgetResult
+
+class BudgetTotals(BaseModel):
+    total_income: float
+    total_expenses: float
+    balance: float
+    savings_rate: float
+    essential_expenses: float
+    optional_expenses: float
+    recurring_balance: float
+
+class BudgetDiffResult(BaseModel):
+    budget_id: str
+    version: int
+    totals: BudgetTotals
+    expenses_by_category: Dict[str, Optional[float]] = Field(..., description="Categorías de gasto que cambiaron (nulo si ya no existen)")
+    income_by_category: Dict[str, Optional[float]] = Field(..., description="Categorías de ingreso que cambiaron (nulo si ya no existen)")
+    monthly_projection: List[MonthlyProjectionPoint] = Field(..., description="Meses de la proyección que se recalcularon")
+    analysis: BudgetAnalysis
+
+class BudgetCalculator:
+    # Presupuestos guardados en memoria (los menos usados se descartan)
+    MAX_BOOKS = 1000
+
+    @staticmethod
+    def build(input_data: BudgetInput) -> budget_engine.BudgetBook:
+        book = budget_engine.BudgetBook(input_data.horizon_months, input_data.start_month)
+        book.apply_diff(add=[BudgetCalculator._entry(item) for item in input_data.items])
+        return book
+
+    @staticmethod
+    def calculate(input_data: BudgetInput) -> BudgetResult:
+        """Calcula el presupuesto completo con análisis y proyección"""
+        return BudgetCalculator.result(BudgetCalculator.build(input_data))
+
+    @staticmethod
+    def result(book: budget_engine.BudgetBook) -> BudgetResult:
+        summary = BudgetSummary(
+            **BudgetCalculator._totals(book).model_dump(),
+            expenses_by_category={category: cents / 100 for category, cents in book.expenses_by_category.items()},
+            income_by_category={category: cents / 100 for category, cents in book.income_by_category.items()}
+        )
+        return BudgetResult(
+            summary=summary,
+            analysis=BudgetCalculator._generate_analysis(book),
+            monthly_projection=BudgetCalculator._projection(book, 0)
+        )
+
+    @staticmethod
+    def apply_diff(book: budget_engine.BudgetBook, diff: BudgetDiff) -> BudgetDiffResult:
+        """
+        Aplica un lote de cambios en O(cambios) y devuelve solo lo que
+        cambió: totales, categorías tocadas y meses recalculados
+        """
+        touched = book.apply_diff(
+            add=[BudgetCalculator._entry(item) for item in diff.add],
+            update=[(change.id, change.model_dump(exclude_unset=True)) for change in diff.update],
+            remove=diff.remove
+        )
+        first = book.pending_from()
+        return BudgetDiffResult(
+            budget_id="",
+            version=book.version,
+            totals=BudgetCalculator._totals(book),
+            expenses_by_category=BudgetCalculator._changed(book.expenses_by_category, touched["expense"]),
+            income_by_category=BudgetCalculator._changed(book.income_by_category, touched["income"]),
+            monthly_projection=BudgetCalculator._projection(book, first) if first is not None else [],
+            analysis=BudgetCalculator._generate_analysis(book)
+        )
+
+    @staticmethod
+    def _entry(item: BudgetItem) -> budget_engine.BudgetEntry:
+        return budget_engine.BudgetEntry(
+            id=item.id,
+            name=item.name,
+            amount=budget_engine.to_cents(item.amount),
+            category=item.category,
+            type=item.type,
+            is_essential=bool(item.is_essential),
+            month=item.month
+        )
+
+    @staticmethod
+    def _totals(book: budget_engine.BudgetBook) -> BudgetTotals:
+        total_income = book.total_income / 100
+        balance = book.balance / 100
+        return BudgetTotals(
+            total_income=total_income,
+            total_expenses=book.total_expenses / 100,
+            balance=balance,
+            savings_rate=balance / total_income * 100 if total_income > 0 else 0.0,
+            essential_expenses=book.essential_expenses / 100,
+            optional_expenses=(book.total_expenses - book.essential_expenses) / 100,
+            recurring_balance=book.recurring_balance / 100
+        )
+
+    @staticmethod
+    def _changed(totals: Dict[str, int], categories: Set[str]) -> Dict[str, Optional[float]]:
+        return {category: totals[category] / 100 if category in totals else None for category in categories}
+
+    @staticmethod
+    def _projection(book: budget_engine.BudgetBook, first: int) -> List[MonthlyProjectionPoint]:
+        labels, balances, cumulative = book.projection()
+        return [
+            MonthlyProjectionPoint(month=label, balance=balance / 100, cumulative_balance=total / 100)
+            for label, balance, total in zip(labels[first:], balances[first:].tolist(), cumulative[first:].tolist())
+        ]
+
+    @staticmethod
+    def _generate_analysis(book: budget_engine.BudgetBook) -> BudgetAnalysis:
+        """Genera análisis y recomendaciones"""
+        totals = BudgetCalculator._totals(book)
+        balance = totals.balance
+        total_income = totals.total_income
+        savings_rate = totals.savings_rate
+
+        if balance > 0:
+            status = "surplus"
+        elif balance < 0:
+            status = "deficit"
+        else:
+            status = "balanced"
+
+        recommendations = []
+        insights = []
+
+        # Análisis del balance
+        if status == "deficit":
+            recommendations.append("🚨 Tienes un déficit mensual. Es urgente reducir gastos o aumentar ingresos.")
+            recommendations.append("📋 Revisa los gastos opcionales y elimina los no esenciales.")
+            if totals.optional_expenses > abs(balance):
+                recommendations.append(
+                    f"💡 Reduciendo {_format_amount(abs(balance))} en gastos opcionales puedes equilibrar tu presupuesto."
+                )
+        elif status == "surplus":
+            if savings_rate >= 20:
+                insights.append("🎉 ¡Excelente! Tienes una tasa de ahorro superior al 20%.")
+            elif savings_rate >= 10:
+                insights.append("👍 Buena tasa de ahorro. Considera aumentarla gradualmente.")
+                recommendations.append("🎯 Intenta alcanzar una tasa de ahorro del 20% para mayor seguridad financiera.")
+            else:
+                recommendations.append("📈 Tu tasa de ahorro es baja. Intenta ahorrar al menos el 10% de tus ingresos.")
+
+        # Análisis de la distribución de gastos
+        if total_income > 0:
+            housing_percentage = book.expenses_by_category.get("Vivienda (Alquiler/Hipoteca)", 0) / 100 / total_income * 100
+            if housing_percentage > 30:
+                recommendations.append(
+                    f"🏠 Tus gastos de vivienda ({housing_percentage:.1f}%) exceden el 30% recomendado de tus ingresos."
+                )
+            if totals.essential_expenses / total_income * 100 > 70:
+                recommendations.append("⚠️ Tus gastos esenciales consumen más del 70% de tus ingresos. Busca formas de optimizarlos.")
+
+        # Mayores categorías de gasto sin ordenar todas
+        top_expenses = heapq.nlargest(3, book.expenses_by_category.items(), key=lambda entry: entry[1])
+        if top_expenses:
+            insights.append(
+                "💰 Tus mayores gastos son: "
+                + ", ".join(f"{category} (${_format_amount(cents / 100)})" for category, cents in top_expenses)
+                + "."
+            )
+
+        # Consejos generales
+        if status != "deficit":
+            recommendations.append("🎯 Establece un fondo de emergencia equivalente a 3-6 meses de gastos.")
+            recommendations.append("📊 Considera invertir tus ahorros para generar ingresos pasivos.")
+
+        monthly_need = totals.essential_expenses or total_income * 0.7
+        emergency_fund_months = int(balance // monthly_need) if balance > 0 and monthly_need > 0 else 0
+
+        return BudgetAnalysis(
+            status=status,
+            recommendations=recommendations,
+            insights=insights,
+            savings_goal=total_income * 0.2,
+            emergency_fund_months=emergency_fund_months
+        )
+
+def _format_amount(value: float) -> str:
+    # Separador de miles y hasta dos decimales, como toLocaleString
+    return f"{value:,.2f}".rstrip("0").rstrip(".")
+
+# Presupuestos con estado para el API de cambios incrementales
+_books: "OrderedDict[str, budget_engine.BudgetBook]" = OrderedDict()
+_books_lock = threading.Lock()
+
+def _get_book(budget_id: str) -> budget_engine.BudgetBook:
+    book = _books.get(budget_id)
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No existe el presupuesto {budget_id}")
+    _books.move_to_end(budget_id)
+    return book
+
+@router.post("/calculate", response_model=BudgetResult)
+async def calculate_budget(input_data: BudgetInput, request: Request):
+    """
+    Calcula el presupuesto con resumen por categorías, análisis y proyección
+    """
+    try:
+        return encode_response(BudgetCalculator.calculate(input_data), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando presupuesto: {str(e)}")
+
+@router.post("/books", response_model=BudgetBookResult)
+def create_budget(input_data: BudgetInput, request: Request):
+    """
+    Crea un presupuesto con estado que luego se actualiza con cambios incrementales
+    """
+    try:
+        book = BudgetCalculator.build(input_data)
+        result = BudgetCalculator.result(book)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error creando presupuesto: {str(e)}")
+
+    budget_id = uuid.uuid4().hex
+    with _books_lock:
+        _books[budget_id] = book
+        while len(_books) > BudgetCalculator.MAX_BOOKS:
+            _books.popitem(last=False)
+    return encode_response(BudgetBookResult(budget_id=budget_id, version=book.version, result=result), request)
+
+@router.get("/books/{budget_id}", response_model=BudgetBookResult)
+def get_budget(budget_id: str, request: Request):
+    """
+    Obtiene el resultado completo de un presupuesto
+    """
+    with _books_lock:
+        book = _get_book(budget_id)
+        result = BudgetBookResult(budget_id=budget_id, version=book.version, result=BudgetCalculator.result(book))
+    return encode_response(result, request)
+
+@router.patch("/books/{budget_id}", response_model=BudgetDiffResult)
+def update_budget(budget_id: str, diff: BudgetDiff, request: Request):
+    """
+    Aplica partidas nuevas, ediciones y eliminaciones, y responde solo
+    con lo que cambió
+    """
+    with _books_lock:
+        book = _get_book(budget_id)
+        if diff.base_version is not None and diff.base_version != book.version:
+            raise HTTPException(
+                status_code=409,
+                detail=f"El presupuesto cambió: versión actual {book.version}, cambios sobre {diff.base_version}"
+            )
+        try:
+            result = BudgetCalculator.apply_diff(book, diff)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error actualizando presupuesto: {str(e)}")
+    result.budget_id = budget_id
+    return encode_response(result, request)
+
+@router.delete("/books/{budget_id}")
+def delete_budget(budget_id: str):
+    """
+    Elimina un presupuesto con estado
+    """
+    with _books_lock:
+        _get_book(budget_id)
+        del _books[budget_id]
+    return {"deleted": budget_id}
+
+BUDGET_CATEGORIES = {
+    "income": [
+        "Salario Principal",
+        "Salario Secundario",
+        "Freelance/Consultoría",
+        "Rentas/Alquileres",
+        "Inversiones/Dividendos",
+        "Pensión/Jubilación",
+        "Negocios",
+        "Otros Ingresos"
+    ],
+    "expense": [
+        "Vivienda (Alquiler/Hipoteca)",
+        "Servicios Básicos",
+        "Alimentación",
+        "Transporte",
+        "Salud/Seguros",
+        "Deudas/Préstamos",
+        "Educación",
+        "Entretenimiento",
+        "Ropa/Calzado",
+        "Ahorros/Inversiones",
+        "Otros Gastos"
+    ],
+    "essential": sorted(budget_engine.ESSENTIAL_CATEGORIES)
+}
+
+_BUDGET_CATEGORIES_RESPONSE = PrecomputedResponse(BUDGET_CATEGORIES)
+
+@router.get("/categories")
+async def get_budget_categories(request: Request):
+    """
+    Obtiene las categorías de ingresos y gastos
+    """
+    return _BUDGET_CATEGORIES_RESPONSE.respond(request)
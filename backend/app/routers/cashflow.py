@@ -0,0 +1,423 @@
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Iterable, Iterator, List, Optional
+import json
+import numpy as np
+
+from app.services import cashflow_engine, ledger
+from app.services.cache import result_cache
+from app.responses import encode_response
+
+router = APIRouter(prefix="/cashflow", tags=["cashflow"])
+
+class LineItem(BaseModel):
+    name: str = Field("", description="Concepto")
+    amount: float = Field(0, description="Monto mensual")
+
+class CashflowInput(BaseModel):
+    starting_cash: float = Field(..., description="Saldo inicial de caja")
+    revenue: List[LineItem] = Field(default_factory=list, description="Ingresos por ventas")
+    other_inflows: List[LineItem] = Field(default_factory=list, description="Otros ingresos")
+    cogs: List[LineItem] = Field(default_factory=list, description="Costo de ventas")
+    opex_fixed: List[LineItem] = Field(default_factory=list, description="Gastos operativos fijos")
+    opex_variable: List[LineItem] = Field(default_factory=list, description="Gastos operativos variables")
+    payroll: List[LineItem] = Field(default_factory=list, description="Nómina")
+    loan_interest: List[LineItem] = Field(default_factory=list, description="Intereses de deuda")
+    loan_principal: List[LineItem] = Field(default_factory=list, description="Pago a capital de deuda")
+    capex: List[LineItem] = Field(default_factory=list, description="Inversiones en activos")
+    other_outflows: List[LineItem] = Field(default_factory=list, description="Otros egresos")
+    tax_rate: float = Field(0, ge=0, le=1, description="Tasa de impuestos sobre la utilidad operativa")
+    round_to: int = Field(2, ge=0, le=6, description="Decimales de redondeo")
+
+class CashflowTotals(BaseModel):
+    total_inflows: float
+    total_outflows: float
+    taxes_cash: float
+    operating_cash_flow: float
+    free_cash_flow: float
+    net_cash_flow: float
+    ending_cash: float
+    burn_rate: float
+    runway_months: Optional[float]
+
+class CashflowBreakdown(BaseModel):
+    inflows: List[LineItem]
+    outflows: List[LineItem]
+
+class CashflowAnalysis(BaseModel):
+    summary: str
+    risk_level: str
+    recommendations: List[str]
+
+class CashflowResult(BaseModel):
+    totals: CashflowTotals
+    breakdown: CashflowBreakdown
+    analysis: CashflowAnalysis
+
+class CashflowProjectionRequest(BaseModel):
+    base: CashflowInput
+    periods: int = Field(12, ge=1, le=7320, description="Número de periodos a proyectar")
+    frequency: str = Field("monthly", description="Frecuencia: monthly, weekly o daily")
+    growth_rates: Dict[str, float] = Field(default_factory=dict, description="Crecimiento mensual compuesto por categoría")
+
+class CashflowProjectionSummary(BaseModel):
+    periods: int
+    frequency: str
+    total_inflows: float
+    total_outflows: float
+    total_taxes: float
+    net_cash_flow: float
+    ending_cash: float
+    minimum_cash: float
+    cash_out_period: Optional[int] = Field(None, description="Primer periodo con saldo negativo")
+    runway_periods: Optional[float] = Field(None, description="Periodos hasta agotar la caja")
+    runway_months: Optional[float] = Field(None, description="Meses hasta agotar la caja")
+
+class CashflowProjection(BaseModel):
+    frequency: str
+    period: List[int]
+    amounts: Dict[str, List[float]]
+    taxes: List[float]
+    total_inflows: List[float]
+    total_outflows: List[float]
+    operating_cash_flow: List[float]
+    free_cash_flow: List[float]
+    net_cash_flow: List[float]
+    ending_cash: List[float]
+    summary: CashflowProjectionSummary
+
+class LedgerIngestOptions(BaseModel):
+    format: Optional[str] = Field(None, description="csv o parquet (por defecto, según la extensión)")
+    date_column: str = Field("date", description="Columna de fecha")
+    category_column: str = Field("category", description="Columna de categoría")
+    amount_column: str = Field("amount", description="Columna de monto")
+    category_map: Dict[str, str] = Field(default_factory=dict, description="Categoría del libro -> categoría de flujo")
+    frequency: str = Field("monthly", description="Periodo de agregación del histórico")
+    amount_sign: str = Field("auto", description="Signo de los egresos en el libro: positive, negative o auto")
+    baseline_periods: int = Field(3, ge=1, description="Periodos recientes que se promedian como base")
+    starting_cash: float = Field(0, description="Saldo de caja al cierre del libro")
+    tax_rate: float = Field(0, ge=0, le=1, description="Tasa de impuestos sobre la utilidad operativa")
+    periods: int = Field(12, ge=1, le=7320, description="Periodos a proyectar")
+    projection_frequency: str = Field("monthly", description="Frecuencia de la proyección")
+    growth_rates: Dict[str, float] = Field(default_factory=dict, description="Crecimiento mensual compuesto por categoría")
+    round_to: int = Field(2, ge=0, le=6, description="Decimales de redondeo")
+
+class LedgerIngestResult(BaseModel):
+    rows: int
+    skipped_rows: int
+    outflows_negative: bool = Field(..., description="Si los egresos del libro venían con signo negativo")
+    unmapped: Dict[str, float] = Field(..., description="Totales de categorías del libro sin equivalente")
+    frequency: str
+    periods: List[str]
+    history: Dict[str, List[float]]
+    baseline: Dict[str, float] = Field(..., description="Monto mensual base por categoría")
+    projection: CashflowProjection
+
+# Campos por periodo de la proyección, además de los montos por categoría
+PROJECTION_SERIES = (
+    "taxes", "total_inflows", "total_outflows", "operating_cash_flow",
+    "free_cash_flow", "net_cash_flow", "ending_cash"
+)
+
+class CashflowCalculator:
+
+    @staticmethod
+    def calculate(input_data: CashflowInput) -> CashflowResult:
+        """Calcula el flujo de caja de un mes con análisis y recomendaciones"""
+        digits = input_data.round_to
+        buckets = CashflowCalculator._monthly_amounts(input_data)
+        revenue = buckets["revenue"]
+        total_inflows = revenue + buckets["other_inflows"]
+        operating_cash_out = sum(buckets[category] for category in cashflow_engine.OPERATING_CATEGORIES)
+
+        # Impuestos solo sobre la utilidad operativa positiva
+        operating_profit = revenue - operating_cash_out - buckets["loan_interest"]
+        taxes_cash = operating_profit * input_data.tax_rate if operating_profit > 0 else 0.0
+
+        total_outflows = sum(buckets[category] for category in cashflow_engine.OUTFLOW_CATEGORIES) + taxes_cash
+        net_cash_flow = total_inflows - total_outflows
+        ending_cash = input_data.starting_cash + net_cash_flow
+        operating_cash_flow = revenue - operating_cash_out - taxes_cash
+        free_cash_flow = operating_cash_flow - buckets["capex"]
+
+        burn_rate = -net_cash_flow if net_cash_flow < 0 else 0.0
+        # Con flujos constantes el saldo cae linealmente: el runway es exacto
+        runway_months = cashflow_engine.constant_runway_months(input_data.starting_cash, net_cash_flow)
+
+        if net_cash_flow >= 0 and (runway_months is None or runway_months >= 6):
+            risk_level = "low"
+        elif net_cash_flow >= 0 or (runway_months is not None and runway_months >= 3):
+            risk_level = "medium"
+        else:
+            risk_level = "high"
+
+        return CashflowResult(
+            totals=CashflowTotals(
+                total_inflows=round(total_inflows, digits),
+                total_outflows=round(total_outflows, digits),
+                taxes_cash=round(taxes_cash, digits),
+                operating_cash_flow=round(operating_cash_flow, digits),
+                free_cash_flow=round(free_cash_flow, digits),
+                net_cash_flow=round(net_cash_flow, digits),
+                ending_cash=round(ending_cash, digits),
+                burn_rate=round(burn_rate, digits),
+                runway_months=round(runway_months, digits) if runway_months is not None else None
+            ),
+            breakdown=CashflowBreakdown(
+                inflows=[
+                    LineItem(name="Ingresos", amount=round(revenue, digits)),
+                    LineItem(name="Otros ingresos", amount=round(buckets["other_inflows"], digits))
+                ],
+                outflows=[
+                    LineItem(name="COGS", amount=round(buckets["cogs"], digits)),
+                    LineItem(name="OPEX fijo", amount=round(buckets["opex_fixed"], digits)),
+                    LineItem(name="OPEX variable", amount=round(buckets["opex_variable"], digits)),
+                    LineItem(name="Nómina", amount=round(buckets["payroll"], digits)),
+                    LineItem(name="Impuestos (cash)", amount=round(taxes_cash, digits)),
+                    LineItem(name="Intereses", amount=round(buckets["loan_interest"], digits)),
+                    LineItem(name="Principal deuda", amount=round(buckets["loan_principal"], digits)),
+                    LineItem(name="CapEx", amount=round(buckets["capex"], digits)),
+                    LineItem(name="Otros egresos", amount=round(buckets["other_outflows"], digits))
+                ]
+            ),
+            analysis=CashflowCalculator._generate_analysis(
+                net_cash_flow, ending_cash, operating_cash_flow, free_cash_flow,
+                runway_months, risk_level, digits, total_inflows, total_outflows, buckets
+            )
+        )
+
+    @staticmethod
+    @result_cache.cached("cashflow.project", CashflowProjection)
+    def project(request: CashflowProjectionRequest) -> CashflowProjection:
+        """
+        Proyecta el flujo de caja periodo a periodo con crecimiento por
+        categoría, impuestos por periodo, saldo final acumulado y runway
+        exacto sobre la serie proyectada
+        """
+        digits = request.base.round_to
+        tracker = cashflow_engine.ProjectionTracker(request.base.starting_cash, request.frequency)
+        chunks = []
+        for chunk in CashflowCalculator._iter_chunks(request):
+            tracker.update(chunk)
+            chunks.append(chunk)
+
+        def column(values) -> List[float]:
+            return np.round(np.concatenate(values), digits).tolist()
+
+        return CashflowProjection(
+            frequency=request.frequency,
+            period=np.concatenate([chunk.period for chunk in chunks]).tolist(),
+            amounts={
+                category: column([chunk.amounts[category] for chunk in chunks])
+                for category in cashflow_engine.CATEGORIES
+            },
+            **{series: column([getattr(chunk, series) for chunk in chunks]) for series in PROJECTION_SERIES},
+            summary=CashflowCalculator._projection_summary(tracker.summary(), digits)
+        )
+
+    @staticmethod
+    def stream_projection(request: CashflowProjectionRequest) -> Iterator[str]:
+        """
+        Produce la proyección como NDJSON: un renglón "period" por periodo
+        conforme se calcula cada bloque y al final un renglón "summary"
+        """
+        digits = request.base.round_to
+        tracker = cashflow_engine.ProjectionTracker(request.base.starting_cash, request.frequency)
+        for chunk in CashflowCalculator._iter_chunks(request):
+            tracker.update(chunk)
+            yield CashflowCalculator._encode_chunk(chunk, digits)
+
+        summary = CashflowCalculator._projection_summary(tracker.summary(), digits)
+        yield json.dumps({"type": "summary", **summary.model_dump()}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    @staticmethod
+    def ingest_ledger(chunks: Iterable, options: LedgerIngestOptions) -> LedgerIngestResult:
+        """
+        Agrega un libro de movimientos leído por bloques y proyecta el
+        flujo de caja a partir del promedio de sus periodos recientes
+        """
+        aggregator = ledger.LedgerAggregator(options.frequency, options.category_map, options.amount_sign)
+        for dates, categories, amounts in chunks:
+            aggregator.update(dates, categories, amounts)
+
+        labels, history = aggregator.table()
+        baseline = aggregator.monthly_baseline(options.baseline_periods)
+        base = CashflowInput(
+            starting_cash=options.starting_cash,
+            tax_rate=options.tax_rate,
+            round_to=options.round_to,
+            **{
+                category: [LineItem(name="Promedio del libro", amount=amount)] if amount else []
+                for category, amount in baseline.items()
+            }
+        )
+        projection = CashflowCalculator.project(CashflowProjectionRequest(
+            base=base, periods=options.periods,
+            frequency=options.projection_frequency, growth_rates=options.growth_rates
+        ))
+
+        digits = options.round_to
+        return LedgerIngestResult(
+            rows=aggregator.rows,
+            skipped_rows=aggregator.skipped,
+            outflows_negative=aggregator.outflows_negative,
+            unmapped={label: round(total, digits) for label, total in aggregator.unmapped.items()},
+            frequency=options.frequency,
+            periods=labels,
+            history={category: np.round(values, digits).tolist() for category, values in history.items()},
+            baseline={category: round(amount, digits) for category, amount in baseline.items()},
+            projection=projection
+        )
+
+    @staticmethod
+    def _iter_chunks(request: CashflowProjectionRequest) -> Iterator[cashflow_engine.ProjectionChunk]:
+        base = request.base
+        return cashflow_engine.iter_projection(
+            CashflowCalculator._monthly_amounts(base), base.starting_cash, base.tax_rate,
+            request.periods, request.frequency, request.growth_rates
+        )
+
+    @staticmethod
+    def _encode_chunk(chunk: cashflow_engine.ProjectionChunk, digits: int) -> str:
+        columns = {category: np.round(values, digits).tolist() for category, values in chunk.amounts.items()}
+        columns.update({series: np.round(getattr(chunk, series), digits).tolist() for series in PROJECTION_SERIES})
+        lines = []
+        for row, period in enumerate(chunk.period.tolist()):
+            record = {"type": "period", "period": period}
+            record.update({name: values[row] for name, values in columns.items()})
+            lines.append(json.dumps(record, separators=(",", ":")))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _projection_summary(summary: cashflow_engine.ProjectionSummary, digits: int) -> CashflowProjectionSummary:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, digits) if value is not None else None
+
+        return CashflowProjectionSummary(
+            periods=summary.periods,
+            frequency=summary.frequency,
+            total_inflows=rounded(summary.total_inflows),
+            total_outflows=rounded(summary.total_outflows),
+            total_taxes=rounded(summary.total_taxes),
+            net_cash_flow=rounded(summary.net_cash_flow),
+            ending_cash=rounded(summary.ending_cash),
+            minimum_cash=rounded(summary.minimum_cash),
+            cash_out_period=summary.cash_out_period,
+            runway_periods=rounded(summary.runway_periods),
+            runway_months=rounded(summary.runway_months)
+        )
+
+    @staticmethod
+    def _monthly_amounts(input_data: CashflowInput) -> Dict[str, float]:
+        return {
+            category: sum(item.amount for item in getattr(input_data, category))
+            for category in cashflow_engine.CATEGORIES
+        }
+
+    @staticmethod
+    def _generate_analysis(net_cash_flow: float, ending_cash: float, operating_cash_flow: float, free_cash_flow: float, runway_months: Optional[float], risk_level: str, digits: int, total_inflows: float, total_outflows: float, buckets: Dict[str, float]) -> CashflowAnalysis:
+        """Genera análisis y recomendaciones"""
+        if net_cash_flow >= 0:
+            summary = (
+                f"Flujo de caja positivo de {round(net_cash_flow, digits)}. "
+                f"Saldo final {round(ending_cash, digits)}. "
+                f"Flujo operativo {round(operating_cash_flow, digits)}; "
+                f"FCF {round(free_cash_flow, digits)}."
+            )
+            recommendations = [
+                "Considera destinar 10-20% del flujo positivo a un fondo de reserva (runway).",
+                "Evalúa reducir deuda con mayor tasa utilizando el excedente.",
+                "Reinvierte en canales con ROI probado (p. ej., campañas con CAC < LTV)."
+            ]
+        else:
+            summary = (
+                f"Flujo de caja negativo de {round(-net_cash_flow, digits)} (burn). "
+                f"Runway estimado: {round(runway_months, digits) if runway_months else 0} meses."
+            )
+
+            # Identificar los mayores egresos
+            expense_buckets = [
+                ("COGS", buckets["cogs"]),
+                ("OPEX fijo", buckets["opex_fixed"]),
+                ("OPEX variable", buckets["opex_variable"]),
+                ("Nómina", buckets["payroll"]),
+                ("Intereses", buckets["loan_interest"]),
+                ("Principal deuda", buckets["loan_principal"]),
+                ("CapEx", buckets["capex"]),
+                ("Otros", buckets["other_outflows"])
+            ]
+            expense_buckets.sort(key=lambda bucket: bucket[1], reverse=True)
+            top_expenses = ", ".join(
+                [f"{name}: {round(amount, digits)}" for name, amount in expense_buckets if amount > 0][:3]
+            )
+
+            recommended_revenue_increase = max(0.0, total_outflows - total_inflows)
+            recommendations = [
+                f"Prioriza recortes en: {top_expenses}" if top_expenses else "Revisa cada partida de gasto para identificar recortes.",
+                "Negocia pagos con proveedores o alarga plazos para aliviar caja.",
+                f"Objetivo de aumento de ingresos: {round(recommended_revenue_increase, digits)} para alcanzar punto de equilibrio de caja."
+            ]
+
+        return CashflowAnalysis(summary=summary, risk_level=risk_level, recommendations=recommendations)
+
+def _validate_projection_request(request: CashflowProjectionRequest) -> None:
+    cashflow_engine.period_factors(request.growth_rates, request.frequency)
+
+@router.post("/calculate", response_model=CashflowResult)
+async def calculate_cashflow(input_data: CashflowInput, request: Request):
+    """
+    Calcula el flujo de caja mensual con análisis y recomendaciones
+    """
+    try:
+        return encode_response(CashflowCalculator.calculate(input_data), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando flujo de caja: {str(e)}")
+
+@router.post("/project", response_model=CashflowProjection)
+async def project_cashflow(request: CashflowProjectionRequest, http_request: Request):
+    """
+    Proyecta el flujo de caja por periodo con crecimiento por categoría
+    """
+    try:
+        _validate_projection_request(request)
+        return encode_response(CashflowCalculator.project(request), http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error proyectando flujo de caja: {str(e)}")
+
+@router.post("/project/stream")
+async def stream_cashflow_projection(request: CashflowProjectionRequest):
+    """
+    Transmite la proyección como NDJSON, un periodo por renglón, con el
+    resumen como último renglón
+    """
+    try:
+        _validate_projection_request(request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error proyectando flujo de caja: {str(e)}")
+
+    return StreamingResponse(CashflowCalculator.stream_projection(request), media_type="application/x-ndjson")
+
+@router.post("/ingest", response_model=LedgerIngestResult)
+def ingest_ledger(request: Request, file: UploadFile = File(...), options: str = Form("{}")):
+    """
+    Agrega un libro de movimientos (CSV o Parquet) por periodo y
+    categoría, leyéndolo por bloques, y proyecta el flujo de caja
+    """
+    try:
+        settings = LedgerIngestOptions.model_validate_json(options)
+        _validate_projection_request(CashflowProjectionRequest(
+            base=CashflowInput(starting_cash=settings.starting_cash),
+            frequency=settings.projection_frequency, growth_rates=settings.growth_rates
+        ))
+        file_format = settings.format or ("parquet" if (file.filename or "").lower().endswith(".parquet") else "csv")
+        columns = (settings.date_column, settings.category_column, settings.amount_column)
+        if file_format == "parquet":
+            chunks = ledger.iter_parquet_chunks(file.file, *columns)
+        elif file_format == "csv":
+            chunks = ledger.iter_csv_chunks(file.file, *columns)
+        else:
+            raise ValueError(f"Formato no válido: {file_format}")
+        return encode_response(CashflowCalculator.ingest_ledger(chunks, settings), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error procesando el libro de movimientos: {str(e)}")
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
+import json
 import math
+import numpy as np
+
+from app.services import debt_engine
+from app.services.cache import result_cache
+from app.services.static_responses import PrecomputedResponse
+from app.responses import encode_response
 
 router = APIRouter(prefix="/debt", tags=["debt"])
 
@@ -35,6 +43,14 @@ class DebtPayment(BaseModel):
     remaining_balance: float
     is_paid_off: bool
 
+class DebtMonthlyTotal(BaseModel):
+    month: int
+    payment: float
+    principal: float
+    interest: float
+    remaining_balance: float
+    active_debts: int
+
 class DebtPaymentPlan(BaseModel):
     strategy: str
     total_debt: float
@@ -45,18 +61,114 @@ class DebtPaymentPlan(BaseModel):
     extra_payment: float
     savings: float
     payments: List[DebtPayment]
+    monthly_totals: Optional[List[DebtMonthlyTotal]] = None
+    detail: str = "full"
+    explanation: str
+    tips: List[str]
+
+class DebtReference(BaseModel):
+    id: str
+    name: str
+    type: str
+
+class DebtScheduleColumns(BaseModel):
+    month: List[int]
+    debt_index: List[int]
+    payment: List[float]
+    principal: List[float]
+    interest: List[float]
+    remaining_balance: List[float]
+
+class DebtMonthlyColumns(BaseModel):
+    month: List[int]
+    payment: List[float]
+    principal: List[float]
+    interest: List[float]
+    remaining_balance: List[float]
+    active_debts: List[int]
+
+class DebtPaymentPlanColumnar(BaseModel):
+    strategy: str
+    total_debt: float
+    total_interest: float
+    total_payments: float
+    months_to_freedom: int
+    monthly_payment: float
+    extra_payment: float
+    savings: float
+    debts: List[DebtReference]
+    schedule: Optional[DebtScheduleColumns] = None
+    monthly_totals: Optional[DebtMonthlyColumns] = None
+    detail: str = "full"
     explanation: str
     tips: List[str]
 
+class DebtBaseline(BaseModel):
+    months_to_freedom: int
+    total_interest: float
+    total_payments: float
+    paid_off: bool
+
+class DebtComparison(BaseModel):
+    analysis: DebtAnalysis
+    baseline: DebtBaseline
+    plans: Dict[str, DebtPaymentPlan]
+    cheapest_strategy: str
+    fastest_strategy: str
+
 class DebtCalculationRequest(BaseModel):
     debts: List[Debt]
     monthly_income: float = Field(..., ge=0, description="Ingreso mensual")
     extra_payment: float = Field(0, ge=0, description="Pago extra disponible")
     strategy: str = Field("avalanche", description="Estrategia de pago")
     custom_priorities: Optional[Dict[str, int]] = Field(None, description="Prioridades personalizadas")
+    detail: str = Field("full", description="Nivel de detalle del calendario: summary, monthly o full")
+
+class DebtSimulationRequest(DebtCalculationRequest):
+    paths: int = Field(1000, ge=1, le=100000, description="Número de trayectorias a simular")
+    seed: Optional[int] = Field(None, ge=0, description="Semilla para reproducir la simulación")
+    rate_volatility: float = Field(2.0, ge=0, le=50, description="Desviación anual de las tasas variables (puntos porcentuales)")
+    income_volatility: float = Field(0.1, ge=0, le=1, description="Desviación mensual del ingreso (fracción)")
+    fixed_rate_types: List[str] = Field(default_factory=lambda: ["mortgage"], description="Tipos de deuda con tasa fija")
+
+class DebtPercentiles(BaseModel):
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+class DebtSimulationResult(BaseModel):
+    strategy: str
+    paths: int
+    seed: int
+    months_to_freedom: DebtPercentiles
+    total_interest: DebtPercentiles
+    probability_debt_free: float
+    deterministic_months: int
+    deterministic_interest: float
+
+class DebtOptimizationRequest(DebtCalculationRequest):
+    objective: str = Field("interest", description="Objetivo a minimizar: interest o months")
+    target_months: Optional[int] = Field(None, ge=1, le=600, description="Plazo deseado para liquidar todas las deudas")
+
+class DebtOptimizationResult(BaseModel):
+    objective: str
+    order: List[str]
+    priorities: Dict[str, int]
+    months_to_freedom: int
+    total_interest: float
+    total_payments: float
+    evaluated_orders: int
+    # True si se evaluaron todos los órdenes (resultado óptimo); False si el
+    # orden es el mejor encontrado por búsqueda local
+    exhaustive: bool
+    target_months: Optional[int] = None
+    required_extra_payment: Optional[float] = None
 
 class DebtCalculator:
     @staticmethod
+    @result_cache.cached("debt.analyze", DebtAnalysis)
     def analyze_debts(debts: List[Debt], monthly_income: float) -> DebtAnalysis:
         if not debts:
             raise ValueError("No se pueden analizar deudas vacías")
@@ -96,249 +208,382 @@ class DebtCalculator:
         )
 
     @staticmethod
-    def calculate_avalanche_strategy(debts: List[Debt], extra_payment: float, monthly_income: float) -> DebtPaymentPlan:
+    def calculate_avalanche_strategy(debts: List[Debt], extra_payment: float, monthly_income: float, detail: str = "full") -> DebtPaymentPlan:
         # Ordenar deudas por tasa de interés (mayor a menor)
-        sorted_debts = sorted(debts, key=lambda x: x.interest_rate, reverse=True)
-        
-        total_debt = sum(debt.balance for debt in debts)
-        total_minimum_payments = sum(debt.minimum_payment for debt in debts)
-        total_monthly_payment = total_minimum_payments + extra_payment
-        
-        payments = []
-        month = 1
-        total_interest = 0
-        current_debts = [{"id": debt.id, "name": debt.name, "balance": debt.balance, "interest_rate": debt.interest_rate, "minimum_payment": debt.minimum_payment} for debt in sorted_debts]
-        
-        while any(debt["balance"] > 0 for debt in current_debts):
-            for debt in current_debts:
-                if debt["balance"] <= 0:
-                    continue
-                
-                monthly_rate = debt["interest_rate"] / 100 / 12
-                interest_payment = debt["balance"] * monthly_rate
-                minimum_payment = debt["minimum_payment"]
-                
-                # Si es la deuda con mayor interés, agregar el pago extra
-                is_highest_interest = debt["id"] == sorted_debts[0].id
-                extra_for_this_debt = extra_payment if is_highest_interest else 0
-                total_payment = min(minimum_payment + extra_for_this_debt, debt["balance"] + interest_payment)
-                
-                principal_payment = max(0, total_payment - interest_payment)
-                new_balance = max(0, debt["balance"] - principal_payment)
-                
-                payments.append(DebtPayment(
-                    month=month,
-                    debt_id=debt["id"],
-                    debt_name=debt["name"],
-                    payment=round(total_payment, 2),
-                    principal=round(principal_payment, 2),
-                    interest=round(interest_payment, 2),
-                    remaining_balance=round(new_balance, 2),
-                    is_paid_off=new_balance <= 0
-                ))
-                
-                debt["balance"] = new_balance
-                total_interest += interest_payment
-            
-            # Remover deudas pagadas
-            current_debts = [debt for debt in current_debts if debt["balance"] > 0]
-            month += 1
-            
-            # Prevenir bucle infinito
-            if month > 600:
-                break
-        
-        months_to_freedom = month - 1
-        total_payments = sum(payment.payment for payment in payments)
-        savings = DebtCalculator._calculate_savings(debts, total_payments)
-        
-        return DebtPaymentPlan(
-            strategy="avalanche",
-            total_debt=total_debt,
-            total_interest=round(total_interest, 2),
-            total_payments=round(total_payments, 2),
-            months_to_freedom=months_to_freedom,
-            monthly_payment=round(total_monthly_payment, 2),
-            extra_payment=extra_payment,
-            savings=round(savings, 2),
-            payments=payments,
-            explanation=DebtCalculator._generate_avalanche_explanation(debts, months_to_freedom, savings),
-            tips=DebtCalculator._generate_avalanche_tips(debts, extra_payment)
+        result = DebtCalculator._simulate(debts, extra_payment, debt_engine.order_by_highest_rate, detail=detail)
+        return DebtCalculator._build_plan(
+            "avalanche", debts, extra_payment, result,
+            DebtCalculator._generate_avalanche_explanation,
+            DebtCalculator._generate_avalanche_tips
         )
 
     @staticmethod
-    def calculate_snowball_strategy(debts: List[Debt], extra_payment: float, monthly_income: float) -> DebtPaymentPlan:
+    def calculate_snowball_strategy(debts: List[Debt], extra_payment: float, monthly_income: float, detail: str = "full") -> DebtPaymentPlan:
         # Ordenar deudas por balance (menor a mayor)
-        sorted_debts = sorted(debts, key=lambda x: x.balance)
-        
-        total_debt = sum(debt.balance for debt in debts)
-        total_minimum_payments = sum(debt.minimum_payment for debt in debts)
-        total_monthly_payment = total_minimum_payments + extra_payment
-        
-        payments = []
-        month = 1
-        total_interest = 0
-        current_debts = [{"id": debt.id, "name": debt.name, "balance": debt.balance, "interest_rate": debt.interest_rate, "minimum_payment": debt.minimum_payment} for debt in sorted_debts]
-        available_extra = extra_payment
-        
-        while any(debt["balance"] > 0 for debt in current_debts):
-            for debt in current_debts:
-                if debt["balance"] <= 0:
-                    continue
-                
-                monthly_rate = debt["interest_rate"] / 100 / 12
-                interest_payment = debt["balance"] * monthly_rate
-                minimum_payment = debt["minimum_payment"]
-                
-                # Si es la deuda más pequeña, agregar el pago extra disponible
-                is_smallest_debt = debt["id"] == sorted_debts[0].id
-                extra_for_this_debt = available_extra if is_smallest_debt else 0
-                total_payment = min(minimum_payment + extra_for_this_debt, debt["balance"] + interest_payment)
-                
-                principal_payment = max(0, total_payment - interest_payment)
-                new_balance = max(0, debt["balance"] - principal_payment)
-                
-                payments.append(DebtPayment(
-                    month=month,
-                    debt_id=debt["id"],
-                    debt_name=debt["name"],
-                    payment=round(total_payment, 2),
-                    principal=round(principal_payment, 2),
-                    interest=round(interest_payment, 2),
-                    remaining_balance=round(new_balance, 2),
-                    is_paid_off=new_balance <= 0
-                ))
-                
-                debt["balance"] = new_balance
-                total_interest += interest_payment
-                
-                # Si la deuda se pagó, liberar el pago mínimo para la siguiente
-                if new_balance <= 0 and is_smallest_debt:
-                    available_extra += minimum_payment
-                    # Remover deuda pagada y actualizar la siguiente más pequeña
-                    current_debts = [d for d in current_debts if d["balance"] > 0]
-                    if current_debts:
-                        sorted_debts.pop(0)
-            
-            # Remover deudas pagadas
-            current_debts = [debt for debt in current_debts if debt["balance"] > 0]
-            month += 1
-            
-            # Prevenir bucle infinito
-            if month > 600:
-                break
-        
-        months_to_freedom = month - 1
-        total_payments = sum(payment.payment for payment in payments)
-        savings = DebtCalculator._calculate_savings(debts, total_payments)
-        
-        return DebtPaymentPlan(
-            strategy="snowball",
-            total_debt=total_debt,
-            total_interest=round(total_interest, 2),
-            total_payments=round(total_payments, 2),
-            months_to_freedom=months_to_freedom,
-            monthly_payment=round(total_monthly_payment, 2),
-            extra_payment=extra_payment,
-            savings=round(savings, 2),
-            payments=payments,
-            explanation=DebtCalculator._generate_snowball_explanation(debts, months_to_freedom, savings),
-            tips=DebtCalculator._generate_snowball_tips(debts, extra_payment)
+        result = DebtCalculator._simulate(debts, extra_payment, debt_engine.order_by_smallest_balance, detail=detail)
+        return DebtCalculator._build_plan(
+            "snowball", debts, extra_payment, result,
+            DebtCalculator._generate_snowball_explanation,
+            DebtCalculator._generate_snowball_tips
         )
 
     @staticmethod
-    def calculate_custom_strategy(debts: List[Debt], extra_payment: float, monthly_income: float, custom_priorities: Dict[str, int]) -> DebtPaymentPlan:
+    def calculate_custom_strategy(debts: List[Debt], extra_payment: float, monthly_income: float, custom_priorities: Dict[str, int], detail: str = "full") -> DebtPaymentPlan:
         # Ordenar deudas por prioridad personalizada
-        sorted_debts = sorted(debts, key=lambda x: custom_priorities.get(x.id, 0))
+        result = DebtCalculator._simulate(debts, extra_payment, debt_engine.order_by_priority, custom_priorities, detail)
+        return DebtCalculator._build_plan(
+            "custom", debts, extra_payment, result,
+            DebtCalculator._generate_custom_explanation,
+            DebtCalculator._generate_custom_tips
+        )
+
+    @staticmethod
+    @result_cache.cached("debt.calculate", DebtPaymentPlan)
+    def calculate_plan(request: DebtCalculationRequest) -> DebtPaymentPlan:
+        """Valida la solicitud y calcula el plan con la estrategia elegida"""
+        _validate_plan_request(request)
         
+        if request.strategy == "avalanche":
+            return DebtCalculator.calculate_avalanche_strategy(request.debts, request.extra_payment, request.monthly_income, request.detail)
+        if request.strategy == "snowball":
+            return DebtCalculator.calculate_snowball_strategy(request.debts, request.extra_payment, request.monthly_income, request.detail)
+        return DebtCalculator.calculate_custom_strategy(request.debts, request.extra_payment, request.monthly_income, request.custom_priorities, request.detail)
+
+    @staticmethod
+    def _priorities(debts: List[Debt], custom_priorities: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        # Sin prioridades explícitas se usan las de cada deuda
+        return custom_priorities or {debt.id: debt.priority for debt in debts if debt.priority is not None}
+
+    @staticmethod
+    def _to_arrays(debts: List[Debt], custom_priorities: Optional[Dict[str, int]] = None):
+        balances = np.fromiter((debt.balance for debt in debts), dtype=np.float64, count=len(debts))
+        rates = np.fromiter((debt.interest_rate for debt in debts), dtype=np.float64, count=len(debts))
+        minimums = np.fromiter((debt.minimum_payment for debt in debts), dtype=np.float64, count=len(debts))
+        priorities = DebtCalculator._priorities(debts, custom_priorities)
+        priority = np.fromiter((priorities.get(debt.id, 0) for debt in debts), dtype=np.float64, count=len(debts))
+        return balances, rates, minimums, priority
+
+    @staticmethod
+    def _simulate(debts: List[Debt], extra_payment: float, ordering: debt_engine.DebtOrdering, custom_priorities: Optional[Dict[str, int]] = None, detail: str = "full") -> debt_engine.SimulationResult:
+        balances, rates, minimums, priority = DebtCalculator._to_arrays(debts, custom_priorities)
+        order = ordering(balances, rates, priority)
+        return debt_engine.simulate(balances, rates, minimums, extra_payment, order, detail=detail)
+
+    @staticmethod
+    def _build_payments(debts: List[Debt], schedule: debt_engine.PaymentSchedule) -> List[DebtPayment]:
+        return [
+            DebtPayment(
+                month=month,
+                debt_id=debts[index].id,
+                debt_name=debts[index].name,
+                payment=round(payment, 2),
+                principal=round(principal, 2),
+                interest=round(interest, 2),
+                remaining_balance=round(remaining, 2),
+                is_paid_off=remaining <= 0
+            )
+            for month, index, payment, principal, interest, remaining in zip(
+                schedule.month.tolist(),
+                schedule.debt_index.tolist(),
+                schedule.payment.tolist(),
+                schedule.principal.tolist(),
+                schedule.interest.tolist(),
+                schedule.remaining_balance.tolist()
+            )
+        ]
+
+    @staticmethod
+    def _build_monthly_totals(monthly: debt_engine.MonthlyTotals) -> List[DebtMonthlyTotal]:
+        return [
+            DebtMonthlyTotal(
+                month=month,
+                payment=round(payment, 2),
+                principal=round(principal, 2),
+                interest=round(interest, 2),
+                remaining_balance=round(remaining, 2),
+                active_debts=active_debts
+            )
+            for month, payment, principal, interest, remaining, active_debts in zip(
+                monthly.month.tolist(),
+                monthly.payment.tolist(),
+                monthly.principal.tolist(),
+                monthly.interest.tolist(),
+                monthly.remaining_balance.tolist(),
+                monthly.active_debts.tolist()
+            )
+        ]
+
+    @staticmethod
+    def _plan_summary(strategy: str, debts: List[Debt], extra_payment: float, result: debt_engine.SimulationResult, explain, tips, baseline: Optional[debt_engine.SimulationResult] = None) -> dict:
         total_debt = sum(debt.balance for debt in debts)
-        total_minimum_payments = sum(debt.minimum_payment for debt in debts)
-        total_monthly_payment = total_minimum_payments + extra_payment
-        
-        payments = []
-        month = 1
-        total_interest = 0
-        current_debts = [{"id": debt.id, "name": debt.name, "balance": debt.balance, "interest_rate": debt.interest_rate, "minimum_payment": debt.minimum_payment} for debt in sorted_debts]
-        available_extra = extra_payment
-        
-        while any(debt["balance"] > 0 for debt in current_debts):
-            for debt in current_debts:
-                if debt["balance"] <= 0:
-                    continue
-                
-                monthly_rate = debt["interest_rate"] / 100 / 12
-                interest_payment = debt["balance"] * monthly_rate
-                minimum_payment = debt["minimum_payment"]
-                
-                # Si es la deuda con mayor prioridad, agregar el pago extra disponible
-                is_highest_priority = debt["id"] == sorted_debts[0].id
-                extra_for_this_debt = available_extra if is_highest_priority else 0
-                total_payment = min(minimum_payment + extra_for_this_debt, debt["balance"] + interest_payment)
-                
-                principal_payment = max(0, total_payment - interest_payment)
-                new_balance = max(0, debt["balance"] - principal_payment)
-                
-                payments.append(DebtPayment(
-                    month=month,
-                    debt_id=debt["id"],
-                    debt_name=debt["name"],
-                    payment=round(total_payment, 2),
-                    principal=round(principal_payment, 2),
-                    interest=round(interest_payment, 2),
-                    remaining_balance=round(new_balance, 2),
-                    is_paid_off=new_balance <= 0
-                ))
-                
-                debt["balance"] = new_balance
-                total_interest += interest_payment
-                
-                # Si la deuda se pagó, liberar el pago mínimo para la siguiente
-                if new_balance <= 0 and is_highest_priority:
-                    available_extra += minimum_payment
-                    # Remover deuda pagada y actualizar la siguiente con mayor prioridad
-                    current_debts = [d for d in current_debts if d["balance"] > 0]
-                    if current_debts:
-                        sorted_debts.pop(0)
-            
-            # Remover deudas pagadas
-            current_debts = [debt for debt in current_debts if debt["balance"] > 0]
-            month += 1
-            
-            # Prevenir bucle infinito
-            if month > 600:
-                break
-        
-        months_to_freedom = month - 1
-        total_payments = sum(payment.payment for payment in payments)
-        savings = DebtCalculator._calculate_savings(debts, total_payments)
-        
+        total_monthly_payment = sum(debt.minimum_payment for debt in debts) + extra_payment
+        months_to_freedom = result.months
+        if baseline is None:
+            balances, rates, minimums, _ = DebtCalculator._to_arrays(debts)
+            baseline = DebtCalculator._simulate_minimum_only(balances, rates, minimums)
+        savings = DebtCalculator._calculate_savings(baseline, result)
+
+        return {
+            "strategy": strategy,
+            "total_debt": total_debt,
+            "total_interest": round(result.total_interest, 2),
+            "total_payments": round(result.total_payments, 2),
+            "months_to_freedom": months_to_freedom,
+            "monthly_payment": round(total_monthly_payment, 2),
+            "extra_payment": extra_payment,
+            "savings": round(savings, 2),
+            "detail": DebtCalculator._detail_of(result),
+            "explanation": explain(debts, months_to_freedom, savings),
+            "tips": tips(debts, extra_payment)
+        }
+
+    @staticmethod
+    def _build_plan(strategy: str, debts: List[Debt], extra_payment: float, result: debt_engine.SimulationResult, explain, tips, baseline: Optional[debt_engine.SimulationResult] = None) -> DebtPaymentPlan:
         return DebtPaymentPlan(
-            strategy="custom",
-            total_debt=total_debt,
-            total_interest=round(total_interest, 2),
-            total_payments=round(total_payments, 2),
-            months_to_freedom=months_to_freedom,
-            monthly_payment=round(total_monthly_payment, 2),
-            extra_payment=extra_payment,
-            savings=round(savings, 2),
-            payments=payments,
-            explanation=DebtCalculator._generate_custom_explanation(debts, months_to_freedom, savings),
-            tips=DebtCalculator._generate_custom_tips(debts, extra_payment)
+            **DebtCalculator._plan_summary(strategy, debts, extra_payment, result, explain, tips, baseline),
+            payments=DebtCalculator._build_payments(debts, result.schedule) if result.schedule is not None else [],
+            monthly_totals=DebtCalculator._build_monthly_totals(result.monthly) if result.monthly is not None else None
         )
 
     @staticmethod
-    def _calculate_savings(debts: List[Debt], total_payments: float) -> float:
-        # Calcular cuánto pagarían solo con pagos mínimos
-        total_minimum_payments = sum(debt.minimum_payment for debt in debts)
-        average_interest_rate = sum(debt.interest_rate for debt in debts) / len(debts)
-        total_debt = sum(debt.balance for debt in debts)
-        
-        # Estimación simple de ahorros
-        months_with_minimums = total_debt / total_minimum_payments if total_minimum_payments > 0 else 0
-        interest_with_minimums = total_debt * (average_interest_rate / 100) * (months_with_minimums / 12)
-        total_with_minimums = total_debt + interest_with_minimums
-        
-        return max(0, total_with_minimums - total_payments)
+    def _detail_of(result: debt_engine.SimulationResult) -> str:
+        if result.schedule is not None:
+            return "full"
+        if result.monthly is not None:
+            return "monthly"
+        return "summary"
+
+    @staticmethod
+    @result_cache.cached("debt.calculate_columnar", DebtPaymentPlanColumnar)
+    def calculate_columnar_plan(debts: List[Debt], extra_payment: float, monthly_income: float, strategy: str, custom_priorities: Optional[Dict[str, int]] = None, detail: str = "full") -> DebtPaymentPlanColumnar:
+        """
+        Calcula el plan con el calendario en columnas (un arreglo por campo)
+        y una tabla de deudas referenciada por `debt_index`, sin construir
+        un objeto por fila.
+        """
+        explain, tips = DebtCalculator._strategy_texts(strategy)
+        result = DebtCalculator._simulate(debts, extra_payment, debt_engine.ORDERINGS[strategy], custom_priorities, detail)
+        schedule = result.schedule
+        monthly = result.monthly
+
+        return DebtPaymentPlanColumnar(
+            **DebtCalculator._plan_summary(strategy, debts, extra_payment, result, explain, tips),
+            debts=[DebtReference(id=debt.id, name=debt.name, type=debt.type) for debt in debts],
+            schedule=DebtScheduleColumns(
+                month=schedule.month.tolist(),
+                debt_index=schedule.debt_index.tolist(),
+                payment=np.round(schedule.payment, 2).tolist(),
+                principal=np.round(schedule.principal, 2).tolist(),
+                interest=np.round(schedule.interest, 2).tolist(),
+                remaining_balance=np.round(schedule.remaining_balance, 2).tolist()
+            ) if schedule is not None else None,
+            monthly_totals=DebtMonthlyColumns(
+                month=monthly.month.tolist(),
+                payment=np.round(monthly.payment, 2).tolist(),
+                principal=np.round(monthly.principal, 2).tolist(),
+                interest=np.round(monthly.interest, 2).tolist(),
+                remaining_balance=np.round(monthly.remaining_balance, 2).tolist(),
+                active_debts=monthly.active_debts.tolist()
+            ) if monthly is not None else None
+        )
+
+    @staticmethod
+    def stream_plan(request: DebtCalculationRequest) -> Iterator[str]:
+        """
+        Calcula el plan mes a mes y lo produce como NDJSON: primero los
+        renglones de cada mes ("payment" en detalle full, "monthly_total"
+        en detalle monthly) y al final un renglón "summary" con los
+        acumulados. La memoria no crece con el horizonte del plan.
+        """
+        _validate_plan_request(request)
+        debts = request.debts
+        explain, tips = DebtCalculator._strategy_texts(request.strategy)
+        balances, rates, minimums, priority = DebtCalculator._to_arrays(debts, request.custom_priorities)
+        order = debt_engine.ORDERINGS[request.strategy](balances, rates, priority)
+
+        if request.detail == "summary":
+            result = debt_engine.simulate(balances, rates, minimums, request.extra_payment, order, detail="summary")
+        else:
+            months = debt_engine.iter_schedule(balances, rates, minimums, request.extra_payment, order)
+            while True:
+                try:
+                    rows = next(months)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+                yield DebtCalculator._encode_month(debts, rows, request.detail)
+
+        summary = DebtCalculator._plan_summary(request.strategy, debts, request.extra_payment, result, explain, tips)
+        summary["detail"] = request.detail
+        yield json.dumps({"type": "summary", **summary}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    @staticmethod
+    def _encode_month(debts: List[Debt], rows: debt_engine.PaymentSchedule, detail: str) -> str:
+        if detail == "monthly":
+            records = [{
+                "type": "monthly_total",
+                "month": int(rows.month[0]),
+                "payment": round(float(rows.payment.sum()), 2),
+                "principal": round(float(rows.principal.sum()), 2),
+                "interest": round(float(rows.interest.sum()), 2),
+                "remaining_balance": round(float(rows.remaining_balance.sum()), 2),
+                "active_debts": len(rows)
+            }]
+        else:
+            records = [
+                {
+                    "type": "payment",
+                    "month": month,
+                    "debt_id": debts[index].id,
+                    "debt_name": debts[index].name,
+                    "payment": round(payment, 2),
+                    "principal": round(principal, 2),
+                    "interest": round(interest, 2),
+                    "remaining_balance": round(remaining, 2),
+                    "is_paid_off": remaining <= 0
+                }
+                for month, index, payment, principal, interest, remaining in zip(
+                    rows.month.tolist(),
+                    rows.debt_index.tolist(),
+                    rows.payment.tolist(),
+                    rows.principal.tolist(),
+                    rows.interest.tolist(),
+                    rows.remaining_balance.tolist()
+                )
+            ]
+        return "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records)
+
+    @staticmethod
+    def _strategy_texts(strategy: str):
+        if strategy == "avalanche":
+            return DebtCalculator._generate_avalanche_explanation, DebtCalculator._generate_avalanche_tips
+        if strategy == "snowball":
+            return DebtCalculator._generate_snowball_explanation, DebtCalculator._generate_snowball_tips
+        if strategy == "custom":
+            return DebtCalculator._generate_custom_explanation, DebtCalculator._generate_custom_tips
+        raise ValueError(f"Estrategia no válida: {strategy}")
+
+    @staticmethod
+    @result_cache.cached("debt.compare", DebtComparison)
+    def compare_strategies(debts: List[Debt], extra_payment: float, monthly_income: float, custom_priorities: Optional[Dict[str, int]] = None, detail: str = "full") -> DebtComparison:
+        """
+        Compara todas las estrategias contra el escenario de solo pagos
+        mínimos, construyendo los arreglos de deudas una sola vez.
+        """
+        priorities = DebtCalculator._priorities(debts, custom_priorities)
+        balances, rates, minimums, priority = DebtCalculator._to_arrays(debts, priorities)
+        baseline = DebtCalculator._simulate_minimum_only(balances, rates, minimums)
+
+        plans = {}
+        for strategy, ordering in debt_engine.ORDERINGS.items():
+            # La estrategia personalizada solo aplica si hay prioridades
+            if strategy == "custom" and not priorities:
+                continue
+            order = ordering(balances, rates, priority)
+            result = debt_engine.simulate(balances, rates, minimums, extra_payment, order, detail=detail)
+            explain, tips = DebtCalculator._strategy_texts(strategy)
+            plans[strategy] = DebtCalculator._build_plan(strategy, debts, extra_payment, result, explain, tips, baseline)
+
+        return DebtComparison(
+            analysis=DebtCalculator.analyze_debts(debts, monthly_income),
+            baseline=DebtBaseline(
+                months_to_freedom=baseline.months,
+                total_interest=round(baseline.total_interest, 2),
+                total_payments=round(baseline.total_payments, 2),
+                # Liquidada si se pagó en algún mes o si empezó en cero
+                paid_off=bool(((baseline.payoff_month > 0) | (balances <= 0)).all())
+            ),
+            plans=plans,
+            cheapest_strategy=min(plans, key=lambda strategy: plans[strategy].total_interest),
+            fastest_strategy=min(plans, key=lambda strategy: plans[strategy].months_to_freedom)
+        )
+
+    @staticmethod
+    def simulate_rate_shocks(request: DebtSimulationRequest) -> DebtSimulationResult:
+        """
+        Simula choques de tasa e ingreso sobre el mismo conjunto de deudas
+        y devuelve bandas de percentiles del plazo y los intereses.
+        """
+        _validate_plan_request(request)
+        debts = request.debts
+        seed = request.seed if request.seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+
+        balances, rates, minimums, priority = DebtCalculator._to_arrays(debts, request.custom_priorities)
+        order = debt_engine.ORDERINGS[request.strategy](balances, rates, priority)
+        variable_rate = np.array([debt.type not in request.fixed_rate_types for debt in debts], dtype=np.float64)
+
+        deterministic = debt_engine.simulate(balances, rates, minimums, request.extra_payment, order, detail="summary")
+        result = debt_engine.simulate_paths(
+            balances, rates, minimums, request.extra_payment, order,
+            paths=request.paths,
+            rng=np.random.default_rng(seed),
+            rate_volatility=request.rate_volatility,
+            variable_rate=variable_rate,
+            monthly_income=request.monthly_income,
+            income_volatility=request.income_volatility
+        )
+
+        return DebtSimulationResult(
+            strategy=request.strategy,
+            paths=request.paths,
+            seed=seed,
+            months_to_freedom=DebtCalculator._percentiles(result.months),
+            total_interest=DebtCalculator._percentiles(result.total_interest),
+            probability_debt_free=round(float(result.paid_off.mean()), 4),
+            deterministic_months=deterministic.months,
+            deterministic_interest=round(deterministic.total_interest, 2)
+        )
+
+    @staticmethod
+    @result_cache.cached("debt.optimize", DebtOptimizationResult)
+    def optimize(request: DebtOptimizationRequest) -> DebtOptimizationResult:
+        """
+        Busca el orden de pago que minimiza intereses o plazo y, si se
+        indica `target_months`, el pago extra mínimo para cumplir ese plazo.
+        Con pocas deudas el orden es óptimo; con más es el mejor encontrado
+        por búsqueda local (ver `exhaustive`).
+        """
+        _validate_debts_request(request)
+        if request.objective not in debt_engine.OBJECTIVES:
+            raise ValueError(f"Objetivo no válido: {request.objective}")
+
+        debts = request.debts
+        balances, rates, minimums, _ = DebtCalculator._to_arrays(debts)
+        order, result, evaluated, exhaustive = debt_engine.optimize_order(balances, rates, minimums, request.extra_payment, request.objective)
+
+        required_extra = None
+        if request.target_months is not None:
+            extra = debt_engine.minimum_extra_payment(balances, rates, minimums, order, request.target_months)
+            required_extra = math.ceil(extra * 100) / 100
+
+        return DebtOptimizationResult(
+            objective=request.objective,
+            order=[debts[index].id for index in order],
+            priorities={debts[index].id: position + 1 for position, index in enumerate(order)},
+            months_to_freedom=result.months,
+            total_interest=round(result.total_interest, 2),
+            total_payments=round(result.total_payments, 2),
+            evaluated_orders=evaluated,
+            exhaustive=exhaustive,
+            target_months=request.target_months,
+            required_extra_payment=required_extra
+        )
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> DebtPercentiles:
+        p5, p25, p50, p75, p95 = np.percentile(values, [5, 25, 50, 75, 95]).round(2).tolist()
+        return DebtPercentiles(p5=p5, p25=p25, p50=p50, p75=p75, p95=p95)
+
+    @staticmethod
+    def _simulate_minimum_only(balances: np.ndarray, rates: np.ndarray, minimums: np.ndarray) -> debt_engine.SimulationResult:
+        # Escenario base: cada deuda paga solo su mínimo, sin reasignar pagos liberados
+        order = np.arange(len(balances))
+        return debt_engine.simulate(balances, rates, minimums, 0, order, rollover=False, detail="summary")
+
+    @staticmethod
+    def _calculate_savings(baseline: debt_engine.SimulationResult, result: debt_engine.SimulationResult) -> float:
+        # Intereses que se evitan frente a pagar solo los mínimos
+        return max(0, baseline.total_interest - result.total_interest)
 
     @staticmethod
     def _generate_avalanche_explanation(debts: List[Debt], months_to_freedom: int, savings: float) -> str:
@@ -384,115 +629,188 @@ class DebtCalculator:
             "Revisa tu progreso mensualmente y ajusta si es necesario"
         ]
 
+def _validate_debts_request(request: DebtCalculationRequest) -> None:
+    if not request.debts:
+        raise ValueError("No se pueden calcular planes sin deudas")
+    
+    if request.monthly_income <= 0:
+        raise ValueError("El ingreso mensual debe ser mayor a 0")
+    
+    if request.detail not in debt_engine.DETAIL_LEVELS:
+        raise ValueError(f"Nivel de detalle no válido: {request.detail}")
+
+def _validate_plan_request(request: DebtCalculationRequest) -> None:
+    _validate_debts_request(request)
+    
+    if request.strategy not in debt_engine.ORDERINGS:
+        raise ValueError(f"Estrategia no válida: {request.strategy}")
+    
+    if request.strategy == "custom" and not DebtCalculator._priorities(request.debts, request.custom_priorities):
+        raise ValueError("La estrategia custom requiere prioridades (custom_priorities o priority de cada deuda)")
+
 @router.post("/analyze", response_model=DebtAnalysis)
-async def analyze_debts(request: DebtCalculationRequest):
+async def analyze_debts(request: DebtCalculationRequest, http_request: Request):
     """
     Analiza las deudas y recomienda una estrategia
     """
     try:
         analysis = DebtCalculator.analyze_debts(request.debts, request.monthly_income)
-        return analysis
+        return encode_response(analysis, http_request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error analizando deudas: {str(e)}")
 
 @router.post("/calculate", response_model=DebtPaymentPlan)
-async def calculate_payment_plan(request: DebtCalculationRequest):
+async def calculate_payment_plan(request: DebtCalculationRequest, http_request: Request):
     """
     Calcula un plan de pagos personalizado
     """
     try:
-        if not request.debts:
-            raise ValueError("No se pueden calcular planes sin deudas")
-        
-        if request.monthly_income <= 0:
-            raise ValueError("El ingreso mensual debe ser mayor a 0")
-        
-        if request.strategy == "avalanche":
-            plan = DebtCalculator.calculate_avalanche_strategy(request.debts, request.extra_payment, request.monthly_income)
-        elif request.strategy == "snowball":
-            plan = DebtCalculator.calculate_snowball_strategy(request.debts, request.extra_payment, request.monthly_income)
-        elif request.strategy == "custom":
-            if not request.custom_priorities:
-                raise ValueError("Las prioridades personalizadas son requeridas para la estrategia custom")
-            plan = DebtCalculator.calculate_custom_strategy(request.debts, request.extra_payment, request.monthly_income, request.custom_priorities)
-        else:
-            raise ValueError(f"Estrategia no válida: {request.strategy}")
-        
-        return plan
+        plan = DebtCalculator.calculate_plan(request)
+        return encode_response(plan, http_request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error calculando plan de pagos: {str(e)}")
 
+@router.post("/calculate/stream")
+async def stream_payment_plan(request: DebtCalculationRequest):
+    """
+    Calcula un plan de pagos y lo transmite como NDJSON, un mes a la vez,
+    con el resumen del plan como último renglón
+    """
+    try:
+        _validate_plan_request(request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando plan de pagos: {str(e)}")
+
+    return StreamingResponse(DebtCalculator.stream_plan(request), media_type="application/x-ndjson")
+
+@router.post("/calculate/columnar", response_model=DebtPaymentPlanColumnar)
+async def calculate_payment_plan_columnar(request: DebtCalculationRequest, http_request: Request):
+    """
+    Calcula un plan de pagos con el calendario en formato columnar
+    """
+    try:
+        _validate_plan_request(request)
+        plan = DebtCalculator.calculate_columnar_plan(
+            request.debts, request.extra_payment, request.monthly_income,
+            request.strategy, request.custom_priorities, request.detail
+        )
+        return encode_response(plan, http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando plan de pagos: {str(e)}")
+
+@router.post("/compare", response_model=DebtComparison)
+async def compare_strategies(request: DebtCalculationRequest, http_request: Request):
+    """
+    Compara todas las estrategias de pago y el escenario de solo mínimos
+    """
+    try:
+        _validate_debts_request(request)
+        comparison = DebtCalculator.compare_strategies(
+            request.debts, request.extra_payment, request.monthly_income,
+            request.custom_priorities, request.detail
+        )
+        return encode_response(comparison, http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error comparando estrategias: {str(e)}")
+
+@router.post("/simulate", response_model=DebtSimulationResult)
+def simulate_rate_shocks(request: DebtSimulationRequest, http_request: Request):
+    """
+    Simula miles de escenarios de tasas e ingresos (Monte Carlo)
+    """
+    try:
+        return encode_response(DebtCalculator.simulate_rate_shocks(request), http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error simulando escenarios: {str(e)}")
+
+@router.post("/optimize", response_model=DebtOptimizationResult)
+def optimize_payment_order(request: DebtOptimizationRequest, http_request: Request):
+    """
+    Calcula el mejor orden de pago encontrado (óptimo con pocas deudas) y el
+    pago extra necesario para una meta
+    """
+    try:
+        return encode_response(DebtCalculator.optimize(request), http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error optimizando pagos: {str(e)}")
+
+DEBT_STRATEGIES = {
+    "avalanche": {
+        "name": "Método Avalancha",
+        "description": "Paga primero la deuda con mayor tasa de interés",
+        "pros": ["Ahorra más dinero en intereses", "Estratégicamente eficiente"],
+        "cons": ["Puede tomar más tiempo ver progreso", "Requiere disciplina"],
+        "best_for": "Personas que quieren ahorrar dinero y tienen disciplina"
+    },
+    "snowball": {
+        "name": "Método Bola de Nieve",
+        "description": "Paga primero la deuda más pequeña",
+        "pros": ["Motivación rápida", "Libera dinero rápido"],
+        "cons": ["Puede costar más en intereses", "No es matemáticamente óptimo"],
+        "best_for": "Personas que necesitan motivación y progreso visible"
+    },
+    "custom": {
+        "name": "Estrategia Personalizada",
+        "description": "Prioriza deudas según tus necesidades específicas",
+        "pros": ["Flexibilidad total", "Se adapta a tu situación"],
+        "cons": ["Requiere más planificación", "Puede no ser óptimo"],
+        "best_for": "Personas con circunstancias especiales o preferencias específicas"
+    }
+}
+
+_DEBT_STRATEGIES_RESPONSE = PrecomputedResponse(DEBT_STRATEGIES)
+
 @router.get("/strategies")
-async def get_debt_strategies():
+async def get_debt_strategies(request: Request):
     """
     Obtiene información sobre las estrategias de pago disponibles
     """
-    strategies = {
-        "avalanche": {
-            "name": "Método Avalancha",
-            "description": "Paga primero la deuda con mayor tasa de interés",
-            "pros": ["Ahorra más dinero en intereses", "Estratégicamente eficiente"],
-            "cons": ["Puede tomar más tiempo ver progreso", "Requiere disciplina"],
-            "best_for": "Personas que quieren ahorrar dinero y tienen disciplina"
-        },
-        "snowball": {
-            "name": "Método Bola de Nieve",
-            "description": "Paga primero la deuda más pequeña",
-            "pros": ["Motivación rápida", "Libera dinero rápido"],
-            "cons": ["Puede costar más en intereses", "No es matemáticamente óptimo"],
-            "best_for": "Personas que necesitan motivación y progreso visible"
-        },
-        "custom": {
-            "name": "Estrategia Personalizada",
-            "description": "Prioriza deudas según tus necesidades específicas",
-            "pros": ["Flexibilidad total", "Se adapta a tu situación"],
-            "cons": ["Requiere más planificación", "Puede no ser óptimo"],
-            "best_for": "Personas con circunstancias especiales o preferencias específicas"
-        }
+    return _DEBT_STRATEGIES_RESPONSE.respond(request)
+
+DEBT_TYPES = {
+    "credit_card": {
+        "name": "Tarjeta de Crédito",
+        "icon": "💳",
+        "color": "red",
+        "description": "Deudas de tarjetas de crédito"
+    },
+    "personal_loan": {
+        "name": "Préstamo Personal",
+        "icon": "🏦",
+        "color": "blue",
+        "description": "Préstamos personales de bancos"
+    },
+    "mortgage": {
+        "name": "Hipoteca",
+        "icon": "🏠",
+        "color": "green",
+        "description": "Préstamos hipotecarios"
+    },
+    "car_loan": {
+        "name": "Préstamo de Auto",
+        "icon": "🚗",
+        "color": "purple",
+        "description": "Préstamos para vehículos"
+    },
+    "student_loan": {
+        "name": "Préstamo Estudiantil",
+        "icon": "🎓",
+        "color": "indigo",
+        "description": "Préstamos para educación"
+    },
+    "other": {
+        "name": "Otra Deuda",
+        "icon": "📋",
+        "color": "gray",
+        "description": "Otros tipos de deudas"
     }
-    return strategies
+}
+
+_DEBT_TYPES_RESPONSE = PrecomputedResponse(DEBT_TYPES)
 
 @router.get("/debt-types")
-async def get_debt_types():
+async def get_debt_types(request: Request):
     """
     Obtiene los tipos de deudas disponibles
     """
-    debt_types = {
-        "credit_card": {
-            "name": "Tarjeta de Crédito",
-            "icon": "💳",
-            "color": "red",
-            "description": "Deudas de tarjetas de crédito"
-        },
-        "personal_loan": {
-            "name": "Préstamo Personal",
-            "icon": "🏦",
-            "color": "blue",
-            "description": "Préstamos personales de bancos"
-        },
-        "mortgage": {
-            "name": "Hipoteca",
-            "icon": "🏠",
-            "color": "green",
-            "description": "Préstamos hipotecarios"
-        },
-        "car_loan": {
-            "name": "Préstamo de Auto",
-            "icon": "🚗",
-            "color": "purple",
-            "description": "Préstamos para vehículos"
-        },
-        "student_loan": {
-            "name": "Préstamo Estudiantil",
-            "icon": "🎓",
-            "color": "indigo",
-            "description": "Préstamos para educación"
-        },
-        "other": {
-            "name": "Otra Deuda",
-            "icon": "📋",
-            "color": "gray",
-            "description": "Otros tipos de deudas"
-        }
-    }
-    return debt_types
+    return _DEBT_TYPES_RESPONSE.respond(request)
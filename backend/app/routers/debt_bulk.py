@@ -0,0 +1,370 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import codecs
+import json
+import os
+import re
+import tempfile
+
+from starlette.concurrency import run_in_threadpool
+
+from app.routers.debt import DebtCalculator, DebtCalculationRequest, DebtPaymentPlan
+
+router = APIRouter(prefix="/debt", tags=["debt"])
+
+# Número de procesos para los planes masivos (por defecto, uno por núcleo)
+DEFAULT_WORKERS = int(os.environ.get("DEBT_BULK_WORKERS", "0")) or os.cpu_count() or 1
+
+# Hogares por tarea enviada al pool, para amortizar el costo de IPC
+DEFAULT_CHUNK_SIZE = 64
+
+# El cuerpo se guarda en memoria hasta este tamaño y después en disco
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+READ_BYTES = 64 * 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Pool de procesos compartido por el endpoint masivo"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=DEFAULT_WORKERS)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def _calculate_one(payload: Any) -> DebtPaymentPlan:
+    request = payload if isinstance(payload, DebtCalculationRequest) else DebtCalculationRequest(**payload)
+    return DebtCalculator.calculate_plan(request)
+
+
+def _calculate_chunk(chunk: List[Tuple[int, Any]]) -> List[Tuple[int, Optional[DebtPaymentPlan], Optional[str]]]:
+    results = []
+    for index, payload in chunk:
+        try:
+            results.append((index, _calculate_one(payload), None))
+        except Exception as e:
+            results.append((index, None, str(e)))
+    return results
+
+
+def _encode_chunk(chunk: List[Tuple[int, Any]]) -> bytes:
+    # Serializar en el proceso hijo para no cargar el proceso del servidor
+    lines = []
+    for index, plan, error in _calculate_chunk(chunk):
+        if error is None:
+            lines.append(f'{{"index":{index},"plan":{plan.model_dump_json()}}}')
+        else:
+            lines.append(json.dumps({"index": index, "error": error}, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _chunks(payloads: Iterable[Any], chunk_size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk = []
+    for index, payload in enumerate(payloads):
+        chunk.append((index, payload))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def calculate_bulk(
+    payloads: Iterable[Any],
+    max_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[int, Optional[DebtPaymentPlan], Optional[str]]]:
+    """
+    Calcula planes para muchos hogares en un pool de procesos.
+
+    Acepta `DebtCalculationRequest` o diccionarios equivalentes y produce
+    tuplas (índice, plan, error) conforme terminan, no en el orden de entrada.
+    Un hogar inválido produce su error sin detener a los demás.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_calculate_chunk, chunk) for chunk in _chunks(payloads, chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+async def _stream_bulk(payloads: AsyncIterator[Tuple[int, Any]], chunk_size: int):
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    # Limitar las tareas en vuelo: el cuerpo se sigue leyendo solo cuando
+    # el pool se desocupa, así la memoria no crece con el tamaño del lote
+    max_in_flight = 2 * DEFAULT_WORKERS
+    pending = set()
+    chunk = []
+
+    async def submit(chunk):
+        nonlocal pending
+        pending.add(loop.run_in_executor(executor, _encode_chunk, chunk))
+        if len(pending) >= max_in_flight:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            return [task.result() for task in done]
+        return []
+
+    try:
+        async for index, payload in payloads:
+            if isinstance(payload, Exception):
+                yield (json.dumps({"index": index, "error": str(payload)}, ensure_ascii=False) + "\n").encode("utf-8")
+                continue
+            chunk.append((index, payload))
+            if len(chunk) >= chunk_size:
+                for result in await submit(chunk):
+                    yield result
+                chunk = []
+        if chunk:
+            for result in await submit(chunk):
+                yield result
+    except ValueError as e:
+        # Un cuerpo mal formado a mitad del envío ya no puede ser un 400
+        yield (json.dumps({"error": f"Error leyendo solicitudes: {str(e)}"}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
+async def _iter_text(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for data in stream:
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+async def _iter_ndjson(text: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Una solicitud por línea; una línea inválida solo afecta a su hogar"""
+    index = 0
+    buffer = ""
+
+    def parse(line: str) -> Any:
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return ValueError(f"JSON inválido: {str(e)}")
+
+    async for piece in text:
+        buffer += piece
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield index, parse(line)
+                index += 1
+    if buffer.strip():
+        yield index, parse(buffer)
+
+
+# Caracteres que importan al buscar el fin de un elemento JSON
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+_STRING_STOP = re.compile(r'["\\]')
+_LITERAL_END = re.compile(r'[\s,\]]')
+
+
+class _ElementScanner:
+    """
+    Encuentra el fin de un elemento JSON que llega en pedazos. Cada pedazo
+    se recorre una sola vez, saltando con expresiones regulares entre los
+    caracteres que importan, así que un elemento grande se decodifica una
+    sola vez al completarse y no cada vez que llega más texto.
+    """
+
+    def __init__(self, first_char: str):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        # Números y literales (true, null...) terminan en un separador
+        self.literal = first_char not in '{["'
+
+    def feed(self, text: str, i: int) -> Optional[int]:
+        """Índice después del fin del elemento en `text`, o None si sigue en el próximo pedazo"""
+        if self.literal:
+            match = _LITERAL_END.search(text, i)
+            return match.start() if match else None
+        while i < len(text):
+            if self.escape:
+                self.escape = False
+                i += 1
+                continue
+            if self.in_string:
+                match = _STRING_STOP.search(text, i)
+                if match is None:
+                    return None
+                i = match.end()
+                if match.group() == "\\":
+                    self.escape = True
+                    continue
+                self.in_string = False
+                if self.depth == 0:
+                    return i
+                continue
+            match = _STRUCTURE.search(text, i)
+            if match is None:
+                return None
+            i = match.end()
+            char = match.group()
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i
+        return None
+
+
+async def _iter_json_array(text: AsyncIterator[str], first: str) -> AsyncIterator[Tuple[int, Any]]:
+    """Elementos de un arreglo JSON conforme llegan, sin cargar el arreglo completo"""
+    buffer = first
+    position = 0
+    index = 0
+
+    async def fill() -> bool:
+        nonlocal buffer, position
+        try:
+            buffer = await text.__anext__()
+        except StopAsyncIteration:
+            return False
+        position = 0
+        return True
+
+    async def skip_whitespace() -> Optional[str]:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not await fill():
+                return None
+
+    async def read_element() -> str:
+        # Los pedazos del elemento se unen una sola vez al encontrar su fin
+        nonlocal position
+        scanner = _ElementScanner(buffer[position])
+        parts = []
+        while True:
+            end = scanner.feed(buffer, position)
+            if end is not None:
+                parts.append(buffer[position:end])
+                position = end
+                return "".join(parts)
+            parts.append(buffer[position:])
+            position = len(buffer)
+            if not await fill():
+                if scanner.literal:
+                    return "".join(parts)
+                raise ValueError(f"JSON incompleto en la solicitud {index}")
+
+    if await skip_whitespace() != "[":
+        raise ValueError("Se esperaba un arreglo JSON de solicitudes")
+    position += 1
+
+    if await skip_whitespace() == "]":
+        position += 1
+    else:
+        while True:
+            if await skip_whitespace() is None:
+                raise ValueError(f"JSON incompleto en la solicitud {index}")
+            element = await read_element()
+            try:
+                payload = json.loads(element)
+            except ValueError:
+                raise ValueError(f"JSON inválido en la solicitud {index}")
+            yield index, payload
+            index += 1
+
+            separator = await skip_whitespace()
+            position += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError(f"Se esperaba ',' o ']' después de la solicitud {index - 1}")
+
+    if await skip_whitespace() is not None:
+        raise ValueError("Contenido después del arreglo JSON")
+
+
+async def _spool_body(stream: AsyncIterator[bytes]) -> tempfile.SpooledTemporaryFile:
+    """
+    Copia el cuerpo a un archivo temporal conforme llega. La respuesta en
+    streaming escucha la desconexión del cliente con `receive`, así que el
+    cuerpo no puede seguir leyéndose mientras se responde.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    async for data in stream:
+        size += len(data)
+        # Pasado el tope el archivo está en disco: escribir fuera del event loop
+        if size > SPOOL_MAX_BYTES:
+            await run_in_threadpool(spool.write, data)
+        else:
+            spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+async def _read_spool(spool: tempfile.SpooledTemporaryFile) -> AsyncIterator[bytes]:
+    try:
+        while True:
+            data = await run_in_threadpool(spool.read, READ_BYTES)
+            if not data:
+                break
+            yield data
+    finally:
+        spool.close()
+
+
+async def _iter_payloads(stream: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Lee las solicitudes de forma incremental (NDJSON o arreglo JSON). Antes
+    de devolver el iterador valida el inicio del cuerpo, para que un formato
+    equivocado todavía responda 400.
+    """
+    text = _iter_text(stream).__aiter__()
+    if "ndjson" in content_type:
+        return _iter_ndjson(text)
+
+    first = ""
+    async for piece in text:
+        first += piece
+        if first.strip():
+            break
+    if not first.lstrip().startswith("["):
+        raise ValueError("Se esperaba un arreglo JSON de solicitudes")
+    return _iter_json_array(text, first)
+
+
+@router.post("/calculate-bulk")
+async def calculate_payment_plans_bulk(request: Request, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Calcula planes de pago para muchos hogares (arreglo JSON o NDJSON)
+    y devuelve los resultados como NDJSON conforme terminan
+    """
+    try:
+        if chunk_size < 1:
+            raise ValueError("chunk_size debe ser mayor a 0")
+        spool = await _spool_body(request.stream())
+        payloads = await _iter_payloads(_read_spool(spool), request.headers.get("content-type", ""))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error leyendo solicitudes: {str(e)}")
+
+    return StreamingResponse(_stream_bulk(payloads, chunk_size), media_type="application/x-ndjson")
@@ -0,0 +1,338 @@
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import io
+import json
+import numpy as np
+
+from app.services import loan_engine, loan_index
+from app.responses import encode_response, pq
+
+router = APIRouter(prefix="/loans", tags=["loans"])
+
+class LoanOffer(BaseModel):
+    id: str = Field(..., description="Identificador interno")
+    name: str = Field(..., description="Etiqueta para mostrar")
+    amount: float = Field(..., gt=0, description="Monto del préstamo")
+    annual_rate: float = Field(..., ge=0, le=1, description="Tasa nominal anual (0..1)")
+    term_months: int = Field(..., ge=1, le=600, description="Plazo en meses")
+    origination_fee_pct: float = Field(0, ge=0, lt=1, description="Comisión por apertura sobre el monto (0..1)")
+    origination_fee_flat: float = Field(0, ge=0, description="Comisión fija adicional")
+    extra_monthly_payment: float = Field(0, ge=0, description="Abono extra mensual")
+
+class UserContext(BaseModel):
+    monthly_income: float = Field(0, ge=0, description="Ingreso mensual bruto")
+    other_monthly_debt: float = Field(0, ge=0, description="Otros pagos de deuda")
+
+class LoanComparisonRequest(BaseModel):
+    loans: List[LoanOffer] = Field(..., min_length=1, max_length=1000, description="Ofertas a comparar")
+    user: UserContext = Field(default_factory=UserContext)
+    schedule: Optional[str] = Field(None, description='ID del préstamo cuyo calendario se devuelve, o "best" para el de menor costo total')
+
+class LoanMetrics(BaseModel):
+    id: str
+    name: str
+    monthly_payment: float = Field(..., description="Pago estándar")
+    monthly_payment_with_extra: float = Field(..., description="Pago con abono extra")
+    total_interest: float = Field(..., description="Interés total sin abono extra")
+    total_interest_with_extra: float = Field(..., description="Interés total con abono extra")
+    total_cost: float = Field(..., description="Principal + interés + comisiones sin abono extra")
+    total_cost_with_extra: float = Field(..., description="Principal + interés + comisiones con abono extra")
+    payoff_months: int = Field(..., description="Meses para liquidar sin abono extra")
+    payoff_months_with_extra: int = Field(..., description="Meses para liquidar con abono extra")
+    interest_saved: float = Field(..., description="Interés que se ahorra con el abono extra")
+    origination_fees_total: float = Field(..., description="Comisiones totales")
+    apr: float = Field(..., description="Costo anual real con comisiones (%)")
+    effective_annual_rate: float = Field(..., description="Tasa efectiva anual con comisiones (%)")
+    dti: float = Field(..., description="Razón deuda/ingreso con el pago estándar")
+
+class AmortizationPoint(BaseModel):
+    month: int
+    payment: float
+    interest: float
+    principal: float
+    balance: float
+
+class LoanComparisonResult(BaseModel):
+    loans: List[LoanMetrics]
+    best_by_total_cost: Optional[str]
+    best_by_lowest_payment: Optional[str]
+    best_by_fastest_payoff: Optional[str]
+    best_by_apr: Optional[str]
+    analysis_summary: str
+    recommendations: List[str]
+    schedule_loan_id: Optional[str] = Field(None, description="Préstamo del calendario devuelto")
+    selected_schedule: List[AmortizationPoint] = Field(default_factory=list, description="Calendario con abono extra, solo si se pidió")
+
+class LoanCatalogueInput(BaseModel):
+    # Catálogo en formato columnar: una lista por campo, todas del mismo largo
+    id: List[str]
+    name: Optional[List[str]] = None
+    annual_rate: List[float]
+    term_months: List[int]
+    origination_fee_pct: Optional[List[float]] = None
+    origination_fee_flat: Optional[List[float]] = None
+    min_amount: Optional[List[float]] = None
+    max_amount: Optional[List[float]] = None
+
+class LoanCatalogueInfo(BaseModel):
+    count: int
+    flat_fee_products: int = Field(..., description="Productos con comisión fija (APR por consulta)")
+    min_rate: float
+    max_rate: float
+    min_term_months: int
+    max_term_months: int
+
+class LoanSearchRequest(BaseModel):
+    amount: float = Field(..., gt=0, description="Monto solicitado")
+    monthly_income: float = Field(..., gt=0, description="Ingreso mensual bruto")
+    other_monthly_debt: float = Field(0, ge=0, description="Otros pagos de deuda")
+    metric: str = Field("total_cost", description="Métrica de orden: " + ", ".join(loan_index.METRICS))
+    descending: bool = Field(False, description="Ordenar de mayor a menor")
+    k: int = Field(10, ge=1, le=1000, description="Número de resultados")
+    max_dti: Optional[float] = Field(None, ge=0, description="DTI máximo (0..1)")
+    max_monthly_payment: Optional[float] = Field(None, ge=0, description="Pago mensual máximo")
+    max_apr: Optional[float] = Field(None, ge=0, description="APR máxima (%)")
+    min_term_months: Optional[int] = Field(None, ge=1, description="Plazo mínimo")
+    max_term_months: Optional[int] = Field(None, ge=1, description="Plazo máximo")
+
+class LoanSearchHit(BaseModel):
+    id: str
+    name: str
+    annual_rate: float
+    term_months: int
+    monthly_payment: float
+    total_interest: float
+    total_cost: float
+    origination_fees_total: float
+    apr: float = Field(..., description="Costo anual real con comisiones (%)")
+    dti: float
+
+class LoanSearchResult(BaseModel):
+    metric: str
+    matched: int = Field(..., description="Productos que cumplen los filtros")
+    results: List[LoanSearchHit]
+
+class LoanCalculator:
+    # Razón deuda/ingreso a partir de la cual se advierte riesgo
+    DTI_WARNING = 0.43
+
+    @staticmethod
+    def compare(request: LoanComparisonRequest) -> LoanComparisonResult:
+        """
+        Compara ofertas de préstamo con fórmulas cerradas: pago, mes de
+        liquidación e interés con y sin abono extra, y APR por TIR de los
+        flujos netos de comisiones, todo vectorizado sobre las ofertas
+        """
+        loans = request.loans
+        amount = np.array([loan.amount for loan in loans])
+        rate = np.array([loan.annual_rate for loan in loans])
+        term = np.array([loan.term_months for loan in loans])
+        extra = np.array([loan.extra_monthly_payment for loan in loans])
+        fees = amount * np.array([loan.origination_fee_pct for loan in loans]) + np.array([loan.origination_fee_flat for loan in loans])
+        # Sin monto neto no hay APR; el catálogo descarta estos productos igual
+        consumed = fees >= amount
+        if consumed.any():
+            ids = ", ".join(loan.id for loan, bad in zip(loans, consumed) if bad)
+            raise ValueError(f"Las comisiones consumen todo el monto del préstamo: {ids}")
+
+        payment = loan_engine.monthly_payment(amount, rate, term)
+        base = loan_engine.payoff(amount, rate, payment)
+        with_extra = loan_engine.payoff(amount, rate, payment + extra)
+        monthly_apr = loan_engine.apr(amount, rate, term, fees) / 12
+
+        user = request.user
+        dti = (payment + user.other_monthly_debt) / user.monthly_income if user.monthly_income > 0 else np.zeros(len(loans))
+
+        metrics = [
+            LoanMetrics(
+                id=loan.id,
+                name=loan.name,
+                monthly_payment=payment[i],
+                monthly_payment_with_extra=payment[i] + extra[i],
+                total_interest=base["total_interest"][i],
+                total_interest_with_extra=with_extra["total_interest"][i],
+                total_cost=base["total_paid"][i] + fees[i],
+                total_cost_with_extra=with_extra["total_paid"][i] + fees[i],
+                payoff_months=int(base["months"][i]),
+                payoff_months_with_extra=int(with_extra["months"][i]),
+                interest_saved=base["total_interest"][i] - with_extra["total_interest"][i],
+                origination_fees_total=fees[i],
+                apr=monthly_apr[i] * 12 * 100,
+                effective_annual_rate=((1 + monthly_apr[i]) ** 12 - 1) * 100,
+                dti=dti[i]
+            )
+            for i, loan in enumerate(loans)
+        ]
+
+        # Ante empates gana la primera oferta, como en el cliente
+        best_cost = metrics[int(np.argmin(base["total_paid"] + fees))]
+        best_payment = metrics[int(np.argmin(payment))]
+        best_speed = metrics[int(np.argmin(with_extra["months"]))]
+        best_apr = metrics[int(np.argmin(monthly_apr))]
+
+        schedule_loan_id = None
+        selected_schedule = []
+        if request.schedule is not None:
+            schedule_loan_id = best_cost.id if request.schedule == "best" else request.schedule
+            selected = next((loan for loan in loans if loan.id == schedule_loan_id), None)
+            if selected is None:
+                raise ValueError(f"No existe el préstamo {schedule_loan_id}")
+            selected_schedule = LoanCalculator.build_schedule(selected)
+
+        return LoanComparisonResult(
+            loans=metrics,
+            best_by_total_cost=best_cost.id,
+            best_by_lowest_payment=best_payment.id,
+            best_by_fastest_payoff=best_speed.id,
+            best_by_apr=best_apr.id,
+            analysis_summary=LoanCalculator._generate_summary(best_cost, best_payment, best_speed),
+            recommendations=LoanCalculator._generate_recommendations(metrics, best_cost, best_payment, best_speed),
+            schedule_loan_id=schedule_loan_id,
+            selected_schedule=selected_schedule
+        )
+
+    @staticmethod
+    def build_schedule(loan: LoanOffer) -> List[AmortizationPoint]:
+        """Calendario mes a mes con el abono extra aplicado"""
+        payment = float(loan_engine.monthly_payment(loan.amount, loan.annual_rate, loan.term_months))
+        columns = loan_engine.schedule(loan.amount, loan.annual_rate, payment + loan.extra_monthly_payment)
+        rows = zip(*(columns[field].tolist() for field in ("month", "payment", "interest", "principal", "balance")))
+        return [
+            AmortizationPoint(month=month, payment=paid, interest=interest, principal=principal, balance=balance)
+            for month, paid, interest, principal, balance in rows
+        ]
+
+    @staticmethod
+    def search(index: loan_index.LoanIndex, request: LoanSearchRequest) -> LoanSearchResult:
+        """Top-k productos del catálogo para un solicitante, en una pasada vectorizada"""
+        filters = loan_index.SearchFilters(
+            max_dti=request.max_dti,
+            max_monthly_payment=request.max_monthly_payment,
+            max_apr=request.max_apr / 100 if request.max_apr is not None else None,
+            min_term_months=request.min_term_months,
+            max_term_months=request.max_term_months
+        )
+        found, matched = index.search(
+            request.amount, request.monthly_income, request.other_monthly_debt,
+            request.metric, request.k, filters, request.descending
+        )
+        position = found["position"]
+        columns = {
+            "id": index.ids[position].tolist(),
+            "name": index.names[position].tolist(),
+            "annual_rate": index.annual_rate[position].tolist(),
+            "term_months": index.term_months[position].tolist(),
+            "apr": (found["apr"] * 100).tolist(),
+        }
+        for field in ("monthly_payment", "total_interest", "total_cost", "origination_fees_total", "dti"):
+            columns[field] = found[field].tolist()
+        hits = [LoanSearchHit(**dict(zip(columns, row))) for row in zip(*columns.values())]
+        return LoanSearchResult(metric=request.metric, matched=matched, results=hits)
+
+    @staticmethod
+    def _generate_summary(best_cost: LoanMetrics, best_payment: LoanMetrics, best_speed: LoanMetrics) -> str:
+        parts = [f'Mejor costo total: "{best_cost.name}" ({best_cost.total_cost:.2f})']
+        if best_payment.id != best_cost.id:
+            parts.append(f'Cuota más baja: "{best_payment.name}" ({best_payment.monthly_payment:.2f})')
+        if best_speed.id != best_cost.id:
+            parts.append(f'Liquidación más rápida: "{best_speed.name}" ({best_speed.payoff_months_with_extra} meses)')
+        return ". ".join(parts) + "."
+
+    @staticmethod
+    def _generate_recommendations(metrics: List[LoanMetrics], best_cost: LoanMetrics, best_payment: LoanMetrics, best_speed: LoanMetrics) -> List[str]:
+        """Genera recomendaciones"""
+        recommendations = []
+        if best_cost.id != best_payment.id:
+            recommendations.append(
+                f'El préstamo "{best_cost.name}" tiene el menor costo total, mientras que "{best_payment.name}" '
+                f'ofrece la cuota mensual más baja. Evalúa tu flujo de caja vs. costo total.'
+            )
+        if best_speed.id != best_cost.id:
+            recommendations.append(
+                f'Si priorizas terminar antes, "{best_speed.name}" se liquida en {best_speed.payoff_months_with_extra} meses (con extra).'
+            )
+        for loan in metrics:
+            if loan.dti > LoanCalculator.DTI_WARNING:
+                recommendations.append(
+                    f'Advertencia: El DTI del préstamo "{loan.name}" supera 43% (≈ {loan.dti * 100:.1f}%). Podría considerarse riesgoso.'
+                )
+        if not recommendations:
+            recommendations.append("Todos los préstamos se encuentran dentro de parámetros razonables. Elige según balance entre cuota y costo total.")
+        return recommendations
+
+# Catálogo de productos cargado en memoria (se reemplaza completo en cada carga)
+_catalogue: Optional[loan_index.LoanIndex] = None
+
+def _catalogue_info(index: loan_index.LoanIndex) -> LoanCatalogueInfo:
+    return LoanCatalogueInfo(
+        count=len(index),
+        flat_fee_products=int(np.count_nonzero(index.fee_flat > 0)),
+        min_rate=float(index.annual_rate.min()),
+        max_rate=float(index.annual_rate.max()),
+        min_term_months=int(index.term_months.min()),
+        max_term_months=int(index.term_months.max())
+    )
+
+def _parse_catalogue(body: bytes, content_type: str) -> dict:
+    # Parquet: una columna por campo; JSON: objeto con columnas
+    if "parquet" in content_type or "octet-stream" in content_type:
+        if pq is None:
+            raise ValueError("La lectura de Parquet requiere pyarrow")
+        table = pq.read_table(io.BytesIO(body))
+        return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+    return LoanCatalogueInput(**json.loads(body)).model_dump(exclude_none=True)
+
+@router.put("/catalogue", response_model=LoanCatalogueInfo)
+async def load_catalogue(request: Request):
+    """
+    Carga el catálogo de productos (JSON columnar o Parquet) y reemplaza el anterior
+    """
+    global _catalogue
+    try:
+        index = loan_index.LoanIndex(_parse_catalogue(await request.body(), request.headers.get("content-type", "")))
+        _catalogue = index
+        return encode_response(_catalogue_info(index), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error cargando catálogo de préstamos: {str(e)}")
+
+@router.get("/catalogue", response_model=LoanCatalogueInfo)
+async def get_catalogue_info(request: Request):
+    """
+    Resumen del catálogo de productos cargado
+    """
+    if _catalogue is None:
+        raise HTTPException(status_code=404, detail="No hay un catálogo de productos cargado")
+    return encode_response(_catalogue_info(_catalogue), request)
+
+@router.post("/search", response_model=LoanSearchResult)
+def search_loans(request: LoanSearchRequest, http_request: Request):
+    """
+    Busca los mejores productos del catálogo para un solicitante
+    """
+    try:
+        if _catalogue is None:
+            raise ValueError("No hay un catálogo de productos cargado")
+        return encode_response(LoanCalculator.search(_catalogue, request), http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error buscando préstamos: {str(e)}")
+
+@router.post("/compare", response_model=LoanComparisonResult)
+async def compare_loans(request: LoanComparisonRequest, http_request: Request):
+    """
+    Compara ofertas de préstamo (costo total, cuota, liquidación y APR)
+    """
+    try:
+        return encode_response(LoanCalculator.compare(request), http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error comparando préstamos: {str(e)}")
+
+@router.post("/schedule", response_model=List[AmortizationPoint])
+async def loan_schedule(loan: LoanOffer, http_request: Request):
+    """
+    Calendario de amortización de un préstamo con su abono extra
+    """
+    try:
+        return encode_response([point.model_dump() for point in LoanCalculator.build_schedule(loan)], http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error generando calendario: {str(e)}")
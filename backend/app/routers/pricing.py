@@ -0,0 +1,399 @@
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Dict, List, Mapping, Optional
+import io
+import json
+import numpy as np
+
+from app.services import price_stats
+from app.services.static_responses import PrecomputedResponse
+from app.responses import encode_response, parquet_response, pq, wants_parquet
+
+router = APIRouter(prefix="/pricing", tags=["pricing"])
+
+class CompetitorSummary(BaseModel):
+    count: int = Field(..., ge=0, description="Precios válidos resumidos")
+    mean: float = Field(..., description="Media de los precios")
+    m2: float = Field(..., ge=0, description="Suma de cuadrados de las desviaciones (Welford)")
+    min: float = Field(..., description="Precio mínimo")
+    max: float = Field(..., description="Precio máximo")
+    skipped: int = Field(0, ge=0, description="Valores descartados (no numéricos o <= 0)")
+    sketch: Dict = Field(default_factory=dict, description="Sketch de cuantiles combinable")
+
+class PricingInput(BaseModel):
+    product_name: str = Field(..., description="Nombre del producto")
+    cost_materials: float = Field(..., ge=0, description="Costo de materiales")
+    cost_labor: float = Field(..., ge=0, description="Costo de mano de obra")
+    cost_overhead: float = Field(..., ge=0, description="Gastos indirectos")
+    desired_profit_margin: float = Field(..., ge=0, lt=100, description="Margen de ganancia deseado (%)")
+    competitor_prices: Optional[List[float]] = Field(None, description="Precios de competidores")
+    competitor_summary: Optional[CompetitorSummary] = Field(None, description="Resumen de precios devuelto por /pricing/competitors/stats")
+    target_market: Optional[str] = Field(None, description="Mercado objetivo")
+
+class CostBreakdown(BaseModel):
+    materials: float
+    labor: float
+    overhead: float
+    total_cost: float
+    profit_amount: float
+
+class CompetitiveAnalysis(BaseModel):
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    avg_price: Optional[float] = None
+    median_price: Optional[float] = None
+    std_deviation: Optional[float] = None
+    count: Optional[int] = Field(None, description="Precios válidos analizados")
+    percentiles: Optional[Dict[str, float]] = Field(None, description="Percentiles p10, p25, p50, p75 y p90")
+    exact: Optional[bool] = Field(None, description="Falso si los cuantiles provienen del sketch aproximado")
+    message: Optional[str] = None
+
+class PricingStrategy(BaseModel):
+    name: str
+    price: float
+    description: str
+    pros: List[str]
+    cons: List[str]
+
+class FinancialProjections(BaseModel):
+    break_even_units: int
+    monthly_revenue_100_units: float
+    monthly_profit_100_units: float
+    roi_percentage: float
+
+class PricingResult(BaseModel):
+    recommended_price: float
+    cost_breakdown: CostBreakdown
+    profit_margin: float
+    competitive_analysis: CompetitiveAnalysis
+    pricing_strategies: List[PricingStrategy]
+    financial_projections: FinancialProjections
+
+class CompetitorStatsResult(BaseModel):
+    analysis: CompetitiveAnalysis
+    summary: CompetitorSummary = Field(..., description="Estado combinable para otras cargas o para /pricing/calculate")
+
+class PricingBatchInput(BaseModel):
+    # Catálogo en formato columnar: una lista por campo, todas del mismo largo
+    sku: Optional[List[str]] = None
+    cost_materials: List[float]
+    cost_labor: List[float]
+    cost_overhead: List[float]
+    desired_profit_margin: List[float]
+    # Precio promedio de competidores por SKU (avg_price de su resumen; nulo si no hay datos)
+    competitor_avg_price: Optional[List[Optional[float]]] = None
+
+class PricingBatchResult(BaseModel):
+    count: int
+    sku: Optional[List[str]] = None
+    total_cost: List[float]
+    recommended_price: List[float]
+    profit_amount: List[float]
+    roi_percentage: List[float]
+    conservative_price: List[float]
+    competitive_price: List[Optional[float]] = Field(..., description="Promedio del mercado, nulo sin datos de competidores")
+    premium_price: List[float]
+    price_vs_market: List[Optional[float]] = Field(..., description="Diferencia porcentual del precio recomendado contra el promedio del mercado")
+
+# Percentiles que se reportan en el análisis de competidores
+PERCENTILES = (("p10", 0.10), ("p25", 0.25), ("p50", 0.50), ("p75", 0.75), ("p90", 0.90))
+
+class PricingCalculator:
+    # Sobreprecio sobre el costo de las estrategias conservadora y premium
+    CONSERVATIVE_MARKUP = 1.20
+    PREMIUM_MARKUP = 1.50
+
+    # Columnas de costos del cálculo por lotes
+    BATCH_COST_FIELDS = ("cost_materials", "cost_labor", "cost_overhead", "desired_profit_margin")
+
+    @staticmethod
+    def calculate(input_data: PricingInput) -> PricingResult:
+        """Calcula el precio ideal con análisis completo"""
+        total_cost = input_data.cost_materials + input_data.cost_labor + input_data.cost_overhead
+
+        # Precio con margen deseado
+        recommended_price = total_cost / (1 - input_data.desired_profit_margin / 100)
+        profit_amount = recommended_price - total_cost
+
+        summary = PricingCalculator._competitor_summary(input_data)
+        competitive_analysis = PricingCalculator.analyze_competition(summary)
+
+        return PricingResult(
+            recommended_price=round(recommended_price, 2),
+            cost_breakdown=CostBreakdown(
+                materials=input_data.cost_materials,
+                labor=input_data.cost_labor,
+                overhead=input_data.cost_overhead,
+                total_cost=total_cost,
+                profit_amount=profit_amount
+            ),
+            profit_margin=input_data.desired_profit_margin,
+            competitive_analysis=competitive_analysis,
+            pricing_strategies=PricingCalculator._generate_pricing_strategies(total_cost, competitive_analysis),
+            financial_projections=FinancialProjections(
+                break_even_units=1,
+                monthly_revenue_100_units=recommended_price * 100,
+                monthly_profit_100_units=profit_amount * 100,
+                roi_percentage=profit_amount / total_cost * 100 if total_cost > 0 else 0.0
+            )
+        )
+
+    @classmethod
+    def calculate_many(cls, columns: Mapping[str, object]) -> Dict[str, np.ndarray]:
+        """
+        Calcula precios para un catálogo columnar con las mismas reglas que
+        `calculate` (precio por margen, estrategias conservadora, competitiva
+        y premium) sobre columnas completas de NumPy. La estrategia
+        competitiva queda como NaN en los SKU sin promedio de mercado.
+        """
+        count = len(columns["cost_materials"])
+        values = {}
+        for field in cls.BATCH_COST_FIELDS:
+            values[field] = np.asarray(columns[field], dtype=np.float64)
+            if values[field].shape != (count,):
+                raise ValueError(f"La columna {field} debe tener {count} valores")
+            if not np.isfinite(values[field]).all() or (values[field] < 0).any():
+                raise ValueError(f"La columna {field} no admite valores negativos ni vacíos")
+        if (values["desired_profit_margin"] >= 100).any():
+            raise ValueError("El margen de ganancia debe ser menor a 100%")
+
+        # Promedio del mercado; faltante o no positivo queda como NaN
+        market = columns.get("competitor_avg_price")
+        if market is None:
+            market = np.full(count, np.nan)
+        elif isinstance(market, list):
+            market = np.array([np.nan if value is None else value for value in market], dtype=np.float64)
+        else:
+            market = np.asarray(market, dtype=np.float64)
+        if market.shape != (count,):
+            raise ValueError(f"La columna competitor_avg_price debe tener {count} valores")
+        market = np.where(market > 0, market, np.nan)
+
+        total_cost = values["cost_materials"] + values["cost_labor"] + values["cost_overhead"]
+        recommended = total_cost / (1 - values["desired_profit_margin"] / 100)
+        profit_amount = recommended - total_cost
+        with np.errstate(divide="ignore", invalid="ignore"):
+            roi = np.where(total_cost > 0, profit_amount / total_cost * 100, 0.0)
+            price_vs_market = (recommended - market) / market * 100
+
+        return {
+            "total_cost": total_cost,
+            "recommended_price": np.round(recommended, 2),
+            "profit_amount": profit_amount,
+            "roi_percentage": roi,
+            "conservative_price": np.round(total_cost * cls.CONSERVATIVE_MARKUP, 2),
+            "competitive_price": np.round(market, 2),
+            "premium_price": np.round(total_cost * cls.PREMIUM_MARKUP, 2),
+            "price_vs_market": np.round(price_vs_market, 2)
+        }
+
+    @staticmethod
+    def analyze_competition(summary: price_stats.PriceSummary) -> CompetitiveAnalysis:
+        """
+        Estadísticas de precios de competidores a partir de un resumen de
+        una sola pasada (Welford para media y desviación, sketch para la
+        mediana y los percentiles)
+        """
+        if summary.observed == 0:
+            return CompetitiveAnalysis(message="No hay datos de competidores")
+        stats = summary.stats
+        if stats.count == 0:
+            return CompetitiveAnalysis(message="No hay precios válidos de competidores")
+
+        quantiles = summary.sketch.quantiles([q for _, q in PERCENTILES])
+        percentiles = {name: round(float(value), 2) for (name, _), value in zip(PERCENTILES, quantiles)}
+        return CompetitiveAnalysis(
+            min_price=round(stats.minimum, 2),
+            max_price=round(stats.maximum, 2),
+            avg_price=round(stats.mean, 2),
+            median_price=percentiles["p50"],
+            std_deviation=round(stats.std, 2),
+            count=stats.count,
+            percentiles=percentiles,
+            exact=summary.sketch.exact
+        )
+
+    @staticmethod
+    async def summarize_stream(chunks: AsyncIterator, base: Optional[CompetitorSummary] = None) -> CompetitorStatsResult:
+        """Resume precios leídos por bloques, opcionalmente sobre un resumen previo"""
+        summary = price_stats.PriceSummary.from_dict(base.model_dump()) if base else price_stats.PriceSummary()
+        async for prices in chunks:
+            summary.update(prices)
+        return CompetitorStatsResult(
+            analysis=PricingCalculator.analyze_competition(summary),
+            summary=CompetitorSummary(**summary.to_dict())
+        )
+
+    @staticmethod
+    def _competitor_summary(input_data: PricingInput) -> price_stats.PriceSummary:
+        summary = price_stats.PriceSummary()
+        if input_data.competitor_summary is not None:
+            summary.merge(price_stats.PriceSummary.from_dict(input_data.competitor_summary.model_dump()))
+        if input_data.competitor_prices:
+            summary.update(input_data.competitor_prices)
+        return summary
+
+    @staticmethod
+    def _generate_pricing_strategies(base_cost: float, competitive_analysis: CompetitiveAnalysis) -> List[PricingStrategy]:
+        """Genera estrategias de precios"""
+        strategies = [
+            PricingStrategy(
+                name="Conservadora",
+                price=round(base_cost * PricingCalculator.CONSERVATIVE_MARKUP, 2),
+                description="Margen bajo pero seguro, ideal para empezar",
+                pros=["Fácil venta", "Competitivo"],
+                cons=["Menor ganancia"]
+            )
+        ]
+
+        if competitive_analysis.avg_price:
+            strategies.append(PricingStrategy(
+                name="Competitiva",
+                price=competitive_analysis.avg_price,
+                description="Precio similar al promedio del mercado",
+                pros=["Equilibrio", "Aceptación del mercado"],
+                cons=["Menos diferenciación"]
+            ))
+
+        strategies.append(PricingStrategy(
+            name="Premium",
+            price=round(base_cost * PricingCalculator.PREMIUM_MARKUP, 2),
+            description="Alto margen, enfoque en calidad y valor",
+            pros=["Mayor ganancia", "Percepción de calidad"],
+            cons=["Mercado más pequeño"]
+        ))
+        return strategies
+
+async def _upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        data = await file.read(1 << 20)
+        if not data:
+            break
+        yield data
+
+@router.post("/calculate", response_model=PricingResult)
+async def calculate_pricing(input_data: PricingInput, request: Request):
+    """
+    Calcula el precio recomendado, estrategias y análisis de competidores
+    """
+    try:
+        return encode_response(PricingCalculator.calculate(input_data), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando precio: {str(e)}")
+
+def _parse_batch(body: bytes, content_type: str) -> Dict[str, object]:
+    # Parquet: una columna por campo; JSON: objeto con columnas
+    if "parquet" in content_type or "octet-stream" in content_type:
+        if pq is None:
+            raise ValueError("La lectura de Parquet requiere pyarrow")
+        table = pq.read_table(io.BytesIO(body))
+        columns = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+        if "sku" in columns:
+            columns["sku"] = [str(value) for value in columns["sku"].tolist()]
+        return columns
+    return PricingBatchInput(**json.loads(body)).model_dump(exclude_none=True)
+
+def _nullable(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
+
+@router.post("/calculate-batch", response_model=PricingBatchResult)
+async def calculate_pricing_batch(request: Request):
+    """
+    Calcula precios para un catálogo columnar (JSON o Parquet). Responde
+    en JSON columnar, o en Parquet con `?format=parquet` o
+    `Accept: application/vnd.apache.parquet`
+    """
+    try:
+        columns = _parse_batch(await request.body(), request.headers.get("content-type", ""))
+        result = PricingCalculator.calculate_many(columns)
+        sku = columns.get("sku")
+        if sku is not None and len(sku) != len(result["total_cost"]):
+            raise ValueError(f"La columna sku debe tener {len(result['total_cost'])} valores")
+        if wants_parquet(request):
+            return parquet_response({**({"sku": sku} if sku is not None else {}), **result})
+
+        batch_result = PricingBatchResult(
+            count=len(result["total_cost"]),
+            sku=sku,
+            competitive_price=_nullable(result.pop("competitive_price")),
+            price_vs_market=_nullable(result.pop("price_vs_market")),
+            **{key: value.tolist() for key, value in result.items()}
+        )
+        return encode_response(batch_result, request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando precios: {str(e)}")
+
+@router.post("/competitors/stats", response_model=CompetitorStatsResult)
+async def stream_competitor_stats(request: Request, column: Optional[str] = Query(None, description="Columna de precios si el cuerpo es CSV")):
+    """
+    Resume precios de competidores enviados en el cuerpo (números
+    separados por renglones o comas, o un CSV con `column`) conforme
+    llegan, sin guardarlos ni ordenarlos
+    """
+    try:
+        chunks = price_stats.iter_price_chunks(request.stream(), column)
+        return encode_response(await PricingCalculator.summarize_stream(chunks), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error analizando precios de competidores: {str(e)}")
+
+@router.post("/competitors/upload", response_model=CompetitorStatsResult)
+async def upload_competitor_prices(request: Request, file: UploadFile = File(...), column: Optional[str] = Query(None, description="Columna de precios si el archivo es CSV")):
+    """
+    Resume un archivo de precios de competidores leyéndolo por bloques
+    """
+    try:
+        chunks = price_stats.iter_price_chunks(_upload_chunks(file), column)
+        return encode_response(await PricingCalculator.summarize_stream(chunks), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error analizando precios de competidores: {str(e)}")
+
+@router.post("/competitors/merge", response_model=CompetitorStatsResult)
+async def merge_competitor_summaries(summaries: List[CompetitorSummary], request: Request):
+    """
+    Combina resúmenes de precios (por archivo, worker o día) sin volver a
+    leer las observaciones
+    """
+    try:
+        summary = price_stats.PriceSummary()
+        for item in summaries:
+            summary.merge(price_stats.PriceSummary.from_dict(item.model_dump()))
+        result = CompetitorStatsResult(
+            analysis=PricingCalculator.analyze_competition(summary),
+            summary=CompetitorSummary(**summary.to_dict())
+        )
+        return encode_response(result, request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error combinando resúmenes de precios: {str(e)}")
+
+# Estrategias de pricing adicionales
+PRICING_STRATEGIES = [
+    {
+        "name": "Penetración de Mercado",
+        "description": "Precios bajos para ganar participación",
+        "best_for": "Productos nuevos, mercados competitivos"
+    },
+    {
+        "name": "Descremado",
+        "description": "Precios altos iniciales, luego reducción",
+        "best_for": "Productos innovadores, early adopters"
+    },
+    {
+        "name": "Precio Competitivo",
+        "description": "Precio similar a competidores",
+        "best_for": "Mercados maduros, productos similares"
+    },
+    {
+        "name": "Precio Premium",
+        "description": "Precios altos basados en valor percibido",
+        "best_for": "Productos de calidad superior, marca fuerte"
+    }
+]
+
+_PRICING_STRATEGIES_RESPONSE = PrecomputedResponse(PRICING_STRATEGIES)
+
+@router.get("/strategies")
+async def get_pricing_strategies(request: Request):
+    """
+    Obtiene información sobre las estrategias de pricing disponibles
+    """
+    return _PRICING_STRATEGIES_RESPONSE.respond(request)
@@ -0,0 +1,454 @@
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+import math
+import numpy as np
+
+from app.services import roi_engine
+from app.services.cache import result_cache
+from app.responses import encode_response
+
+router = APIRouter(prefix="/roi", tags=["roi"])
+
+class ROIInvestment(BaseModel):
+    initial_amount: float = Field(..., gt=0, description="Inversión inicial")
+    additional_costs: float = Field(0, ge=0, description="Costos adicionales")
+    investment_date: Optional[str] = Field(None, description="Fecha de la inversión")
+
+class ROIReturns(BaseModel):
+    monthly_revenue_increase: float = Field(0, ge=0, description="Aumento de ingresos mensual")
+    monthly_cost_savings: float = Field(0, ge=0, description="Ahorro en costos mensual")
+    residual_value: float = Field(0, ge=0, description="Valor residual al final del periodo")
+
+class ROIParameters(BaseModel):
+    analysis_period_months: int = Field(..., ge=1, le=120, description="Periodo de análisis en meses")
+    discount_rate: float = Field(0.12, ge=0, le=1, description="Tasa de descuento anual")
+    inflation_rate: float = Field(0.04, ge=0, le=1, description="Tasa de inflación anual")
+
+class ROIInput(BaseModel):
+    investment: ROIInvestment
+    returns: ROIReturns
+    parameters: ROIParameters
+
+class ROIMetrics(BaseModel):
+    simple_roi: float
+    annualized_roi: float
+    npv: float
+    irr: Optional[float] = Field(None, description="TIR mensual (%)")
+    payback_period_months: Optional[int]
+    break_even_month: Optional[int]
+
+class ROIScenario(BaseModel):
+    name: str
+    roi_percentage: float
+    npv: float
+    payback_months: Optional[int]
+    description: str
+
+class ROITimelinePoint(BaseModel):
+    month: int
+    cash_flow: float
+    cumulative: float
+    npv: float
+
+class ROIAnalysis(BaseModel):
+    investment_grade: str
+    risk_level: str
+    recommendation: str
+    key_factors: List[str]
+
+class ROIResult(BaseModel):
+    investment_data: ROIInvestment
+    returns_data: ROIReturns
+    parameters_data: ROIParameters
+    metrics: ROIMetrics
+    scenarios: List[ROIScenario]
+    timeline: List[ROITimelinePoint]
+    analysis: ROIAnalysis
+
+class ROIBatchInput(BaseModel):
+    items: List[ROIInput] = Field(..., description="Inversiones a evaluar")
+
+class ROIBatchResult(BaseModel):
+    count: int
+    metrics: List[ROIMetrics]
+
+class ROISensitivityAxis(BaseModel):
+    field: str = Field(..., description="Variable a sensibilizar")
+    start: float = Field(..., ge=0, description="Valor inicial")
+    stop: float = Field(..., ge=0, description="Valor final")
+    steps: int = Field(..., ge=1, le=1000, description="Número de puntos")
+
+class ROISensitivityRequest(BaseModel):
+    base: ROIInput
+    axes: List[ROISensitivityAxis] = Field(default_factory=list, max_length=4, description="Ejes de la malla de escenarios")
+    tornado_variation: float = Field(0.2, gt=0, lt=1, description="Variación relativa de cada variable para el gráfico de tornado")
+
+class ROITornadoBar(BaseModel):
+    field: str
+    low_value: float
+    high_value: float
+    npv_low: float
+    npv_high: float
+    swing: float
+
+class ROISensitivityResult(BaseModel):
+    fields: List[str]
+    values: List[List[float]]
+    shape: List[int]
+    # Sin ejes las mallas son escalares
+    npv: Union[list, float]
+    irr: Union[list, float, None]
+    payback_months: Union[list, int, None]
+    simple_roi: Union[list, float]
+    base_npv: float
+    tornado: List[ROITornadoBar]
+
+# Escenarios: (nombre, factor de retornos, factor de inversión, descripción)
+ROI_SCENARIOS = [
+    ("Pesimista", 0.7, 1.2, "Escenario con reducción del 30% en retornos"),
+    ("Realista", 1.0, 1.0, "Escenario base con proyecciones actuales"),
+    ("Optimista", 1.5, 0.9, "Escenario con incremento del 50% en retornos"),
+]
+
+class ROICalculator:
+    # Variables que admite el análisis de sensibilidad
+    SENSITIVITY_FIELDS = ("total_investment", "monthly_returns", "residual_value", "analysis_period_months", "discount_rate")
+
+    # Límite de escenarios por malla
+    MAX_SENSITIVITY_POINTS = 200_000
+    MAX_MONTHS = 120
+
+    @staticmethod
+    @result_cache.cached("roi.calculate", ROIResult)
+    def calculate(input_data: ROIInput) -> ROIResult:
+        """
+        Calcula el ROI con análisis completo: métricas, escenarios,
+        calendario mensual y recomendación
+        """
+        investment, returns, parameters = input_data.investment, input_data.returns, input_data.parameters
+        total_investment = investment.initial_amount + investment.additional_costs
+        monthly_returns = returns.monthly_revenue_increase + returns.monthly_cost_savings
+        months = parameters.analysis_period_months
+        monthly_discount_rate = parameters.discount_rate / 12
+
+        flows = roi_engine.cash_flows(total_investment, monthly_returns, returns.residual_value, months)
+        metrics = ROICalculator._metrics(flows, monthly_discount_rate)[0]
+
+        return ROIResult(
+            investment_data=investment,
+            returns_data=returns,
+            parameters_data=parameters,
+            metrics=metrics,
+            scenarios=ROICalculator._generate_scenarios(total_investment, monthly_returns, returns.residual_value, months, monthly_discount_rate),
+            timeline=ROICalculator._generate_timeline(flows[0], monthly_discount_rate),
+            analysis=ROICalculator._analyze_investment(metrics)
+        )
+
+    @staticmethod
+    def calculate_many(items: List[ROIInput]) -> List[ROIMetrics]:
+        """
+        Calcula las métricas de muchas inversiones a la vez sobre una sola
+        matriz de flujos (los horizontes cortos se rellenan con ceros)
+        """
+        if not items:
+            return []
+        total_investment = np.array([item.investment.initial_amount + item.investment.additional_costs for item in items])
+        monthly_returns = np.array([item.returns.monthly_revenue_increase + item.returns.monthly_cost_savings for item in items])
+        residual_value = np.array([item.returns.residual_value for item in items])
+        months = np.array([item.parameters.analysis_period_months for item in items])
+        monthly_discount_rate = np.array([item.parameters.discount_rate / 12 for item in items])
+
+        flows = roi_engine.cash_flows(total_investment, monthly_returns, residual_value, months)
+        return ROICalculator._metrics(flows, monthly_discount_rate, months)
+
+    @classmethod
+    def sensitivity(cls, base: ROIInput, axes: List[ROISensitivityAxis], tornado_variation: float = 0.2) -> ROISensitivityResult:
+        """
+        Evalúa la malla completa de escenarios sobre un caso base y el
+        gráfico de tornado. Los flujos se construyen una vez por
+        combinación de las variables que no son la tasa de descuento; el
+        VPN para todas las tasas sale de un solo producto de matrices, y
+        TIR y recuperación (que no dependen de la tasa) se calculan una
+        vez por fila de flujos.
+        """
+        fields = [axis.field for axis in axes]
+        for field in fields:
+            if field not in cls.SENSITIVITY_FIELDS:
+                raise ValueError(f"Variable no válida para la sensibilidad: {field}")
+        if len(set(fields)) != len(fields):
+            raise ValueError("Cada variable solo puede aparecer en un eje")
+
+        shape = [axis.steps for axis in axes]
+        if math.prod(shape) > cls.MAX_SENSITIVITY_POINTS:
+            raise ValueError(f"La malla excede {cls.MAX_SENSITIVITY_POINTS:,} escenarios")
+
+        values = [cls._axis_values(axis) for axis in axes]
+        base_values = cls._base_values(base)
+
+        # Malla de flujos sobre los ejes distintos de la tasa de descuento
+        flow_fields = [field for field in fields if field != "discount_rate"]
+        flow_values = [axis_values for field, axis_values in zip(fields, values) if field != "discount_rate"]
+        grid = [column.ravel() for column in np.meshgrid(*flow_values, indexing="ij")] if flow_values else []
+        columns = dict(base_values)
+        for field, column in zip(flow_fields, grid):
+            columns[field] = column
+
+        flows = roi_engine.cash_flows(
+            columns["total_investment"], columns["monthly_returns"], columns["residual_value"],
+            np.rint(columns["analysis_period_months"]).astype(np.int64)
+        )
+        rates = values[fields.index("discount_rate")] if "discount_rate" in fields else np.array([base_values["discount_rate"]])
+        npv = flows @ roi_engine.discount_factors(rates / 12, flows.shape[1] - 1).T
+
+        irr = roi_engine.irr(flows)
+        payback = roi_engine.payback_month(flows).astype(np.float64)
+        payback[payback < 0] = np.nan
+        total_investment = -flows[:, 0]
+        simple_roi = (flows[:, 1:].sum(axis=1) - total_investment) / total_investment * 100
+
+        # Reacomodar a los ejes pedidos: la tasa va en su posición original
+        flow_shape = [len(axis_values) for axis_values in flow_values]
+        rate_position = fields.index("discount_rate") if "discount_rate" in fields else None
+
+        def to_grid(array, per_rate=False):
+            array = array.reshape(flow_shape + [len(rates)]) if per_rate else np.repeat(
+                array.reshape(flow_shape + [1]), len(rates), axis=-1
+            )
+            if rate_position is None:
+                return array.reshape(shape)
+            return np.moveaxis(array, -1, rate_position)
+
+        tornado = cls._tornado(base_values, tornado_variation)
+        base_npv = roi_engine.npv(roi_engine.cash_flows(
+            base_values["total_investment"], base_values["monthly_returns"], base_values["residual_value"],
+            int(base_values["analysis_period_months"])
+        ), base_values["discount_rate"] / 12)[0]
+
+        return ROISensitivityResult(
+            fields=fields,
+            values=[np.round(axis_values, 4).tolist() for axis_values in values],
+            shape=shape,
+            npv=np.round(to_grid(npv, per_rate=True), 2).tolist(),
+            irr=_nullable(to_grid(irr * 100), 4),
+            payback_months=_nullable(to_grid(payback), 0),
+            simple_roi=np.round(to_grid(simple_roi), 2).tolist(),
+            base_npv=round(float(base_npv), 2),
+            tornado=tornado
+        )
+
+    @classmethod
+    def _axis_values(cls, axis: ROISensitivityAxis) -> np.ndarray:
+        values = np.linspace(axis.start, axis.stop, axis.steps)
+        if axis.field == "analysis_period_months":
+            values = np.rint(values)
+            if values.min() < 1 or values.max() > cls.MAX_MONTHS:
+                raise ValueError(f"El horizonte debe estar entre 1 y {cls.MAX_MONTHS} meses")
+        elif axis.field == "discount_rate" and values.max() > 1:
+            raise ValueError("La tasa de descuento debe estar entre 0 y 1")
+        elif axis.field == "total_investment" and values.min() <= 0:
+            raise ValueError("La inversión debe ser mayor a 0")
+        return values
+
+    @staticmethod
+    def _base_values(base: ROIInput) -> dict:
+        return {
+            "total_investment": base.investment.initial_amount + base.investment.additional_costs,
+            "monthly_returns": base.returns.monthly_revenue_increase + base.returns.monthly_cost_savings,
+            "residual_value": base.returns.residual_value,
+            "analysis_period_months": float(base.parameters.analysis_period_months),
+            "discount_rate": base.parameters.discount_rate
+        }
+
+    @classmethod
+    def _tornado(cls, base_values: dict, variation: float) -> List[ROITornadoBar]:
+        """
+        Varía cada variable ±`variation` dejando las demás en el caso base
+        y ordena las barras de mayor a menor impacto en el VPN. Todos los
+        escenarios se evalúan juntos.
+        """
+        lows, highs = [], []
+        for field in cls.SENSITIVITY_FIELDS:
+            low, high = base_values[field] * (1 - variation), base_values[field] * (1 + variation)
+            if field == "analysis_period_months":
+                low, high = max(round(low), 1), min(round(high), cls.MAX_MONTHS)
+            elif field == "discount_rate":
+                high = min(high, 1.0)
+            lows.append(low)
+            highs.append(high)
+
+        count = len(cls.SENSITIVITY_FIELDS)
+        columns = {field: np.full(2 * count, value, dtype=np.float64) for field, value in base_values.items()}
+        for position, field in enumerate(cls.SENSITIVITY_FIELDS):
+            columns[field][position] = lows[position]
+            columns[field][count + position] = highs[position]
+
+        flows = roi_engine.cash_flows(
+            columns["total_investment"], columns["monthly_returns"], columns["residual_value"],
+            columns["analysis_period_months"].astype(np.int64)
+        )
+        npv = roi_engine.npv(flows, columns["discount_rate"] / 12)
+
+        bars = [
+            ROITornadoBar(
+                field=field,
+                low_value=round(lows[position], 4),
+                high_value=round(highs[position], 4),
+                npv_low=round(float(npv[position]), 2),
+                npv_high=round(float(npv[count + position]), 2),
+                swing=round(abs(float(npv[count + position] - npv[position])), 2)
+            )
+            for position, field in enumerate(cls.SENSITIVITY_FIELDS)
+        ]
+        return sorted(bars, key=lambda bar: bar.swing, reverse=True)
+
+    @staticmethod
+    def _metrics(flows: np.ndarray, monthly_discount_rate, months: Optional[np.ndarray] = None) -> List[ROIMetrics]:
+        total_investment = -flows[:, 0]
+        total_returns = flows[:, 1:].sum(axis=1)
+        if months is None:
+            months = np.full(len(flows), flows.shape[1] - 1)
+
+        simple_roi = (total_returns - total_investment) / total_investment * 100
+        # Sin retornos la inversión se pierde completa
+        ratio = np.maximum(total_returns / total_investment, 0.0)
+        annualized_roi = (ratio ** (12 / months) - 1) * 100
+        npv = roi_engine.npv(flows, monthly_discount_rate)
+        irr = roi_engine.irr(flows)
+        payback = roi_engine.payback_month(flows)
+
+        return [
+            ROIMetrics(
+                simple_roi=round(simple, 2),
+                annualized_roi=round(annualized, 2),
+                npv=round(value, 2),
+                irr=None if math.isnan(rate) else round(rate * 100, 2),
+                payback_period_months=month if month > 0 else None,
+                break_even_month=month if month > 0 else None
+            )
+            for simple, annualized, value, rate, month in zip(
+                simple_roi.tolist(), annualized_roi.tolist(), npv.tolist(), irr.tolist(), payback.tolist()
+            )
+        ]
+
+    @staticmethod
+    def _generate_scenarios(total_investment: float, monthly_returns: float, residual_value: float, months: int, monthly_discount_rate: float) -> List[ROIScenario]:
+        """Escenarios pesimista, realista y optimista evaluados juntos"""
+        returns_factor = np.array([scenario[1] for scenario in ROI_SCENARIOS])
+        investment_factor = np.array([scenario[2] for scenario in ROI_SCENARIOS])
+        flows = roi_engine.cash_flows(
+            total_investment * investment_factor, monthly_returns * returns_factor, residual_value, months
+        )
+        metrics = ROICalculator._metrics(flows, monthly_discount_rate)
+
+        return [
+            ROIScenario(
+                name=name,
+                roi_percentage=scenario_metrics.simple_roi,
+                npv=scenario_metrics.npv,
+                payback_months=scenario_metrics.payback_period_months,
+                description=description
+            )
+            for (name, _, _, description), scenario_metrics in zip(ROI_SCENARIOS, metrics)
+        ]
+
+    @staticmethod
+    def _generate_timeline(flows: np.ndarray, monthly_discount_rate: float) -> List[ROITimelinePoint]:
+        """Calendario mes a mes con flujo, acumulado y valor presente de cada mes"""
+        cumulative = np.cumsum(flows)
+        present_value = flows * roi_engine.discount_factors(monthly_discount_rate, len(flows) - 1)[0]
+
+        return [
+            ROITimelinePoint(
+                month=month,
+                cash_flow=round(flow, 2),
+                cumulative=round(total, 2),
+                npv=round(value, 2)
+            )
+            for month, (flow, total, value) in enumerate(zip(
+                flows.tolist(), cumulative.tolist(), present_value.tolist()
+            ))
+        ]
+
+    @staticmethod
+    def _analyze_investment(metrics: ROIMetrics) -> ROIAnalysis:
+        """Analiza la inversión y genera recomendaciones"""
+        if metrics.annualized_roi >= 50:
+            grade = "Excelente"
+        elif metrics.annualized_roi >= 25:
+            grade = "Buena"
+        elif metrics.annualized_roi >= 10:
+            grade = "Regular"
+        else:
+            grade = "Mala"
+
+        payback = metrics.payback_period_months
+        if payback and payback <= 6:
+            risk = "Bajo"
+        elif payback and payback <= 18:
+            risk = "Medio"
+        else:
+            risk = "Alto"
+
+        recommendations = {
+            "Excelente": "Inversión altamente recomendada. ROI excepcional con retorno rápido.",
+            "Buena": "Inversión recomendada. Buen balance entre retorno y riesgo.",
+            "Regular": "Inversión a considerar. Evaluar alternativas antes de decidir.",
+            "Mala": "Inversión no recomendada. Buscar mejores oportunidades de inversión."
+        }
+
+        key_factors = [
+            f"ROI anualizado del {metrics.annualized_roi:.1f}%",
+            f"Período de recuperación: {payback} meses" if payback else "Sin recuperación clara",
+            f"VPN de ${metrics.npv:,.2f}",
+            f"Nivel de riesgo: {risk}"
+        ]
+        if metrics.irr is not None:
+            key_factors.append(f"TIR del {metrics.irr:.1f}%")
+
+        return ROIAnalysis(
+            investment_grade=grade,
+            risk_level=risk,
+            recommendation=recommendations[grade],
+            key_factors=key_factors
+        )
+
+def _nullable(values: np.ndarray, digits: int):
+    # NaN (TIR inexistente o sin recuperación) se devuelve como null
+    cast = int if digits == 0 else float
+    flat = [None if math.isnan(value) else cast(round(value, digits)) for value in values.ravel().tolist()]
+    return np.array(flat, dtype=object).reshape(values.shape).tolist()
+
+@router.post("/calculate", response_model=ROIResult)
+async def calculate_roi(input_data: ROIInput, request: Request):
+    """
+    Calcula el retorno de inversión con métricas, escenarios y calendario
+    """
+    try:
+        result = ROICalculator.calculate(input_data)
+        return encode_response(result, request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando ROI: {str(e)}")
+
+@router.post("/calculate-batch", response_model=ROIBatchResult)
+async def calculate_roi_batch(batch: ROIBatchInput, request: Request):
+    """
+    Calcula las métricas de ROI para una lista de inversiones
+    """
+    try:
+        metrics = ROICalculator.calculate_many(batch.items)
+        return encode_response(ROIBatchResult(count=len(metrics), metrics=metrics), request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando ROI: {str(e)}")
+
+@router.post("/sensitivity", response_model=ROISensitivityResult)
+async def calculate_roi_sensitivity(request: ROISensitivityRequest, http_request: Request):
+    """
+    Calcula VPN, TIR y recuperación sobre una malla de escenarios y el
+    gráfico de tornado del caso base
+    """
+    try:
+        result = ROICalculator.sensitivity(request.base, request.axes, request.tornado_variation)
+        return encode_response(result, http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando sensibilidad: {str(e)}")
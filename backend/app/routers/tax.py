@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Mapping, Optional
+import csv
+import io
+import json
 import math
+import numpy as np
+
+from app.services import tax_tables
+from app.services.cache import result_cache
+from app.services.static_responses import PrecomputedResponse
+from app.responses import encode_response
 
 router = APIRouter(prefix="/tax", tags=["tax"])
 
@@ -34,6 +43,9 @@ class TaxInput(BaseModel):
     # Otros
     other_income: float = Field(0, ge=0, description="Otros ingresos")
     other_deductions: float = Field(0, ge=0, description="Otras deducciones")
+    
+    # Ejercicio fiscal de las tablas de ISR (por defecto, el más reciente)
+    fiscal_year: Optional[int] = Field(None, description="Ejercicio fiscal")
 
 class TaxResult(BaseModel):
     isr: dict
@@ -43,33 +55,89 @@ class TaxResult(BaseModel):
     tax_optimization: dict
     breakdown: dict
 
+class TaxBatchInput(BaseModel):
+    # Lote en formato columnar: una lista por campo, todas del mismo largo
+    taxpayer_type: List[str]
+    regime: List[str]
+    monthly_income: List[float]
+    other_income: Optional[List[float]] = None
+    business_expenses: Optional[List[float]] = None
+    medical_expenses: Optional[List[float]] = None
+    educational_expenses: Optional[List[float]] = None
+    mortgage_interest: Optional[List[float]] = None
+    donations: Optional[List[float]] = None
+    other_deductions: Optional[List[float]] = None
+    vat_collected: Optional[List[float]] = None
+    vat_paid: Optional[List[float]] = None
+    fiscal_year: Optional[int] = None
+
+class TaxBatchResult(BaseModel):
+    count: int
+    gross_income: List[float]
+    total_deductions: List[float]
+    taxable_income: List[float]
+    isr: List[float]
+    effective_rate: List[float]
+    vat_to_pay: List[float]
+    vat_to_refund: List[float]
+    total_taxes: List[float]
+    net_income: List[float]
+
+class TaxSweepAxis(BaseModel):
+    field: str = Field(..., description="Campo a variar: ingreso o deducción")
+    start: float = Field(..., ge=0, description="Valor inicial")
+    stop: float = Field(..., ge=0, description="Valor final")
+    steps: int = Field(..., ge=1, le=1000, description="Número de puntos")
+
+class TaxSweepRequest(BaseModel):
+    base: TaxInput
+    axes: List[TaxSweepAxis] = Field(..., min_length=1, max_length=3, description="Ejes del barrido (ingreso y hasta dos deducciones)")
+
+class TaxSweepResult(BaseModel):
+    fields: List[str]
+    values: List[List[float]]
+    shape: List[int]
+    total_taxes: list
+    effective_rate: list
+    net_income: list
+
 class TaxCalculator:
-    # Tablas de ISR 2024 - Personas Físicas
+    # Tablas anuales de ISR por ejercicio fiscal
     ISR_TABLES = {
-        "individual": [
-            {"min": 0, "max": 12892.32, "rate": 0.0192, "fixed": 0},
-            {"min": 12892.33, "max": 10928.33, "rate": 0.0640, "fixed": 247.23},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.1088, "fixed": 914.96},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.1600, "fixed": 2000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.1792, "fixed": 3000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.2136, "fixed": 4000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.2352, "fixed": 5000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.3000, "fixed": 6000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.3200, "fixed": 7000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.3400, "fixed": 8000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.3500, "fixed": 9000.00},
-            {"min": 10928.34, "max": 10928.33, "rate": 0.4000, "fixed": 10000.00}
-        ],
-        "business": [
-            {"min": 0, "max": 300000, "rate": 0.30, "fixed": 0},
-            {"min": 300001, "max": 600000, "rate": 0.30, "fixed": 90000},
-            {"min": 600001, "max": 1000000, "rate": 0.30, "fixed": 180000},
-            {"min": 1000001, "max": 2000000, "rate": 0.30, "fixed": 300000},
-            {"min": 2000001, "max": 3000000, "rate": 0.30, "fixed": 600000},
-            {"min": 3000001, "max": 999999999, "rate": 0.30, "fixed": 900000}
-        ]
+        2024: {
+            # Personas Físicas (Anexo 8 RMF 2024, tarifa anual)
+            "individual": [
+                {"min": 0.01, "max": 8952.49, "rate": 0.0192, "fixed": 0},
+                {"min": 8952.50, "max": 75984.55, "rate": 0.0640, "fixed": 171.88},
+                {"min": 75984.56, "max": 133536.07, "rate": 0.1088, "fixed": 4461.94},
+                {"min": 133536.08, "max": 155229.80, "rate": 0.1600, "fixed": 10723.55},
+                {"min": 155229.81, "max": 185852.57, "rate": 0.1792, "fixed": 14194.54},
+                {"min": 185852.58, "max": 374837.88, "rate": 0.2136, "fixed": 19682.13},
+                {"min": 374837.89, "max": 590795.99, "rate": 0.2352, "fixed": 60049.40},
+                {"min": 590796.00, "max": 1127926.84, "rate": 0.3000, "fixed": 110842.74},
+                {"min": 1127926.85, "max": 1503902.46, "rate": 0.3200, "fixed": 271981.99},
+                {"min": 1503902.47, "max": 4511707.37, "rate": 0.3400, "fixed": 392294.17},
+                {"min": 4511707.38, "max": None, "rate": 0.3500, "fixed": 1414947.85}
+            ],
+            # Personas Morales (tasa fija del 30%)
+            "business": [
+                {"min": 0, "max": 300000, "rate": 0.30, "fixed": 0},
+                {"min": 300000.01, "max": 600000, "rate": 0.30, "fixed": 90000},
+                {"min": 600000.01, "max": 1000000, "rate": 0.30, "fixed": 180000},
+                {"min": 1000000.01, "max": 2000000, "rate": 0.30, "fixed": 300000},
+                {"min": 2000000.01, "max": 3000000, "rate": 0.30, "fixed": 600000},
+                {"min": 3000000.01, "max": None, "rate": 0.30, "fixed": 900000}
+            ]
+        }
     }
 
+    # Tablas validadas y compiladas una sola vez al importar el módulo
+    COMPILED_ISR_TABLES = tax_tables.compile_tables(ISR_TABLES)
+    CURRENT_FISCAL_YEAR = max(ISR_TABLES)
+
+    # Tipo de contribuyente usado cuando no hay tabla para el indicado
+    DEFAULT_TAXPAYER_TYPE = "individual"
+
     # Límites de deducciones 2024
     DEDUCTION_LIMITS = {
         "medical": 0.15,  # 15% del ingreso
@@ -80,6 +148,7 @@ class TaxCalculator:
     }
 
     @classmethod
+    @result_cache.cached("tax.calculate", TaxResult)
     def calculate(cls, input_data: TaxInput) -> TaxResult:
         # Calcular ingresos totales
         total_income = input_data.monthly_income * 12 + input_data.other_income
@@ -91,13 +160,13 @@ class TaxCalculator:
         taxable_income = max(0, total_income - total_deductions)
         
         # Calcular ISR
-        isr_result = cls._calculate_isr(taxable_income, input_data.taxpayer_type)
+        isr_result = cls._calculate_isr(taxable_income, input_data.taxpayer_type, input_data.fiscal_year)
         
         # Calcular IVA
         vat_result = cls._calculate_vat(input_data)
         
-        # Calcular totales
-        total_taxes = isr_result["isr_calculated"] + vat_result["vat_to_pay"]
+        # Calcular totales (sobre los montos ya redondeados, igual que el lote)
+        total_taxes = cls._money(isr_result["isr_calculated"] + vat_result["vat_to_pay"])
         net_income = total_income - total_taxes
         
         # Generar recomendaciones de optimización
@@ -106,8 +175,8 @@ class TaxCalculator:
         return TaxResult(
             isr=isr_result,
             vat=vat_result,
-            total_taxes=round(total_taxes, 2),
-            net_income=round(net_income, 2),
+            total_taxes=total_taxes,
+            net_income=cls._money(net_income),
             tax_optimization=optimization,
             breakdown={
                 "gross_income": total_income,
@@ -118,6 +187,134 @@ class TaxCalculator:
             }
         )
 
+    # Categorías deducibles: (nombre, campo de TaxInput, límite individual)
+    DEDUCTION_CATEGORIES = (
+        ("business", "business_expenses", None),
+        ("medical", "medical_expenses", "medical"),
+        ("educational", "educational_expenses", "educational"),
+        ("mortgage", "mortgage_interest", "mortgage"),
+        ("donations", "donations", "donations"),
+        ("other", "other_deductions", None)
+    )
+
+    # Columnas numéricas del cálculo por lotes (faltantes se toman como 0)
+    BATCH_NUMERIC_FIELDS = (
+        "monthly_income", "other_income", "business_expenses", "medical_expenses",
+        "educational_expenses", "mortgage_interest", "donations", "other_deductions",
+        "vat_collected", "vat_paid"
+    )
+
+    @classmethod
+    def calculate_many(cls, columns: Mapping[str, object], fiscal_year: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Calcula impuestos para un lote columnar de contribuyentes.
+
+        Aplica las mismas reglas que `calculate` (deducciones con límites,
+        tope total, tramo de ISR e IVA) con operaciones de NumPy sobre
+        columnas completas y devuelve un arreglo por concepto.
+        """
+        taxpayer_type = np.asarray(columns["taxpayer_type"], dtype=object)
+        regime = np.asarray(columns["regime"], dtype=object)
+        count = len(taxpayer_type)
+
+        values = {}
+        for field in cls.BATCH_NUMERIC_FIELDS:
+            column = columns.get(field)
+            values[field] = np.zeros(count) if column is None else np.asarray(column, dtype=np.float64)
+            if values[field].shape != (count,):
+                raise ValueError(f"La columna {field} debe tener {count} valores")
+            if (values[field] < 0).any():
+                raise ValueError(f"La columna {field} no admite valores negativos")
+        if regime.shape != (count,):
+            raise ValueError(f"La columna regime debe tener {count} valores")
+
+        gross_income = values["monthly_income"] * 12 + values["other_income"]
+        total_deductions = cls._calculate_total_deductions_many(values, regime == "general", gross_income)
+        taxable_income = np.maximum(gross_income - total_deductions, 0.0)
+
+        # ISR por tipo de contribuyente; los tipos sin tabla usan la tabla por defecto
+        isr = np.zeros(count)
+        for kind in np.unique(taxpayer_type):
+            mask = taxpayer_type == kind
+            isr[mask] = cls._get_isr_table(kind, fiscal_year).tax_many(taxable_income[mask])
+
+        isr, effective_rate = cls._isr_amounts(isr, taxable_income)
+
+        vat_to_pay = cls._money(np.maximum(values["vat_collected"] - values["vat_paid"], 0.0))
+        vat_to_refund = cls._money(np.maximum(values["vat_paid"] - values["vat_collected"], 0.0))
+        total_taxes = cls._money(isr + vat_to_pay)
+
+        return {
+            "gross_income": gross_income,
+            "total_deductions": total_deductions,
+            "taxable_income": taxable_income,
+            "isr": isr,
+            "effective_rate": effective_rate,
+            "vat_to_pay": vat_to_pay,
+            "vat_to_refund": vat_to_refund,
+            "total_taxes": total_taxes,
+            "net_income": cls._money(gross_income - total_taxes)
+        }
+
+    # Límite de puntos evaluados en un barrido
+    MAX_SWEEP_POINTS = 1_000_000
+
+    @classmethod
+    def sweep(cls, base: TaxInput, axes: List[TaxSweepAxis]) -> TaxSweepResult:
+        """
+        Evalúa la malla completa de escenarios "qué pasa si" sobre un caso
+        base, variando el ingreso y/o deducciones, en una sola pasada de
+        `calculate_many`. Las matrices tienen un eje por cada eje pedido.
+        """
+        fields = [axis.field for axis in axes]
+        for field in fields:
+            if field not in cls.BATCH_NUMERIC_FIELDS:
+                raise ValueError(f"Campo no válido para el barrido: {field}")
+        if len(set(fields)) != len(fields):
+            raise ValueError("Cada campo solo puede aparecer en un eje")
+
+        shape = [axis.steps for axis in axes]
+        if math.prod(shape) > cls.MAX_SWEEP_POINTS:
+            raise ValueError(f"El barrido excede {cls.MAX_SWEEP_POINTS:,} puntos")
+
+        values = [np.linspace(axis.start, axis.stop, axis.steps) for axis in axes]
+        grid = np.meshgrid(*values, indexing="ij")
+        count = grid[0].size
+
+        columns = {
+            "taxpayer_type": np.full(count, base.taxpayer_type, dtype=object),
+            "regime": np.full(count, base.regime, dtype=object)
+        }
+        for field in cls.BATCH_NUMERIC_FIELDS:
+            columns[field] = np.full(count, getattr(base, field), dtype=np.float64)
+        for field, column in zip(fields, grid):
+            columns[field] = column.ravel()
+
+        result = cls.calculate_many(columns, base.fiscal_year)
+        return TaxSweepResult(
+            fields=fields,
+            values=[axis_values.round(2).tolist() for axis_values in values],
+            shape=shape,
+            total_taxes=result["total_taxes"].reshape(shape).tolist(),
+            effective_rate=result["effective_rate"].reshape(shape).tolist(),
+            net_income=result["net_income"].reshape(shape).tolist()
+        )
+
+    @classmethod
+    def _calculate_total_deductions_many(cls, values: Dict[str, np.ndarray], is_general: np.ndarray, total_income: np.ndarray) -> np.ndarray:
+        # Gastos de negocio (solo para régimen general)
+        total_deductions = np.where(is_general, values["business_expenses"], 0.0)
+        
+        # Deducciones personales con límites
+        total_deductions += np.minimum(values["medical_expenses"], total_income * cls.DEDUCTION_LIMITS["medical"])
+        total_deductions += np.minimum(values["educational_expenses"], total_income * cls.DEDUCTION_LIMITS["educational"])
+        total_deductions += np.minimum(values["mortgage_interest"], total_income * cls.DEDUCTION_LIMITS["mortgage"])
+        total_deductions += np.minimum(values["donations"], total_income * cls.DEDUCTION_LIMITS["donations"])
+        total_deductions += values["other_deductions"]
+        
+        # Límite total de deducciones
+        return np.minimum(total_deductions, total_income * cls.DEDUCTION_LIMITS["total"])
+
     @classmethod
     def _calculate_total_deductions(cls, input_data: TaxInput, total_income: float) -> float:
         total_deductions = 0
@@ -147,35 +344,50 @@ class TaxCalculator:
         return min(total_deductions, max_deductions)
 
     @classmethod
-    def _calculate_isr(cls, taxable_income: float, taxpayer_type: str) -> dict:
-        table = cls.ISR_TABLES[taxpayer_type]
-        
-        for bracket in table:
-            if bracket["min"] <= taxable_income <= bracket["max"]:
-                isr_calculated = (taxable_income - bracket["min"]) * bracket["rate"] + bracket["fixed"]
-                effective_rate = (isr_calculated / taxable_income) * 100 if taxable_income > 0 else 0
-                
-                return {
-                    "taxable_income": round(taxable_income, 2),
-                    "isr_calculated": round(isr_calculated, 2),
-                    "isr_withholding": 0,  # Se calculará por separado
-                    "isr_to_pay": round(isr_calculated, 2),
-                    "effective_rate": round(effective_rate, 2)
-                }
-        
-        # Si no encuentra bracket, usar el último
-        last_bracket = table[-1]
-        isr_calculated = (taxable_income - last_bracket["min"]) * last_bracket["rate"] + last_bracket["fixed"]
-        effective_rate = (isr_calculated / taxable_income) * 100 if taxable_income > 0 else 0
+    def register_isr_tables(cls, fiscal_year: int, tables: dict) -> None:
+        """Valida y agrega las tablas de un nuevo ejercicio fiscal"""
+        compiled = tax_tables.compile_tables({fiscal_year: tables})
+        cls.ISR_TABLES = {**cls.ISR_TABLES, fiscal_year: tables}
+        cls.COMPILED_ISR_TABLES = {**cls.COMPILED_ISR_TABLES, **compiled}
+        cls.CURRENT_FISCAL_YEAR = max(cls.ISR_TABLES)
+        # Los resultados guardados pueden depender de las tablas anteriores
+        result_cache.clear()
+
+    @classmethod
+    def _get_isr_table(cls, taxpayer_type: str, fiscal_year: Optional[int] = None) -> tax_tables.IsrTable:
+        year = fiscal_year if fiscal_year is not None else cls.CURRENT_FISCAL_YEAR
+        if year not in cls.COMPILED_ISR_TABLES:
+            raise ValueError(f"No hay tablas de ISR para el ejercicio {year}")
+        tables = cls.COMPILED_ISR_TABLES[year]
+        return tables.get(taxpayer_type, tables[cls.DEFAULT_TAXPAYER_TYPE])
+
+    @classmethod
+    def _calculate_isr(cls, taxable_income: float, taxpayer_type: str, fiscal_year: Optional[int] = None) -> dict:
+        table = cls._get_isr_table(taxpayer_type, fiscal_year)
+        isr_calculated, effective_rate = cls._isr_amounts(table.tax(taxable_income), taxable_income)
         
         return {
             "taxable_income": round(taxable_income, 2),
-            "isr_calculated": round(isr_calculated, 2),
-            "isr_withholding": 0,
-            "isr_to_pay": round(isr_calculated, 2),
-            "effective_rate": round(effective_rate, 2)
+            "isr_calculated": float(isr_calculated),
+            "isr_withholding": 0,  # Se calculará por separado
+            "isr_to_pay": float(isr_calculated),
+            "effective_rate": float(effective_rate)
         }
 
+    @staticmethod
+    def _money(value):
+        """Redondeo a centavos compartido por el cálculo individual y por lotes"""
+        rounded = np.round(value, 2)
+        return float(rounded) if np.ndim(rounded) == 0 else rounded
+
+    @classmethod
+    def _isr_amounts(cls, isr, taxable_income):
+        """ISR redondeado y tasa efectiva calculada sobre ese ISR redondeado"""
+        isr = cls._money(isr)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            effective_rate = np.where(np.asarray(taxable_income) > 0, isr / np.asarray(taxable_income, dtype=np.float64) * 100, 0.0)
+        return isr, cls._money(effective_rate)
+
     @classmethod
     def _calculate_vat(cls, input_data: TaxInput) -> dict:
         vat_collected = input_data.vat_collected
@@ -186,14 +398,73 @@ class TaxCalculator:
         return {
             "vat_collected": round(vat_collected, 2),
             "vat_paid": round(vat_paid, 2),
-            "vat_to_pay": round(vat_to_pay, 2),
-            "vat_to_refund": round(vat_to_refund, 2)
+            "vat_to_pay": cls._money(vat_to_pay),
+            "vat_to_refund": cls._money(vat_to_refund)
+        }
+
+    @classmethod
+    def _analyze_deductions(cls, input_data: TaxInput, total_income: float) -> dict:
+        """
+        Analiza en forma cerrada cuánto ISR ahorraría cada categoría de
+        deducción: cuánto más se puede deducir antes de que se alcance su
+        límite individual o el tope total, y el ahorro exacto de hacerlo
+        según la tarifa lineal por tramos.
+        """
+        table = cls._get_isr_table(input_data.taxpayer_type, input_data.fiscal_year)
+        total_cap = total_income * cls.DEDUCTION_LIMITS["total"]
+
+        categories = []
+        for name, field, limit_key in cls.DEDUCTION_CATEGORIES:
+            # Gastos de negocio (solo para régimen general)
+            if name == "business" and input_data.regime != "general":
+                continue
+            amount = getattr(input_data, field)
+            limit = total_income * cls.DEDUCTION_LIMITS[limit_key] if limit_key else None
+            deductible = min(amount, limit) if limit is not None else amount
+            categories.append((name, amount, limit, deductible))
+
+        deducted = sum(deductible for _, _, _, deductible in categories)
+        taxable_income = max(0, total_income - min(deducted, total_cap))
+        total_headroom = max(0, total_cap - deducted)
+
+        opportunities = []
+        individual_headrooms = []
+        for name, amount, limit, deductible in categories:
+            individual_headroom = limit - deductible if limit is not None else math.inf
+            individual_headrooms.append(individual_headroom)
+            additional = min(individual_headroom, total_headroom)
+            opportunities.append({
+                "category": name,
+                "current": round(amount, 2),
+                "deductible": round(deductible, 2),
+                "limit": round(limit, 2) if limit is not None else None,
+                "additional_deductible": round(additional, 2),
+                "binding_limit": "individual" if individual_headroom <= total_headroom else "total",
+                "tax_savings": round(table.savings(taxable_income, additional), 2)
+            })
+
+        # Las categorías comparten el tope total, así que el ahorro máximo no es la suma
+        max_additional = min(total_headroom, sum(individual_headrooms)) if categories else 0
+        next_threshold = table.next_threshold(taxable_income)
+
+        return {
+            "taxable_income": round(taxable_income, 2),
+            "marginal_rate": round(table.marginal_rate(taxable_income) * 100, 2),
+            "next_bracket_at": round(next_threshold, 2) if next_threshold is not None else None,
+            "total_deduction_cap": round(total_cap, 2),
+            "total_deduction_headroom": round(total_headroom, 2),
+            "deduction_opportunities": opportunities,
+            "potential_savings": round(table.savings(taxable_income, max_additional), 2)
         }
 
     @classmethod
     def _generate_optimization_recommendations(cls, input_data: TaxInput, total_income: float, total_deductions: float) -> dict:
         recommendations = []
-        potential_savings = 0
+        analysis = cls._analyze_deductions(input_data, total_income)
+        savings_by_category = {
+            opportunity["category"]: opportunity["tax_savings"]
+            for opportunity in analysis["deduction_opportunities"]
+        }
         
         # Verificar límites de deducciones
         medical_limit = total_income * cls.DEDUCTION_LIMITS["medical"]
@@ -204,13 +475,15 @@ class TaxCalculator:
         if input_data.educational_expenses < educational_limit:
             recommendations.append(f"Puedes deducir hasta ${educational_limit:,.2f} en gastos educativos")
         
+        if analysis["total_deduction_headroom"] <= 0 and total_income > 0:
+            recommendations.append("Ya alcanzaste el tope total de deducciones; deducciones adicionales no reducen tu ISR")
+        
         # Recomendaciones por régimen
         if input_data.regime == "simplified":
             recommendations.append("Considera cambiar al régimen general si tienes más de $2,000,000 en ingresos")
         
-        if input_data.regime == "general" and input_data.business_expenses < total_income * 0.3:
-            recommendations.append("Aumenta tus gastos de negocio para reducir el ISR")
-            potential_savings += (total_income * 0.3 - input_data.business_expenses) * 0.3
+        if savings_by_category.get("business", 0) > 0:
+            recommendations.append(f"Aumenta tus gastos de negocio para reducir el ISR hasta en ${savings_by_category['business']:,.2f}")
         
         # Optimización de IVA
         if input_data.vat_paid < input_data.vat_collected * 0.5:
@@ -218,78 +491,126 @@ class TaxCalculator:
         
         return {
             "recommendations": recommendations,
-            "potential_savings": round(potential_savings, 2)
+            **analysis
         }
 
 @router.post("/calculate", response_model=TaxResult)
-async def calculate_taxes(input_data: TaxInput):
+async def calculate_taxes(input_data: TaxInput, request: Request):
     """
     Calcula impuestos para personas físicas y morales
     """
     try:
         result = TaxCalculator.calculate(input_data)
-        return result
+        return encode_response(result, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error calculando impuestos: {str(e)}")
 
+def _parse_batch(body: bytes, content_type: str) -> TaxBatchInput:
+    # CSV o NDJSON: una fila por contribuyente; JSON: objeto con columnas
+    if "csv" in content_type:
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    elif "ndjson" in content_type:
+        rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        return TaxBatchInput(**json.loads(body))
+
+    columns = {
+        "taxpayer_type": [row.get("taxpayer_type") for row in rows],
+        "regime": [row.get("regime") for row in rows]
+    }
+    for field in TaxCalculator.BATCH_NUMERIC_FIELDS:
+        if any(row.get(field) not in (None, "") for row in rows):
+            columns[field] = [row.get(field) or 0 for row in rows]
+    return TaxBatchInput(**columns)
+
+@router.post("/calculate-batch", response_model=TaxBatchResult)
+async def calculate_taxes_batch(request: Request, fiscal_year: Optional[int] = None):
+    """
+    Calcula impuestos para un lote de contribuyentes (JSON columnar, CSV o NDJSON)
+    """
+    try:
+        batch = _parse_batch(await request.body(), request.headers.get("content-type", ""))
+        columns = batch.model_dump(exclude_none=True)
+        result = TaxCalculator.calculate_many(columns, fiscal_year if fiscal_year is not None else batch.fiscal_year)
+        batch_result = TaxBatchResult(count=len(batch.taxpayer_type), **{key: value.tolist() for key, value in result.items()})
+        return encode_response(batch_result, request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando impuestos: {str(e)}")
+
+@router.post("/sweep", response_model=TaxSweepResult)
+async def sweep_taxes(request: TaxSweepRequest, http_request: Request):
+    """
+    Calcula una malla de escenarios variando ingreso y deducciones
+    """
+    try:
+        return encode_response(TaxCalculator.sweep(request.base, request.axes), http_request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error calculando barrido: {str(e)}")
+
+TAX_REGIMES = {
+    "simplified": {
+        "name": "Régimen Simplificado de Confianza",
+        "description": "Para personas físicas con ingresos menores a $2,000,000",
+        "max_income": 2000000,
+        "tax_rate": 0.02
+    },
+    "general": {
+        "name": "Régimen General",
+        "description": "Para personas físicas y morales con ingresos mayores a $2,000,000",
+        "max_income": None,
+        "tax_rate": "Variable según tabla ISR"
+    },
+    "wage_earner": {
+        "name": "Sueldos y Salarios",
+        "description": "Para trabajadores asalariados",
+        "max_income": None,
+        "tax_rate": "Variable según tabla ISR"
+    },
+    "professional_services": {
+        "name": "Servicios Profesionales",
+        "description": "Para profesionistas independientes",
+        "max_income": None,
+        "tax_rate": "Variable según tabla ISR"
+    }
+}
+
+_TAX_REGIMES_RESPONSE = PrecomputedResponse(TAX_REGIMES)
+
 @router.get("/regimes")
-async def get_tax_regimes():
+async def get_tax_regimes(request: Request):
     """
     Obtiene información sobre los regímenes fiscales disponibles
     """
-    regimes = {
-        "simplified": {
-            "name": "Régimen Simplificado de Confianza",
-            "description": "Para personas físicas con ingresos menores a $2,000,000",
-            "max_income": 2000000,
-            "tax_rate": 0.02
-        },
-        "general": {
-            "name": "Régimen General",
-            "description": "Para personas físicas y morales con ingresos mayores a $2,000,000",
-            "max_income": None,
-            "tax_rate": "Variable según tabla ISR"
-        },
-        "wage_earner": {
-            "name": "Sueldos y Salarios",
-            "description": "Para trabajadores asalariados",
-            "max_income": None,
-            "tax_rate": "Variable según tabla ISR"
-        },
-        "professional_services": {
-            "name": "Servicios Profesionales",
-            "description": "Para profesionistas independientes",
-            "max_income": None,
-            "tax_rate": "Variable según tabla ISR"
-        }
+    return _TAX_REGIMES_RESPONSE.respond(request)
+
+DEDUCTION_LIMITS_INFO = {
+    "medical": {
+        "percentage": 0.15,
+        "description": "Gastos médicos (máximo 15% del ingreso)"
+    },
+    "educational": {
+        "percentage": 0.10,
+        "description": "Gastos educativos (máximo 10% del ingreso)"
+    },
+    "mortgage": {
+        "percentage": 0.10,
+        "description": "Intereses hipotecarios (máximo 10% del ingreso)"
+    },
+    "donations": {
+        "percentage": 0.07,
+        "description": "Donaciones (máximo 7% del ingreso)"
+    },
+    "total": {
+        "percentage": 0.15,
+        "description": "Deducciones totales (máximo 15% del ingreso)"
     }
-    return regimes
+}
+
+_DEDUCTION_LIMITS_INFO_RESPONSE = PrecomputedResponse(DEDUCTION_LIMITS_INFO)
 
 @router.get("/deduction-limits")
-async def get_deduction_limits():
+async def get_deduction_limits(request: Request):
     """
     Obtiene los límites de deducciones para el año actual
     """
-    limits = {
-        "medical": {
-            "percentage": 0.15,
-            "description": "Gastos médicos (máximo 15% del ingreso)"
-        },
-        "educational": {
-            "percentage": 0.10,
-            "description": "Gastos educativos (máximo 10% del ingreso)"
-        },
-        "mortgage": {
-            "percentage": 0.10,
-            "description": "Intereses hipotecarios (máximo 10% del ingreso)"
-        },
-        "donations": {
-            "percentage": 0.07,
-            "description": "Donaciones (máximo 7% del ingreso)"
-        },
-        "total": {
-            "percentage": 0.15,
-            "description": "Deducciones totales (máximo 15% del ingreso)"
-        }
-    }
-    return limits
+    return _DEDUCTION_LIMITS_INFO_RESPONSE.respond(request)
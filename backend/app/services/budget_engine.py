@@ -0,0 +1,280 @@
+"""
+Presupuesto con totales incrementales.
+
+`BudgetBook` guarda las partidas por id y mantiene los totales por
+categoría, ingresos, gastos y la división esencial/opcional en centavos
+enteros, de modo que agregar, editar o eliminar una partida cuesta O(1)
+y los totales no acumulan error de redondeo.
+
+Los totales incluyen todas las partidas, igual que el cliente. Las
+partidas sin mes son recurrentes y se repiten en cada mes de la
+proyección; las que tienen mes ("YYYY-MM") son movimientos de ese mes
+y en la proyección solo afectan su punto. La proyección se recalcula
+de forma perezosa: un cambio marca como pendiente el primer mes afectado
+y, al consultarla, solo se recalculan los meses desde ahí (el saldo
+acumulado de los siguientes cambia con él).
+"""
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import numpy as np
+
+# Gastos considerados esenciales
+ESSENTIAL_CATEGORIES = frozenset({
+    "Vivienda (Alquiler/Hipoteca)",
+    "Servicios Básicos",
+    "Alimentación",
+    "Transporte",
+    "Salud/Seguros",
+    "Deudas/Préstamos",
+})
+
+ITEM_TYPES = ("income", "expense")
+
+# Campos que se pueden editar en una partida
+EDITABLE_FIELDS = ("name", "amount", "category", "type", "is_essential", "month")
+
+
+@dataclass(frozen=True)
+class BudgetEntry:
+    id: str
+    name: str
+    amount: int  # centavos
+    category: str
+    type: str
+    is_essential: bool = False
+    month: Optional[str] = None
+
+    @property
+    def essential(self) -> bool:
+        return self.type == "expense" and (self.category in ESSENTIAL_CATEGORIES or self.is_essential)
+
+
+def to_cents(amount: float) -> int:
+    return int(round(amount * 100))
+
+
+def month_index(month: str) -> int:
+    """Meses desde el año 0 para una etiqueta "YYYY-MM" """
+    try:
+        year, number = month.split("-")
+        year, number = int(year), int(number)
+    except ValueError:
+        raise ValueError(f"Mes no válido: {month} (se espera YYYY-MM)")
+    if not 1 <= number <= 12:
+        raise ValueError(f"Mes no válido: {month} (se espera YYYY-MM)")
+    return year * 12 + number - 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class BudgetBook:
+    def __init__(self, horizon_months: int = 6, start_month: Optional[str] = None):
+        if horizon_months < 1:
+            raise ValueError("El horizonte debe ser de al menos un mes")
+        self.horizon_months = horizon_months
+        self.start_month = month_index(start_month) if start_month else None
+        self.version = 0
+        self.items: Dict[str, BudgetEntry] = {}
+
+        # Totales de todas las partidas (centavos) y número de partidas por categoría
+        self.total_income = 0
+        self.total_expenses = 0
+        self.essential_expenses = 0
+        self.income_by_category: Dict[str, int] = {}
+        self.expenses_by_category: Dict[str, int] = {}
+        self._category_counts: Dict[Tuple[str, str], int] = {}
+
+        # Neto mensual de las partidas recurrentes y de las fechadas por mes (centavos)
+        self.recurring_balance = 0
+        self.month_net: Dict[int, int] = {}
+        self._month_counts: Dict[int, int] = {}
+
+        # Proyección perezosa: saldos por mes y primer mes pendiente
+        self._balances = np.zeros(horizon_months, dtype=np.int64)
+        self._cumulative = np.zeros(horizon_months, dtype=np.int64)
+        self._dirty_from: Optional[int] = 0
+        self._projection_start: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    # Cambios O(1)
+
+    def add(self, entry: BudgetEntry) -> None:
+        if entry.id in self.items:
+            raise ValueError(f"Ya existe la partida {entry.id}")
+        self._validate(entry)
+        self.items[entry.id] = entry
+        self._apply(entry, 1)
+
+    def update(self, item_id: str, changes: Mapping[str, object]) -> BudgetEntry:
+        """Actualización parcial de una partida (mismos campos que el cliente)"""
+        old = self._get(item_id)
+        changes = dict(changes)
+        if changes.pop("id", item_id) != item_id:
+            raise ValueError("No se puede cambiar el id de una partida")
+        unknown = set(changes) - set(EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Campos no editables: {', '.join(sorted(unknown))}")
+        if changes.get("is_essential") is None:
+            changes.pop("is_essential", None)
+        if "amount" in changes:
+            changes["amount"] = to_cents(changes["amount"])
+        new = replace(old, **changes)
+        self._validate(new)
+        self._apply(old, -1)
+        self.items[item_id] = new
+        self._apply(new, 1)
+        return new
+
+    def remove(self, item_id: str) -> BudgetEntry:
+        entry = self._get(item_id)
+        del self.items[item_id]
+        self._apply(entry, -1)
+        return entry
+
+    def apply_diff(
+        self,
+        add: Iterable[BudgetEntry] = (),
+        update: Iterable[Tuple[str, Mapping[str, object]]] = (),
+        remove: Iterable[str] = (),
+    ) -> Dict[str, Set[str]]:
+        """
+        Aplica un lote de cambios de forma atómica (si uno falla no se
+        aplica ninguno) y devuelve, por tipo, las categorías cuyo total
+        pudo cambiar
+        """
+        touched = {"income": set(), "expense": set()}
+
+        def touch(entry: BudgetEntry) -> None:
+            touched[entry.type].add(entry.category)
+
+        undo: List[Tuple[str, BudgetEntry]] = []
+        try:
+            for item_id in remove:
+                entry = self.remove(item_id)
+                undo.append(("add", entry))
+                touch(entry)
+            for item_id, changes in update:
+                old = self._get(item_id)
+                new = self.update(item_id, changes)
+                undo.append(("restore", old))
+                touch(old)
+                touch(new)
+            for entry in add:
+                self.add(entry)
+                undo.append(("remove", entry))
+                touch(entry)
+        except Exception:
+            for action, entry in reversed(undo):
+                if action == "add":
+                    self.add(entry)
+                elif action == "remove":
+                    self.remove(entry.id)
+                else:
+                    self.remove(entry.id)
+                    self.add(entry)
+            raise
+        self.version += 1
+        return touched
+
+    # Lecturas
+
+    @property
+    def balance(self) -> int:
+        return self.total_income - self.total_expenses
+
+    def projection(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Etiquetas, saldo y saldo acumulado (centavos) de cada mes del horizonte"""
+        start = self._current_start()
+        if start != self._projection_start:
+            self._projection_start = start
+            self._dirty_from = 0
+        if self._dirty_from is not None:
+            self._recompute(self._dirty_from)
+            self._dirty_from = None
+        if start is None:
+            labels = [f"Mes {i + 1}" for i in range(self.horizon_months)]
+        else:
+            labels = [month_label(start + i) for i in range(self.horizon_months)]
+        return labels, self._balances, self._cumulative
+
+    def pending_from(self) -> Optional[int]:
+        """Primer mes de la proyección pendiente de recalcular, o None"""
+        if self._current_start() != self._projection_start:
+            return 0
+        return self._dirty_from
+
+    # Internos
+
+    def _get(self, item_id: str) -> BudgetEntry:
+        entry = self.items.get(item_id)
+        if entry is None:
+            raise ValueError(f"No existe la partida {item_id}")
+        return entry
+
+    @staticmethod
+    def _validate(entry: BudgetEntry) -> None:
+        if entry.type not in ITEM_TYPES:
+            raise ValueError(f"Tipo de partida no válido: {entry.type}")
+        if entry.amount < 0:
+            raise ValueError(f"El monto de la partida {entry.id} no puede ser negativo")
+        if entry.month is not None:
+            month_index(entry.month)
+
+    def _apply(self, entry: BudgetEntry, sign: int) -> None:
+        amount = sign * entry.amount
+        totals = self.income_by_category if entry.type == "income" else self.expenses_by_category
+        key = (entry.type, entry.category)
+        self._category_counts[key] = self._category_counts.get(key, 0) + sign
+        if self._category_counts[key] == 0:
+            del self._category_counts[key]
+            del totals[entry.category]
+        else:
+            totals[entry.category] = totals.get(entry.category, 0) + amount
+
+        if entry.type == "income":
+            self.total_income += amount
+        else:
+            self.total_expenses += amount
+            if entry.essential:
+                self.essential_expenses += amount
+
+        net = amount if entry.type == "income" else -amount
+        if entry.month is not None:
+            month = month_index(entry.month)
+            self.month_net[month] = self.month_net.get(month, 0) + net
+            self._month_counts[month] = self._month_counts.get(month, 0) + sign
+            if self._month_counts[month] == 0:
+                del self._month_counts[month]
+                del self.month_net[month]
+            self._mark_dirty(month)
+        else:
+            self.recurring_balance += net
+            # Las partidas recurrentes cambian todos los meses
+            self._dirty_from = 0
+
+    def _current_start(self) -> Optional[int]:
+        if self.start_month is not None:
+            return self.start_month
+        return min(self._month_counts) if self._month_counts else None
+
+    def _mark_dirty(self, month: int) -> None:
+        start = self._projection_start
+        if start is None or month < start:
+            self._dirty_from = 0
+            return
+        offset = month - start
+        if offset >= self.horizon_months:
+            return
+        self._dirty_from = offset if self._dirty_from is None else min(self._dirty_from, offset)
+
+    def _recompute(self, first: int) -> None:
+        start = self._projection_start
+        months = range(first, self.horizon_months)
+        dated = [self.month_net.get(start + i, 0) for i in months] if start is not None else [0] * len(months)
+        self._balances[first:] = self.recurring_balance + np.array(dated, dtype=np.int64)
+        previous = self._cumulative[first - 1] if first > 0 else 0
+        self._cumulative[first:] = previous + np.cumsum(self._balances[first:])
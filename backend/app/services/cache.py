@@ -0,0 +1,238 @@
+"""
+Caché de resultados de las calculadoras.
+
+La llave es un hash canónico de los argumentos ya validados (modelos de
+Pydantic serializados con llaves ordenadas), de modo que dos solicitudes
+equivalentes comparten resultado. La capa en memoria es LRU con TTL y un
+tope de memoria; opcionalmente se puede compartir entre workers con un
+archivo SQLite (variable CALC_CACHE_SQLITE).
+"""
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pydantic import BaseModel
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return _canonical(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, type):
+        return value.__qualname__
+    return value
+
+
+def canonical_key(namespace: str, *args: Any, **kwargs: Any) -> str:
+    """Hash SHA-256 estable de los argumentos de una llamada"""
+    payload = json.dumps(
+        [namespace, _canonical(args), _canonical(kwargs)],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SqliteBackend:
+    """Almacén compartido entre procesos en un archivo SQLite"""
+
+    # Cada cuántas escrituras se borran las filas vencidas
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, prune_every: int = PRUNE_EVERY):
+        self.path = path
+        self.prune_every = prune_every
+        self._writes = 0
+        # La conexión se abre en el primer uso de cada proceso: los
+        # procesos hijos (p. ej. el pool del cálculo masivo) no deben
+        # heredar la del padre
+        self._pid: Optional[int] = None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if self._pid != pid:
+            # El candado heredado pudo quedar tomado por otro hilo del padre
+            self._lock = threading.Lock()
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires REAL, value BLOB)"
+            )
+            self._pid = pid
+        return self._connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        connection = self._connect()
+        with self._lock:
+            row = connection.execute(
+                "SELECT value FROM results WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, expires: float) -> None:
+        connection = self._connect()
+        with self._lock:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, expires, value) VALUES (?, ?, ?)", (key, expires, value)
+            )
+            self._writes += 1
+            # El TTL solo se revisa al leer: sin esto las filas vencidas crecen sin límite
+            if self.prune_every > 0 and self._writes % self.prune_every == 0:
+                connection.execute("DELETE FROM results WHERE expires <= ?", (time.time(),))
+
+    def clear(self) -> None:
+        connection = self._connect()
+        with self._lock:
+            connection.execute("DELETE FROM results")
+
+    def prune(self) -> None:
+        connection = self._connect()
+        with self._lock:
+            connection.execute("DELETE FROM results WHERE expires <= ?", (time.time(),))
+
+    def count(self) -> int:
+        connection = self._connect()
+        with self._lock:
+            return connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 300.0,
+        backend: Optional[SqliteBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self.enabled = max_entries > 0
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        path = os.environ.get("CALC_CACHE_SQLITE")
+        return cls(
+            max_entries=int(os.environ.get("CALC_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.environ.get("CALC_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl=float(os.environ.get("CALC_CACHE_TTL", "300")),
+            backend=SqliteBackend(path) if path else None,
+        )
+
+    def get(self, key: str, model: Type[BaseModel]) -> Optional[BaseModel]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, size, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        if self.backend is not None:
+            raw = self.backend.get(key)
+            if raw is not None:
+                value = model.model_validate_json(raw)
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, value, len(raw), now + self.ttl)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: BaseModel) -> None:
+        raw = value.model_dump_json().encode("utf-8")
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, len(raw), expires)
+        if self.backend is not None:
+            self.backend.set(key, raw, expires)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "shared_backend": self.backend.path if self.backend is not None else None,
+            }
+
+    def cached(self, namespace: str, model: Type[BaseModel]) -> Callable:
+        """
+        Decorador para métodos de calculadora. Los resultados se comparten
+        entre llamadas; quien los reciba no debe modificarlos.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                key = canonical_key(namespace, *args, **kwargs)
+                value = self.get(key, model)
+                if value is None:
+                    value = func(*args, **kwargs)
+                    self.set(key, value)
+                return value
+            return wrapper
+        return decorator
+
+    def _store(self, key: str, value: Any, size: int, expires: float) -> None:
+        # Los resultados más grandes que el tope completo no se guardan
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+# Caché compartido por todas las calculadoras del proceso
+result_cache = ResultCache.from_env()
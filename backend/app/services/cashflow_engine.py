@@ -0,0 +1,188 @@
+"""
+Motor de proyección de flujo de caja.
+
+Cada categoría de partidas se proyecta como un arreglo por periodo
+(categorías × periodos) con su propia tasa de crecimiento compuesto. Los
+impuestos se calculan por periodo sobre la utilidad operativa positiva y
+el saldo final es la suma acumulada de los flujos netos. La proyección se
+genera por bloques de periodos, de modo que un horizonte diario de varios
+años puede transmitirse sin materializarse completo.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, Mapping, Optional
+import numpy as np
+
+# Categorías de partidas en el orden de las filas de la matriz
+INFLOW_CATEGORIES = ("revenue", "other_inflows")
+OPERATING_CATEGORIES = ("cogs", "opex_fixed", "opex_variable", "payroll")
+OUTFLOW_CATEGORIES = OPERATING_CATEGORIES + ("loan_interest", "loan_principal", "capex", "other_outflows")
+CATEGORIES = INFLOW_CATEGORIES + OUTFLOW_CATEGORIES
+
+# Periodos por año de cada frecuencia
+PERIODS_PER_YEAR = {"monthly": 12, "weekly": 52, "daily": 365}
+
+# Periodos por bloque al generar la proyección
+DEFAULT_CHUNK_SIZE = 512
+
+
+@dataclass
+class ProjectionChunk:
+    """Bloque de periodos consecutivos de una proyección"""
+    period: np.ndarray
+    amounts: Dict[str, np.ndarray]
+    taxes: np.ndarray
+    total_inflows: np.ndarray
+    total_outflows: np.ndarray
+    operating_cash_flow: np.ndarray
+    free_cash_flow: np.ndarray
+    net_cash_flow: np.ndarray
+    ending_cash: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.period)
+
+
+@dataclass
+class ProjectionSummary:
+    periods: int
+    frequency: str
+    total_inflows: float
+    total_outflows: float
+    total_taxes: float
+    net_cash_flow: float
+    ending_cash: float
+    minimum_cash: float
+    cash_out_period: Optional[int]
+    runway_periods: Optional[float]
+    runway_months: Optional[float]
+
+
+def period_factors(growth_rates: Mapping[str, float], frequency: str) -> np.ndarray:
+    """
+    Factor de crecimiento por periodo de cada categoría a partir de tasas
+    mensuales compuestas (las categorías sin tasa no crecen)
+    """
+    if frequency not in PERIODS_PER_YEAR:
+        raise ValueError(f"Frecuencia no válida: {frequency}")
+    for category, rate in growth_rates.items():
+        if category not in CATEGORIES:
+            raise ValueError(f"Categoría no válida: {category}")
+        if rate <= -1:
+            raise ValueError(f"La tasa de crecimiento de {category} debe ser mayor a -100%")
+    months_per_period = 12 / PERIODS_PER_YEAR[frequency]
+    monthly = np.array([growth_rates.get(category, 0.0) for category in CATEGORIES], dtype=np.float64)
+    return (1.0 + monthly) ** months_per_period
+
+
+def iter_projection(
+    monthly_amounts: Mapping[str, float],
+    starting_cash: float,
+    tax_rate: float,
+    periods: int,
+    frequency: str = "monthly",
+    growth_rates: Optional[Mapping[str, float]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[ProjectionChunk]:
+    """
+    Proyecta `periods` periodos a partir de montos mensuales por categoría.
+
+    Los montos se prorratean a la frecuencia pedida y crecen de forma
+    compuesta desde el primer periodo. Produce bloques de hasta
+    `chunk_size` periodos; el saldo se arrastra entre bloques.
+    """
+    factors = period_factors(growth_rates or {}, frequency)
+    scale = 12 / PERIODS_PER_YEAR[frequency]
+    base = np.array([monthly_amounts.get(category, 0.0) for category in CATEGORIES], dtype=np.float64) * scale
+    index = {category: row for row, category in enumerate(CATEGORIES)}
+    log_factors = np.log(factors)[:, None]
+
+    cash = float(starting_cash)
+    for start in range(0, periods, chunk_size):
+        t = np.arange(start, min(start + chunk_size, periods))
+        matrix = base[:, None] * np.exp(log_factors * t)
+
+        revenue = matrix[index["revenue"]]
+        inflows = matrix[index["revenue"]] + matrix[index["other_inflows"]]
+        operating_out = sum(matrix[index[category]] for category in OPERATING_CATEGORIES)
+
+        # Impuestos solo sobre la utilidad operativa positiva del periodo
+        taxes = np.maximum(revenue - operating_out - matrix[index["loan_interest"]], 0.0) * tax_rate
+        outflows = sum(matrix[index[category]] for category in OUTFLOW_CATEGORIES) + taxes
+        operating = revenue - operating_out - taxes
+        net = inflows - outflows
+        ending = cash + np.cumsum(net)
+        cash = float(ending[-1])
+
+        yield ProjectionChunk(
+            period=t + 1,
+            amounts={category: matrix[row] for category, row in index.items()},
+            taxes=taxes,
+            total_inflows=inflows,
+            total_outflows=outflows,
+            operating_cash_flow=operating,
+            free_cash_flow=operating - matrix[index["capex"]],
+            net_cash_flow=net,
+            ending_cash=ending,
+        )
+
+
+class ProjectionTracker:
+    """
+    Acumula los totales y el runway de una proyección conforme se
+    consumen sus bloques, sin guardar la serie completa.
+    """
+
+    def __init__(self, starting_cash: float, frequency: str):
+        self.starting_cash = float(starting_cash)
+        self.frequency = frequency
+        self.periods = 0
+        self.total_inflows = 0.0
+        self.total_outflows = 0.0
+        self.total_taxes = 0.0
+        self.cash = float(starting_cash)
+        self.minimum_cash = float(starting_cash)
+        self.cash_out_period: Optional[int] = None
+        self.runway_periods: Optional[float] = None
+        if starting_cash < 0:
+            self.cash_out_period = 0
+            self.runway_periods = 0.0
+
+    def update(self, chunk: ProjectionChunk) -> None:
+        if self.cash_out_period is None:
+            negative = np.flatnonzero(chunk.ending_cash < 0)
+            if len(negative):
+                i = negative[0]
+                before = chunk.ending_cash[i - 1] if i > 0 else self.cash
+                # El saldo baja linealmente dentro del periodo en que se agota
+                self.cash_out_period = int(chunk.period[i])
+                self.runway_periods = float(chunk.period[i] - 1 + before / -chunk.net_cash_flow[i])
+
+        self.periods += len(chunk)
+        self.total_inflows += float(chunk.total_inflows.sum())
+        self.total_outflows += float(chunk.total_outflows.sum())
+        self.total_taxes += float(chunk.taxes.sum())
+        self.minimum_cash = min(self.minimum_cash, float(chunk.ending_cash.min()))
+        self.cash = float(chunk.ending_cash[-1])
+
+    def summary(self) -> ProjectionSummary:
+        months_per_period = 12 / PERIODS_PER_YEAR[self.frequency]
+        return ProjectionSummary(
+            periods=self.periods,
+            frequency=self.frequency,
+            total_inflows=self.total_inflows,
+            total_outflows=self.total_outflows,
+            total_taxes=self.total_taxes,
+            net_cash_flow=self.cash - self.starting_cash,
+            ending_cash=self.cash,
+            minimum_cash=self.minimum_cash,
+            cash_out_period=self.cash_out_period,
+            runway_periods=self.runway_periods,
+            runway_months=self.runway_periods * months_per_period if self.runway_periods is not None else None,
+        )
+
+
+def constant_runway_months(starting_cash: float, net_cash_flow: float) -> Optional[float]:
+    """Runway exacto con flujos mensuales constantes, o None si no hay quema"""
+    if net_cash_flow >= 0:
+        return None
+    return max(starting_cash, 0.0) / -net_cash_flow
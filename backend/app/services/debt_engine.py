@@ -0,0 +1,547 @@
+"""
+Motor de simulación de pago de deudas.
+
+Mantiene saldos, tasas y pagos mínimos en arreglos contiguos de NumPy y
+actualiza todas las deudas activas en un solo paso vectorizado por mes.
+La política de asignación (avalancha, bola de nieve, personalizada) se
+inyecta como una función de ordenamiento.
+"""
+from dataclasses import dataclass
+from itertools import permutations
+from typing import Callable, Dict, Generator, Optional
+import numpy as np
+
+# Límite de meses para prevenir bucles infinitos (50 años)
+MAX_MONTHS = 600
+
+# Saldo por debajo del cual una deuda se considera pagada
+PAID_EPSILON = 1e-9
+
+# Niveles de detalle del calendario: sin calendario, un renglón agregado
+# por mes, o un renglón por deuda y mes
+DETAIL_LEVELS = ("summary", "monthly", "full")
+
+# Una política de orden recibe (saldos, tasas anuales %, prioridades) y
+# devuelve los índices de las deudas de mayor a menor prioridad
+DebtOrdering = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def order_by_highest_rate(balances: np.ndarray, rates: np.ndarray, priorities: np.ndarray) -> np.ndarray:
+    """Avalancha: primero la deuda con mayor tasa de interés"""
+    return np.argsort(-rates, kind="stable")
+
+
+def order_by_smallest_balance(balances: np.ndarray, rates: np.ndarray, priorities: np.ndarray) -> np.ndarray:
+    """Bola de nieve: primero la deuda con menor saldo"""
+    return np.argsort(balances, kind="stable")
+
+
+def order_by_priority(balances: np.ndarray, rates: np.ndarray, priorities: np.ndarray) -> np.ndarray:
+    """Personalizada: primero la deuda con menor número de prioridad"""
+    return np.argsort(priorities, kind="stable")
+
+
+ORDERINGS: Dict[str, DebtOrdering] = {
+    "avalanche": order_by_highest_rate,
+    "snowball": order_by_smallest_balance,
+    "custom": order_by_priority,
+}
+
+
+@dataclass
+class PaymentSchedule:
+    """Calendario de pagos en formato columnar (una fila por deuda y mes)"""
+    month: np.ndarray
+    debt_index: np.ndarray
+    payment: np.ndarray
+    principal: np.ndarray
+    interest: np.ndarray
+    remaining_balance: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.month)
+
+
+@dataclass
+class MonthlyTotals:
+    """Totales agregados por mes de todas las deudas activas"""
+    month: np.ndarray
+    payment: np.ndarray
+    principal: np.ndarray
+    interest: np.ndarray
+    remaining_balance: np.ndarray
+    active_debts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.month)
+
+
+@dataclass
+class SimulationResult:
+    months: int
+    total_interest: float
+    total_payments: float
+    order: np.ndarray
+    payoff_month: np.ndarray
+    schedule: Optional[PaymentSchedule] = None
+    monthly: Optional[MonthlyTotals] = None
+
+
+def simulate(
+    balances: np.ndarray,
+    rates: np.ndarray,
+    minimums: np.ndarray,
+    extra_payment: float,
+    order: np.ndarray,
+    rollover: bool = True,
+    max_months: int = MAX_MONTHS,
+    detail: str = "full",
+) -> SimulationResult:
+    """
+    Simula el pago mes a mes de un conjunto de deudas.
+
+    Cada mes todas las deudas activas pagan su mínimo; el remanente del
+    presupuesto (pago extra más, si `rollover` está activo, los mínimos
+    liberados por deudas ya pagadas) se asigna en cascada siguiendo `order`.
+    Los índices de `debt_index` y `payoff_month` se refieren al orden original.
+
+    `detail` controla qué se registra: "full" guarda un renglón por deuda y
+    mes, "monthly" uno agregado por mes y "summary" solo los acumulados.
+    En modo "summary" se salta directamente entre eventos de liquidación
+    (ver `_simulate_events`).
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"Nivel de detalle no válido: {detail}")
+    if detail == "summary":
+        return _simulate_events(balances, rates, minimums, extra_payment, order, rollover, max_months)
+
+    order = np.asarray(order, dtype=np.intp)
+    n = len(order)
+    payoff_month = np.zeros(n, dtype=np.int64)
+
+    columns = ([], [], [], [], [], []) if detail == "full" else None
+    totals = ([], [], [], [], [], []) if detail == "monthly" else None
+    total_interest = 0.0
+    total_payments = 0.0
+    month = 0
+
+    for month, active, payment, principal, interest, new_balance in _iter_steps(
+        balances, rates, minimums, extra_payment, order, rollover, max_months
+    ):
+        payoff_month[active & (new_balance == 0)] = month
+        total_interest += interest.sum()
+        total_payments += payment.sum()
+
+        if columns is not None:
+            idx = np.flatnonzero(active)
+            columns[0].append(np.full(len(idx), month, dtype=np.int64))
+            columns[1].append(order[idx])
+            columns[2].append(payment[idx])
+            columns[3].append(principal[idx])
+            columns[4].append(interest[idx])
+            columns[5].append(new_balance[idx])
+        elif totals is not None:
+            totals[0].append(month)
+            totals[1].append(payment.sum())
+            totals[2].append(principal.sum())
+            totals[3].append(interest.sum())
+            totals[4].append(new_balance.sum())
+            totals[5].append(np.count_nonzero(active))
+
+    original_payoff = np.zeros(n, dtype=np.int64)
+    original_payoff[order] = payoff_month
+
+    return SimulationResult(
+        months=month,
+        total_interest=float(total_interest),
+        total_payments=float(total_payments),
+        order=order,
+        payoff_month=original_payoff,
+        schedule=_concat_schedule(columns) if columns is not None else None,
+        monthly=_monthly_totals(totals) if totals is not None else None,
+    )
+
+
+def iter_schedule(
+    balances: np.ndarray,
+    rates: np.ndarray,
+    minimums: np.ndarray,
+    extra_payment: float,
+    order: np.ndarray,
+    rollover: bool = True,
+    max_months: int = MAX_MONTHS,
+) -> Generator[PaymentSchedule, None, SimulationResult]:
+    """
+    Variante perezosa de `simulate` con detalle "full".
+
+    Produce un `PaymentSchedule` por mes con los renglones de las deudas
+    activas, sin acumular el calendario completo; la memoria no depende
+    del horizonte. Al agotarse, el generador devuelve (en
+    `StopIteration.value`) un `SimulationResult` con los acumulados y sin
+    calendario.
+    """
+    order = np.asarray(order, dtype=np.intp)
+    n = len(order)
+    payoff_month = np.zeros(n, dtype=np.int64)
+    total_interest = 0.0
+    total_payments = 0.0
+    month = 0
+
+    for month, active, payment, principal, interest, new_balance in _iter_steps(
+        balances, rates, minimums, extra_payment, order, rollover, max_months
+    ):
+        payoff_month[active & (new_balance == 0)] = month
+        total_interest += interest.sum()
+        total_payments += payment.sum()
+
+        idx = np.flatnonzero(active)
+        yield PaymentSchedule(
+            month=np.full(len(idx), month, dtype=np.int64),
+            debt_index=order[idx],
+            payment=payment[idx],
+            principal=principal[idx],
+            interest=interest[idx],
+            remaining_balance=new_balance[idx],
+        )
+
+    original_payoff = np.zeros(n, dtype=np.int64)
+    original_payoff[order] = payoff_month
+    return SimulationResult(
+        months=month,
+        total_interest=float(total_interest),
+        total_payments=float(total_payments),
+        order=order,
+        payoff_month=original_payoff,
+    )
+
+
+def _iter_steps(balances, rates, minimums, extra_payment, order, rollover, max_months):
+    """
+    Recorre la simulación mes a mes con las deudas ya ordenadas por
+    prioridad. Produce (mes, activas, pago, capital, interés, saldo nuevo).
+    """
+    balance = np.asarray(balances, dtype=np.float64)[order].copy()
+    monthly_rate = np.asarray(rates, dtype=np.float64)[order] / 100 / 12
+    minimum = np.asarray(minimums, dtype=np.float64)[order]
+
+    budget = minimum.sum() + extra_payment
+    balance[balance <= PAID_EPSILON] = 0.0
+    month = 0
+
+    while month < max_months and balance.any():
+        month += 1
+        active = balance > 0
+        payment, principal, interest, new_balance = _step(balance, monthly_rate, minimum, budget, extra_payment, rollover)
+        yield month, active, payment, principal, interest, new_balance
+        balance = new_balance
+
+
+def _step(balance, monthly_rate, minimum, budget, extra_payment, rollover):
+    """
+    Aplica un mes de pagos a todas las deudas (ordenadas por prioridad en
+    el último eje). Acepta un vector de deudas o una matriz (escenarios ×
+    deudas) con `budget` y `extra_payment` como columnas por escenario.
+    """
+    interest = balance * monthly_rate
+    owed = balance + interest
+    base = np.minimum(minimum, owed)
+
+    # Repartir el remanente en cascada según la prioridad
+    pool = budget - base.sum(axis=-1, keepdims=True) if rollover else extra_payment
+    room = owed - base
+    before = np.cumsum(room, axis=-1) - room
+    payment = base + np.clip(pool - before, 0.0, room)
+
+    principal = np.maximum(payment - interest, 0.0)
+    new_balance = balance - principal
+    new_balance[new_balance <= PAID_EPSILON] = 0.0
+    return payment, principal, interest, new_balance
+
+
+def _simulate_events(balances, rates, minimums, extra_payment, order, rollover, max_months) -> SimulationResult:
+    """
+    Variante de `simulate` que solo calcula acumulados.
+
+    Mientras ninguna deuda se liquida, la asignación del pago no cambia y
+    cada saldo sigue la recurrencia de anualidad b' = b(1 + r) - p. Para
+    cada deuda activa se calcula en forma cerrada el mes en que se liquida,
+    se avanza de golpe hasta el primer evento y solo ese mes se simula paso
+    a paso para reasignar el pago liberado. El costo es O(deudas²) en lugar
+    de O(meses × deudas).
+    """
+    order = np.asarray(order, dtype=np.intp)
+    balance = np.asarray(balances, dtype=np.float64)[order].copy()
+    monthly_rate = np.asarray(rates, dtype=np.float64)[order] / 100 / 12
+    minimum = np.asarray(minimums, dtype=np.float64)[order]
+    n = len(balance)
+
+    budget = minimum.sum() + extra_payment
+    payoff_month = np.zeros(n, dtype=np.int64)
+    balance[balance <= PAID_EPSILON] = 0.0
+
+    total_interest = 0.0
+    total_payments = 0.0
+    month = 0
+
+    while month < max_months and balance.any():
+        active = balance > 0
+
+        # Pago constante de cada deuda mientras no haya liquidaciones:
+        # su mínimo, y el remanente completo para la primera deuda activa
+        payment = np.where(active, minimum, 0.0)
+        pool = budget - payment.sum() if rollover else extra_payment
+        payment[np.argmax(active)] += max(pool, 0.0)
+
+        interest = balance * monthly_rate
+        amortizing = active & (payment > interest)
+        months_left = _months_to_payoff(balance, monthly_rate, payment, amortizing)
+        jump = int(min(months_left.min(), max_months - month)) - 1
+
+        if jump > 0:
+            growth = _annuity_growth(monthly_rate, jump)
+            new_balance = np.where(amortizing, balance * (1 + monthly_rate) ** jump - payment * growth, balance)
+            paid = payment * jump
+            total_payments += paid.sum()
+            total_interest += np.where(amortizing, paid - (balance - new_balance), interest * jump).sum()
+            balance = new_balance
+            month += jump
+
+        if month >= max_months:
+            break
+
+        # Mes del evento: simularlo exactamente para repartir el sobrante
+        month += 1
+        active = balance > 0
+        payment, principal, interest, new_balance = _step(balance, monthly_rate, minimum, budget, extra_payment, rollover)
+        payoff_month[active & (new_balance == 0)] = month
+        total_interest += interest.sum()
+        total_payments += payment.sum()
+        balance = new_balance
+
+    original_payoff = np.zeros(n, dtype=np.int64)
+    original_payoff[order] = payoff_month
+
+    return SimulationResult(
+        months=month,
+        total_interest=float(total_interest),
+        total_payments=float(total_payments),
+        order=order,
+        payoff_month=original_payoff,
+    )
+
+
+@dataclass
+class PathsResult:
+    """Resultados por trayectoria de una simulación Monte Carlo"""
+    months: np.ndarray
+    total_interest: np.ndarray
+    paid_off: np.ndarray
+
+
+def simulate_paths(
+    balances: np.ndarray,
+    rates: np.ndarray,
+    minimums: np.ndarray,
+    extra_payment: float,
+    order: np.ndarray,
+    paths: int,
+    rng: np.random.Generator,
+    rate_volatility: float = 0.0,
+    variable_rate: Optional[np.ndarray] = None,
+    monthly_income: float = 0.0,
+    income_volatility: float = 0.0,
+    max_months: int = MAX_MONTHS,
+) -> PathsResult:
+    """
+    Simula muchas trayectorias a la vez sobre una matriz (trayectorias × deudas).
+
+    Cada mes las tasas de las deudas variables siguen una caminata aleatoria
+    (desviación anual de `rate_volatility` puntos porcentuales) y el ingreso
+    se multiplica por un choque normal con desviación `income_volatility`;
+    la variación del ingreso se suma o resta del pago extra disponible.
+    """
+    order = np.asarray(order, dtype=np.intp)
+    n = len(order)
+    balance = np.tile(np.asarray(balances, dtype=np.float64)[order], (paths, 1))
+    annual_rate = np.tile(np.asarray(rates, dtype=np.float64)[order], (paths, 1))
+    minimum = np.asarray(minimums, dtype=np.float64)[order]
+    shock_mask = np.ones(n) if variable_rate is None else np.asarray(variable_rate, dtype=np.float64)[order]
+    balance[balance <= PAID_EPSILON] = 0.0
+
+    months = np.full(paths, max_months, dtype=np.int64)
+    months[~balance.any(axis=1)] = 0
+    total_interest = np.zeros(paths)
+    monthly_shock = rate_volatility / np.sqrt(12)
+    month = 0
+
+    while month < max_months:
+        running = balance.any(axis=1)
+        if not running.any():
+            break
+        month += 1
+
+        if monthly_shock > 0:
+            annual_rate += rng.standard_normal((paths, n)) * (monthly_shock * shock_mask)
+            np.maximum(annual_rate, 0.0, out=annual_rate)
+
+        extra = np.full((paths, 1), float(extra_payment))
+        if income_volatility > 0 and monthly_income > 0:
+            income_change = rng.standard_normal((paths, 1)) * (income_volatility * monthly_income)
+            extra = np.maximum(extra + income_change, 0.0)
+
+        budget = minimum.sum() + extra
+        _, _, interest, balance = _step(balance, annual_rate / 100 / 12, minimum, budget, extra, True)
+        total_interest += interest.sum(axis=1)
+        months[running & ~balance.any(axis=1)] = month
+
+    return PathsResult(
+        months=months,
+        total_interest=total_interest,
+        paid_off=~balance.any(axis=1),
+    )
+
+
+OBJECTIVES = ("interest", "months")
+
+# Hasta este número de deudas se prueban todos los órdenes (6! = 720);
+# con más se usa búsqueda local
+EXHAUSTIVE_MAX_DEBTS = 6
+
+
+def _objective_key(result: SimulationResult, objective: str):
+    if objective == "months":
+        return (result.months, result.total_interest)
+    return (result.total_interest, result.months)
+
+
+def optimize_order(
+    balances: np.ndarray,
+    rates: np.ndarray,
+    minimums: np.ndarray,
+    extra_payment: float,
+    objective: str = "interest",
+    max_months: int = MAX_MONTHS,
+):
+    """
+    Busca el orden de prioridad que minimiza los intereses o el plazo.
+
+    Con hasta `EXHAUSTIVE_MAX_DEBTS` deudas evalúa todos los órdenes, así
+    que el resultado es el óptimo. Con más es una heurística: parte del
+    mejor entre avalancha y bola de nieve y aplica búsqueda local
+    intercambiando deudas adyacentes hasta que ninguna mejora, por lo que
+    devuelve el mejor orden encontrado, no necesariamente el óptimo. Cada
+    evaluación usa la simulación por eventos. Devuelve el orden, su
+    resultado, el número de órdenes evaluados y si la búsqueda fue
+    exhaustiva.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objetivo no válido: {objective}")
+
+    def evaluate(order):
+        return simulate(balances, rates, minimums, extra_payment, order, max_months=max_months, detail="summary")
+
+    candidates = [
+        order_by_highest_rate(balances, rates, None),
+        order_by_smallest_balance(balances, rates, None),
+    ]
+    results = [evaluate(order) for order in candidates]
+    evaluated = len(results)
+    best = min(range(len(results)), key=lambda i: _objective_key(results[i], objective))
+    best_order, best_result = candidates[best].copy(), results[best]
+
+    exhaustive = len(best_order) <= EXHAUSTIVE_MAX_DEBTS
+    if exhaustive:
+        # Ante empate se conserva avalancha o bola de nieve, evaluadas primero
+        seen = {tuple(order.tolist()) for order in candidates}
+        for permutation in permutations(range(len(best_order))):
+            if permutation in seen:
+                continue
+            order = np.array(permutation, dtype=best_order.dtype)
+            result = evaluate(order)
+            evaluated += 1
+            if _objective_key(result, objective) < _objective_key(best_result, objective):
+                best_order, best_result = order, result
+        return best_order, best_result, evaluated, exhaustive
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(best_order) - 1):
+            order = best_order.copy()
+            order[i], order[i + 1] = order[i + 1], order[i]
+            result = evaluate(order)
+            evaluated += 1
+            if _objective_key(result, objective) < _objective_key(best_result, objective):
+                best_order, best_result = order, result
+                improved = True
+
+    return best_order, best_result, evaluated, exhaustive
+
+
+def minimum_extra_payment(
+    balances: np.ndarray,
+    rates: np.ndarray,
+    minimums: np.ndarray,
+    order: np.ndarray,
+    target_months: int,
+    tolerance: float = 0.01,
+) -> Optional[float]:
+    """
+    Pago extra mensual más pequeño (con precisión `tolerance`) que liquida
+    todas las deudas en `target_months` meses o menos, por bisección.
+    """
+    def months_with(extra):
+        # Con el límite en target_months + 1, terminar antes implica haber liquidado todo
+        return simulate(balances, rates, minimums, extra, order, max_months=target_months + 1, detail="summary").months
+
+    if months_with(0.0) <= target_months:
+        return 0.0
+
+    # Un pago extra igual a la deuda total más un mes de intereses liquida todo en el primer mes
+    high = float(np.sum(np.asarray(balances) * (1 + np.asarray(rates) / 100 / 12)))
+    low = 0.0
+    while high - low > tolerance:
+        middle = (low + high) / 2
+        if months_with(middle) <= target_months:
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+def _annuity_growth(monthly_rate: np.ndarray, months) -> np.ndarray:
+    """Factor ((1 + r)^m - 1) / r, con límite m cuando r = 0"""
+    safe_rate = np.where(monthly_rate > 0, monthly_rate, 1.0)
+    growth = np.expm1(months * np.log1p(monthly_rate)) / safe_rate
+    return np.where(monthly_rate > 0, growth, months)
+
+
+def _months_to_payoff(balance, monthly_rate, payment, amortizing) -> np.ndarray:
+    """Mes (desde hoy) en que cada deuda se liquida con un pago constante"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        safe_rate = np.where(monthly_rate > 0, monthly_rate, 1.0)
+        with_interest = np.log(payment / (payment - balance * monthly_rate)) / np.log1p(safe_rate)
+        without_interest = balance / payment
+        exact = np.where(monthly_rate > 0, with_interest, without_interest)
+    months = np.full(len(balance), np.inf)
+    months[amortizing] = np.maximum(np.ceil(exact[amortizing] - 1e-9), 1)
+    return months
+
+
+def _concat_schedule(columns) -> PaymentSchedule:
+    if not columns[0]:
+        empty_int = np.zeros(0, dtype=np.int64)
+        empty = np.zeros(0, dtype=np.float64)
+        return PaymentSchedule(empty_int, empty_int, empty, empty, empty, empty)
+    return PaymentSchedule(*(np.concatenate(column) for column in columns))
+
+
+def _monthly_totals(totals) -> MonthlyTotals:
+    return MonthlyTotals(
+        month=np.array(totals[0], dtype=np.int64),
+        payment=np.array(totals[1], dtype=np.float64),
+        principal=np.array(totals[2], dtype=np.float64),
+        interest=np.array(totals[3], dtype=np.float64),
+        remaining_balance=np.array(totals[4], dtype=np.float64),
+        active_debts=np.array(totals[5], dtype=np.int64),
+    )
@@ -0,0 +1,298 @@
+"""
+Ingesta de libros de movimientos para el flujo de caja.
+
+Los movimientos (fecha, categoría, monto) se leen por bloques desde CSV o
+Parquet y se acumulan por periodo en las categorías de `cashflow_engine`.
+Los totales por categoría son montos positivos: un egreso resta del flujo
+por su categoría, no por su signo. Los exportes que guardan las salidas
+como negativos se normalizan (ver `AMOUNT_SIGNS`). La memoria depende
+del número de periodos y de categorías distintas, no del número de
+renglones, así que un archivo de varios GB se procesa sin cargarlo
+completo.
+"""
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+import csv
+import io
+import unicodedata
+import numpy as np
+
+from app.services import cashflow_engine
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional; sin él solo se acepta CSV
+    pq = None
+
+# Renglones por bloque al leer el archivo
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Unidad de datetime64 con que se agrupa cada frecuencia
+PERIOD_UNITS = {"monthly": "M", "weekly": "W", "daily": "D"}
+
+# Cómo vienen los egresos en el libro: "positive" (montos positivos en su
+# categoría), "negative" (salidas con signo negativo) o "auto" (el signo
+# que predomine en las categorías de egreso de todo el libro)
+AMOUNT_SIGNS = ("auto", "positive", "negative")
+
+# El 1970-01-01 fue jueves: desplazamiento para que las semanas inicien en lunes
+WEEK_OFFSET_DAYS = 3
+
+# Etiquetas habituales de los exportes contables (normalizadas) por categoría
+DEFAULT_CATEGORY_MAP = {
+    "ventas": "revenue",
+    "ingresos": "revenue",
+    "revenue": "revenue",
+    "sales": "revenue",
+    "servicios": "revenue",
+    "otros ingresos": "other_inflows",
+    "other income": "other_inflows",
+    "costo de ventas": "cogs",
+    "cogs": "cogs",
+    "materia prima": "cogs",
+    "inventario": "cogs",
+    "renta": "opex_fixed",
+    "rent": "opex_fixed",
+    "servicios fijos": "opex_fixed",
+    "software": "opex_fixed",
+    "marketing": "opex_variable",
+    "publicidad": "opex_variable",
+    "comisiones": "opex_variable",
+    "envios": "opex_variable",
+    "nomina": "payroll",
+    "sueldos": "payroll",
+    "payroll": "payroll",
+    "intereses": "loan_interest",
+    "interest": "loan_interest",
+    "capital deuda": "loan_principal",
+    "principal": "loan_principal",
+    "equipo": "capex",
+    "capex": "capex",
+    "otros egresos": "other_outflows",
+    "other expenses": "other_outflows",
+}
+
+
+def normalize_label(label: str) -> str:
+    """Minúsculas, sin acentos ni espacios sobrantes"""
+    text = unicodedata.normalize("NFKD", str(label)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().split())
+
+
+class LedgerAggregator:
+    """
+    Acumula montos por periodo y categoría de flujo de caja. Las
+    categorías del libro que no tienen equivalente se reportan aparte.
+    """
+
+    def __init__(
+        self,
+        frequency: str = "monthly",
+        category_map: Optional[Mapping[str, str]] = None,
+        amount_sign: str = "auto",
+    ):
+        if frequency not in PERIOD_UNITS:
+            raise ValueError(f"Frecuencia no válida: {frequency}")
+        if amount_sign not in AMOUNT_SIGNS:
+            raise ValueError(f"Convención de signo no válida: {amount_sign}")
+        mapping = dict(DEFAULT_CATEGORY_MAP)
+        for label, category in (category_map or {}).items():
+            if category not in cashflow_engine.CATEGORIES:
+                raise ValueError(f"Categoría de flujo no válida: {category}")
+            mapping[normalize_label(label)] = category
+
+        self.frequency = frequency
+        self.unit = PERIOD_UNITS[frequency]
+        self.amount_sign = amount_sign
+        self.rows = 0
+        self.skipped = 0
+        self._mapping = mapping
+        self._bucket_of: Dict[str, int] = {}
+        self._periods: Dict[int, np.ndarray] = {}
+        self.unmapped: Dict[str, float] = {}
+
+        # Suma de montos positivos y negativos de los egresos, para "auto"
+        self._outflow_columns = np.array(
+            [cashflow_engine.CATEGORIES.index(category) for category in cashflow_engine.OUTFLOW_CATEGORIES]
+        )
+        self._outflow_positive = 0.0
+        self._outflow_negative = 0.0
+
+    @property
+    def outflows_negative(self) -> bool:
+        """Si el libro guarda los egresos con signo negativo"""
+        if self.amount_sign == "auto":
+            return self._outflow_negative > self._outflow_positive
+        return self.amount_sign == "negative"
+
+    def update(self, dates: Iterable, categories: Iterable, amounts: Iterable) -> None:
+        """Agrega un bloque de movimientos (tres columnas del mismo largo)"""
+        dates = _parse_dates(dates)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        labels, inverse = np.unique(np.asarray(categories, dtype=str), return_inverse=True)
+        self.rows += len(amounts)
+
+        # Mapear cada etiqueta distinta una sola vez
+        buckets = np.array([self._bucket(label) for label in labels.tolist()], dtype=np.int64)
+        row_bucket = buckets[inverse] if len(labels) else np.zeros(0, dtype=np.int64)
+
+        valid = ~np.isnat(dates) & np.isfinite(amounts)
+        self.skipped += int(np.count_nonzero(~valid))
+        unmapped = valid & (row_bucket < 0)
+        if unmapped.any():
+            totals = np.bincount(inverse[unmapped], weights=amounts[unmapped], minlength=len(labels))
+            for label, total in zip(labels.tolist(), totals.tolist()):
+                if total:
+                    self.unmapped[label] = self.unmapped.get(label, 0.0) + total
+
+        keep = valid & (row_bucket >= 0)
+        if not keep.any():
+            return
+        periods = self._period_of(dates[keep])
+        unique_periods, period_index = np.unique(periods, return_inverse=True)
+        block = np.zeros((len(unique_periods), len(cashflow_engine.CATEGORIES)))
+        np.add.at(block, (period_index, row_bucket[keep]), amounts[keep])
+
+        kept_outflows = np.isin(row_bucket[keep], self._outflow_columns)
+        if kept_outflows.any():
+            signed = amounts[keep][kept_outflows]
+            self._outflow_positive += float(signed[signed > 0].sum())
+            self._outflow_negative -= float(signed[signed < 0].sum())
+
+        for period, row in zip(unique_periods.tolist(), block):
+            if period in self._periods:
+                self._periods[period] += row
+            else:
+                self._periods[period] = row
+
+    def table(self) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """Etiquetas de periodo (ISO) y una serie por categoría, sin huecos"""
+        if not self._periods:
+            return [], {category: np.zeros(0) for category in cashflow_engine.CATEGORIES}
+        first, last = min(self._periods), max(self._periods)
+        matrix = np.zeros((last - first + 1, len(cashflow_engine.CATEGORIES)))
+        for period, row in self._periods.items():
+            matrix[period - first] = row
+        if self.outflows_negative:
+            matrix[:, self._outflow_columns] *= -1
+        periods = np.arange(first, last + 1)
+        if self.unit == "W":
+            labels = (periods * 7 - WEEK_OFFSET_DAYS).astype("datetime64[D]")
+        else:
+            labels = periods.astype(f"datetime64[{self.unit}]")
+        return [str(label) for label in labels], {
+            category: matrix[:, column] for column, category in enumerate(cashflow_engine.CATEGORIES)
+        }
+
+    def monthly_baseline(self, recent_periods: int = 3) -> Dict[str, float]:
+        """
+        Monto mensual por categoría: promedio de los últimos
+        `recent_periods` periodos, convertido a base mensual
+        """
+        _, series = self.table()
+        months_per_period = 12 / cashflow_engine.PERIODS_PER_YEAR[self.frequency]
+        return {
+            category: float(values[-recent_periods:].mean() / months_per_period) if len(values) else 0.0
+            for category, values in series.items()
+        }
+
+    def _period_of(self, dates: np.ndarray) -> np.ndarray:
+        if self.unit == "W":
+            return (dates.astype(np.int64) + WEEK_OFFSET_DAYS) // 7
+        return dates.astype(f"datetime64[{self.unit}]").astype(np.int64)
+
+    def _bucket(self, label: str) -> int:
+        bucket = self._bucket_of.get(label)
+        if bucket is None:
+            category = self._mapping.get(normalize_label(label))
+            bucket = cashflow_engine.CATEGORIES.index(category) if category else -1
+            self._bucket_of[label] = bucket
+        return bucket
+
+
+def iter_csv_chunks(
+    stream: BinaryIO,
+    date_column: str = "date",
+    category_column: str = "category",
+    amount_column: str = "amount",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[Tuple[List[str], List[str], np.ndarray]]:
+    """Lee un CSV binario por bloques de renglones: (fechas, categorías, montos)"""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    try:
+        positions = [columns.index(name.lower()) for name in (date_column, category_column, amount_column)]
+    except ValueError:
+        raise ValueError(f"El CSV debe tener las columnas {date_column}, {category_column} y {amount_column}")
+    date_at, category_at, amount_at = positions
+    width = max(positions) + 1
+
+    dates, categories, amounts = [], [], []
+    for row in reader:
+        if len(row) < width:
+            # Renglón incompleto: se cuenta como omitido (fecha y monto vacíos)
+            dates.append("NaT")
+            categories.append("")
+            amounts.append("")
+        else:
+            dates.append(row[date_at].strip()[:10] or "NaT")
+            categories.append(row[category_at])
+            amounts.append(row[amount_at])
+        if len(dates) >= chunk_rows:
+            yield dates, categories, _parse_amounts(amounts)
+            dates, categories, amounts = [], [], []
+    if dates:
+        yield dates, categories, _parse_amounts(amounts)
+
+
+def iter_parquet_chunks(
+    source,
+    date_column: str = "date",
+    category_column: str = "category",
+    amount_column: str = "amount",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[Tuple[np.ndarray, List[str], np.ndarray]]:
+    """Lee un archivo Parquet por lotes de renglones (requiere pyarrow)"""
+    if pq is None:
+        raise ValueError("La lectura de Parquet requiere pyarrow")
+    parquet = pq.ParquetFile(source)
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=[date_column, category_column, amount_column]):
+        dates = batch.column(date_column).to_numpy(zero_copy_only=False)
+        if dates.dtype.kind != "M":
+            dates = [str(value)[:10] if value is not None else "NaT" for value in dates.tolist()]
+        categories = [str(value) for value in batch.column(category_column).to_pylist()]
+        amounts = batch.column(amount_column).to_numpy(zero_copy_only=False).astype(np.float64)
+        yield dates, categories, amounts
+
+
+def _parse_dates(values) -> np.ndarray:
+    if isinstance(values, np.ndarray) and values.dtype.kind == "M":
+        return values.astype("datetime64[D]")
+    try:
+        return np.asarray(values, dtype="datetime64[D]")
+    except ValueError:
+        # Algún valor no es fecha ISO: convertir uno por uno y marcarlo como NaT
+        dates = np.empty(len(values), dtype="datetime64[D]")
+        for i, value in enumerate(values):
+            try:
+                dates[i] = np.datetime64(value, "D")
+            except ValueError:
+                dates[i] = np.datetime64("NaT")
+        return dates
+
+
+def _parse_amounts(values: List[str]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass
+    # Acepta separadores de miles y símbolo de moneda; lo inválido queda como NaN
+    amounts = np.empty(len(values))
+    for i, value in enumerate(values):
+        try:
+            amounts[i] = float(value.replace(",", "").replace("$", "").strip())
+        except ValueError:
+            amounts[i] = np.nan
+    return amounts
@@ -0,0 +1,150 @@
+"""
+Motor de amortización de préstamos en forma cerrada.
+
+Con tasa y pago constantes el saldo tras k pagos es
+B·(1+r)^k − P·((1+r)^k − 1)/r, así que el mes de liquidación sale de un
+logaritmo y el total pagado de la suma de k − 1 pagos completos más el
+último pago parcial. Todas las funciones aceptan vectores (una entrada
+por oferta), de modo que cientos de préstamos se comparan sin recorrer
+sus calendarios. El calendario mes a mes solo se construye si se pide.
+"""
+from typing import Dict
+import numpy as np
+
+# Saldo que se considera liquidado (mismo umbral que el comparador del cliente)
+SETTLEMENT_TOLERANCE = 0.01
+
+# Tolerancia e iteraciones del despeje de la tasa de una anualidad
+RATE_TOLERANCE = 1e-12
+RATE_MAX_ITERATIONS = 100
+
+
+def monthly_payment(amount, annual_rate, term_months) -> np.ndarray:
+    """Pago mensual estándar por la fórmula de anualidad"""
+    amount, annual_rate, term_months = np.broadcast_arrays(
+        np.asarray(amount, dtype=np.float64),
+        np.asarray(annual_rate, dtype=np.float64),
+        np.asarray(term_months, dtype=np.float64),
+    )
+    r = annual_rate / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.power(1 + r, term_months)
+        payment = np.where(r > 0, amount * r * growth / (growth - 1), amount / term_months)
+    return np.where((term_months > 0) & (amount > 0), payment, 0.0)
+
+
+def balance_after(amount, annual_rate, payment, months) -> np.ndarray:
+    """Saldo tras `months` pagos completos de `payment`"""
+    r = np.asarray(annual_rate, dtype=np.float64) / 12
+    months = np.asarray(months, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.power(1 + r, months)
+        annuity = np.where(r > 0, (growth - 1) / r, months)
+    return amount * growth - payment * annuity
+
+
+def payoff(amount, annual_rate, payment) -> Dict[str, np.ndarray]:
+    """
+    Mes de liquidación y total pagado con un pago mensual constante
+    (el último pago solo cubre el saldo restante). Los pagos que no
+    cubren el interés del primer mes nunca liquidan: meses y total son inf.
+    """
+    amount, annual_rate, payment = np.broadcast_arrays(
+        np.asarray(amount, dtype=np.float64),
+        np.asarray(annual_rate, dtype=np.float64),
+        np.asarray(payment, dtype=np.float64),
+    )
+    r = annual_rate / 12
+    settles = payment > r * amount
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Primer k con saldo <= tolerancia: (1+r)^k >= (P − r·tol) / (P − r·B)
+        ratio = (payment - r * SETTLEMENT_TOLERANCE) / (payment - r * amount)
+        exact = np.where(r > 0, np.log(ratio) / np.log1p(r), (amount - SETTLEMENT_TOLERANCE) / payment)
+    months = np.maximum(np.ceil(exact - 1e-9), 1)
+    months = np.where(settles & (amount > 0), months, np.where(amount > 0, np.inf, 0))
+
+    finite = np.isfinite(months)
+    full = np.where(finite, months - 1, 0)
+    remaining = balance_after(amount, annual_rate, payment, full)
+    last = np.minimum(payment, remaining * (1 + r))
+    total_paid = np.where(finite, payment * full + np.where(months > 0, last, 0), np.inf)
+    return {"months": months, "total_paid": total_paid, "total_interest": total_paid - amount}
+
+
+def schedule(amount: float, annual_rate: float, payment: float) -> Dict[str, np.ndarray]:
+    """Calendario mes a mes de un préstamo, calculado sin iterar"""
+    months = payoff(amount, annual_rate, payment)["months"]
+    if not np.isfinite(months):
+        raise ValueError("El pago no cubre los intereses: el préstamo no se liquida")
+    r = annual_rate / 12
+    month = np.arange(1, int(months) + 1)
+    opening = balance_after(amount, annual_rate, payment, month - 1)
+    interest = r * opening
+    payments = np.minimum(payment, opening + interest)
+    principal = payments - interest
+    balance = opening - principal
+    balance[-1] = 0.0
+    return {
+        "month": month,
+        "payment": payments,
+        "interest": interest,
+        "principal": principal,
+        "balance": np.maximum(balance, 0.0),
+    }
+
+
+def annuity_factor(rate, months) -> np.ndarray:
+    """Valor presente de 1 por mes durante `months` meses: (1 − (1+i)^−n) / i"""
+    rate = np.asarray(rate, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = -np.expm1(-months * np.log1p(rate)) / rate
+    return np.where(np.abs(rate) > 1e-10, factor, months)
+
+
+def annuity_rate(present_value, payment, months, guess=0.0) -> np.ndarray:
+    """
+    Tasa mensual i con payment · annuity_factor(i, months) = present_value,
+    es decir, la TIR de recibir `present_value` y pagar `payment` cada mes.
+
+    La función es decreciente y convexa en i, así que Newton desde un
+    punto a la izquierda de la raíz (p. ej. la tasa nominal cuando el
+    valor presente es el monto menos comisiones) converge sin saltarla.
+    Sin raíz (el pago total no cubre el valor presente) devuelve NaN.
+    """
+    present_value, payment, months, rate = (
+        np.array(value, dtype=np.float64) for value in np.broadcast_arrays(present_value, payment, months, guess)
+    )
+    result = np.full(present_value.shape, np.nan)
+    solvable = (present_value > 0) & (payment * months >= present_value)
+    index = np.flatnonzero(solvable)
+    pv, pay, n, i = present_value.ravel()[index], payment.ravel()[index], months.ravel()[index], rate.ravel()[index]
+    # El punto de partida debe quedar a la izquierda de la raíz
+    i = np.where(pay * annuity_factor(i, n) >= pv, i, 0.0)
+
+    for _ in range(RATE_MAX_ITERATIONS):
+        if len(index) == 0:
+            break
+        value = pay * annuity_factor(i, n) - pv
+        with np.errstate(divide="ignore", invalid="ignore"):
+            discount = np.exp(-(n + 1) * np.log1p(i))
+            slope = np.where(np.abs(i) > 1e-10, pay * (n * discount - annuity_factor(i, n)) / i, -pay * n * (n + 1) / 2)
+        step = i - value / slope
+        converged = ~np.isfinite(step) | (np.abs(step - i) <= RATE_TOLERANCE * (1 + np.abs(i)))
+        result.ravel()[index[converged]] = np.where(np.isfinite(step[converged]), step[converged], i[converged])
+        pending = ~converged
+        index, pv, pay, n, i = index[pending], pv[pending], pay[pending], n[pending], step[pending]
+
+    result.ravel()[index] = i
+    return result
+
+
+def apr(amount, annual_rate, term_months, fees) -> np.ndarray:
+    """
+    Tasa anual del costo real (APR): TIR mensual de recibir el monto neto
+    de comisiones y pagar la cuota estándar durante el plazo, por 12.
+    """
+    amount = np.atleast_1d(np.asarray(amount, dtype=np.float64))
+    payment = monthly_payment(amount, annual_rate, term_months)
+    net = amount - np.asarray(fees, dtype=np.float64)
+    return annuity_rate(net, payment, term_months, np.asarray(annual_rate, dtype=np.float64) / 12) * 12
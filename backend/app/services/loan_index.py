@@ -0,0 +1,161 @@
+"""
+Índice de catálogo de productos de crédito.
+
+El catálogo se carga una vez en arreglos de NumPy (uno por atributo) y se
+precalcula lo que no depende del solicitante: el pago por unidad de
+monto de cada producto y su APR cuando la comisión es solo porcentual.
+Una consulta (monto, ingreso y otras deudas) calcula pago, costo total y
+DTI de todos los productos en una pasada vectorizada, aplica los filtros
+y elige el top-k: `np.partition` da el k-ésimo valor de la métrica, se
+conservan todos los candidatos que no lo superan (incluidos los empatados
+en el límite) y `lexsort` los ordena por métrica y luego por fila antes
+de cortar en k. La APR de productos con comisión fija depende del monto
+y solo se despeja para los candidatos que la necesitan (filtro o métrica
+de orden) o para los resultados finales.
+"""
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Tuple
+import numpy as np
+
+from app.services import loan_engine
+
+# Métricas por las que se puede ordenar una consulta
+METRICS = ("monthly_payment", "total_cost", "total_interest", "apr", "dti", "origination_fees_total")
+
+
+@dataclass
+class SearchFilters:
+    max_dti: Optional[float] = None
+    max_monthly_payment: Optional[float] = None
+    max_apr: Optional[float] = None
+    min_term_months: Optional[int] = None
+    max_term_months: Optional[int] = None
+
+
+class LoanIndex:
+    def __init__(self, columns: Mapping[str, object]):
+        self.ids = np.asarray(columns["id"], dtype=str)
+        count = len(self.ids)
+        if count == 0:
+            raise ValueError("El catálogo está vacío")
+        if len(np.unique(self.ids)) != count:
+            raise ValueError("Los identificadores del catálogo deben ser únicos")
+        self.names = np.asarray(columns.get("name", self.ids), dtype=str)
+
+        def numeric(field: str, default: float) -> np.ndarray:
+            column = columns.get(field)
+            values = np.full(count, default, dtype=np.float64) if column is None else np.asarray(column, dtype=np.float64)
+            if values.shape != (count,):
+                raise ValueError(f"La columna {field} debe tener {count} valores")
+            if np.isnan(values).any():
+                raise ValueError(f"La columna {field} tiene valores vacíos")
+            return values
+
+        for field in ("annual_rate", "term_months"):
+            if columns.get(field) is None:
+                raise ValueError(f"El catálogo debe tener la columna {field}")
+        self.annual_rate = numeric("annual_rate", 0.0)
+        self.term_months = numeric("term_months", 0).astype(np.int64)
+        self.fee_pct = numeric("origination_fee_pct", 0.0)
+        self.fee_flat = numeric("origination_fee_flat", 0.0)
+        self.min_amount = numeric("min_amount", 0.0)
+        self.max_amount = numeric("max_amount", np.inf)
+        if self.names.shape != (count,):
+            raise ValueError(f"La columna name debe tener {count} valores")
+        if ((self.annual_rate < 0) | (self.annual_rate > 1)).any():
+            raise ValueError("La tasa anual debe estar entre 0 y 1")
+        if ((self.term_months < 1) | (self.term_months > 600)).any():
+            raise ValueError("El plazo debe estar entre 1 y 600 meses")
+        if ((self.fee_pct < 0) | (self.fee_pct >= 1)).any() or (self.fee_flat < 0).any():
+            raise ValueError("Las comisiones deben ser no negativas y la porcentual menor a 1")
+
+        # Pago por unidad de monto y APR con comisión solo porcentual
+        self.payment_factor = loan_engine.monthly_payment(1.0, self.annual_rate, self.term_months)
+        self.percent_fee_apr = loan_engine.apr(1.0, self.annual_rate, self.term_months, self.fee_pct)
+        self._flat = self.fee_flat > 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def evaluate(self, amount: float, monthly_income: float, other_monthly_debt: float) -> Dict[str, np.ndarray]:
+        """Métricas (sin APR) de todos los productos para un solicitante"""
+        payment = amount * self.payment_factor
+        fees = amount * self.fee_pct + self.fee_flat
+        total_paid = payment * self.term_months
+        return {
+            "monthly_payment": payment,
+            "total_interest": total_paid - amount,
+            "total_cost": total_paid + fees,
+            "origination_fees_total": fees,
+            "dti": (payment + other_monthly_debt) / monthly_income,
+        }
+
+    def apr(self, amount: float, rows: np.ndarray) -> np.ndarray:
+        """APR (fracción anual) de los productos `rows`; solo se despeja la de los que tienen comisión fija"""
+        result = self.percent_fee_apr[rows].copy()
+        flat = self._flat[rows]
+        if flat.any():
+            solve = rows[flat]
+            fees = amount * self.fee_pct[solve] + self.fee_flat[solve]
+            result[flat] = loan_engine.apr(amount, self.annual_rate[solve], self.term_months[solve], fees)
+        return result
+
+    def search(
+        self,
+        amount: float,
+        monthly_income: float,
+        other_monthly_debt: float = 0.0,
+        metric: str = "total_cost",
+        k: int = 10,
+        filters: Optional[SearchFilters] = None,
+        descending: bool = False,
+    ) -> Tuple[Dict[str, np.ndarray], int]:
+        """
+        Top-k productos elegibles para el monto, ordenados por `metric`.
+        Devuelve las métricas de los resultados (con su posición en el
+        catálogo) y el número de productos que pasaron los filtros.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Métrica no válida: {metric}")
+        if amount <= 0 or monthly_income <= 0:
+            raise ValueError("El monto y el ingreso mensual deben ser mayores a cero")
+        filters = filters or SearchFilters()
+
+        values = self.evaluate(amount, monthly_income, other_monthly_debt)
+        mask = (self.min_amount <= amount) & (amount <= self.max_amount)
+        # Las comisiones no pueden consumir todo el monto
+        mask &= values["origination_fees_total"] < amount
+        if filters.max_dti is not None:
+            mask &= values["dti"] <= filters.max_dti
+        if filters.max_monthly_payment is not None:
+            mask &= values["monthly_payment"] <= filters.max_monthly_payment
+        if filters.min_term_months is not None:
+            mask &= self.term_months >= filters.min_term_months
+        if filters.max_term_months is not None:
+            mask &= self.term_months <= filters.max_term_months
+
+        rows = np.flatnonzero(mask)
+        candidates = {name: column[rows] for name, column in values.items()}
+        if metric == "apr" or filters.max_apr is not None:
+            candidates["apr"] = self.apr(amount, rows)
+            if filters.max_apr is not None:
+                keep = candidates["apr"] <= filters.max_apr
+                rows = rows[keep]
+                candidates = {name: column[keep] for name, column in candidates.items()}
+
+        # Top-k sin ordenar todo el catálogo. Se toman todos los candidatos
+        # empatados con el k-ésimo valor para que el desempate por posición
+        # sea estable y no dependa de lo que elija la partición
+        key = -candidates[metric] if descending else candidates[metric]
+        top = np.arange(len(rows))
+        if len(rows) > k:
+            kth = np.partition(key, k - 1)[k - 1]
+            if not np.isnan(kth):
+                top = np.flatnonzero(key <= kth)
+        top = top[np.lexsort((rows[top], key[top]))][:k]
+
+        result = {name: column[top] for name, column in candidates.items()}
+        result["position"] = rows[top]
+        if "apr" not in result:
+            result["apr"] = self.apr(amount, result["position"])
+        return result, len(rows)
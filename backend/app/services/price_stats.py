@@ -0,0 +1,280 @@
+"""
+Estadísticas de precios de competidores en una sola pasada.
+
+`RunningStats` lleva conteo, mínimo, máximo, media y varianza con el
+algoritmo de Welford (combinando bloques con la fórmula de Chan), y
+`QuantileSketch` aproxima cuantiles con cubetas logarítmicas de error
+relativo acotado (estilo DDSketch). Ambos se alimentan por bloques, no
+guardan las observaciones y se pueden combinar entre sí, de modo que los
+resúmenes de varios archivos, workers o días se suman sin recalcular.
+"""
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional
+import math
+import numpy as np
+
+# Error relativo máximo de los cuantiles aproximados
+DEFAULT_RELATIVE_ACCURACY = 0.005
+
+# Hasta este número de observaciones los cuantiles son exactos
+DEFAULT_EXACT_LIMIT = 1024
+
+# Precios por bloque al leer un cuerpo en streaming
+DEFAULT_CHUNK_VALUES = 65_536
+
+
+class RunningStats:
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, minimum: float = math.inf, maximum: float = -math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def update(self, values: np.ndarray) -> None:
+        """Agrega un bloque de observaciones"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        mean = float(values.mean())
+        self._combine(len(values), mean, float(((values - mean) ** 2).sum()), float(values.min()), float(values.max()))
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.minimum, other.maximum)
+
+    @property
+    def variance(self) -> float:
+        """Varianza poblacional"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.minimum, "max": self.maximum}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> "RunningStats":
+        return cls(int(data["count"]), float(data["mean"]), float(data["m2"]), float(data["min"]), float(data["max"]))
+
+    def _combine(self, count: int, mean: float, m2: float, minimum: float, maximum: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+
+class QuantileSketch:
+    """
+    Cuantiles aproximados de valores positivos. Cada valor cae en la
+    cubeta ceil(log_gamma(x)); el representante de la cubeta difiere del
+    valor real en a lo más `relative_accuracy`. El número de cubetas solo
+    depende del rango de valores, no del número de observaciones.
+
+    Mientras haya a lo más `exact_limit` observaciones también se guardan
+    los valores y los cuantiles son exactos (interpolación lineal, igual
+    que la mediana del cliente).
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        bins: Optional[Dict[int, int]] = None,
+        values: Optional[Iterable[float]] = None,
+        exact_limit: int = DEFAULT_EXACT_LIMIT,
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("La precisión relativa debe estar entre 0 y 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.exact_limit = exact_limit
+        self.bins: Dict[int, int] = dict(bins or {})
+        self._values: Optional[List[np.ndarray]] = None
+        if values is not None:
+            self._values = [np.asarray(list(values), dtype=np.float64)]
+        elif not self.bins:
+            self._values = []
+
+    @property
+    def count(self) -> int:
+        return sum(self.bins.values())
+
+    @property
+    def exact(self) -> bool:
+        return self._values is not None
+
+    def update(self, values: np.ndarray) -> None:
+        """Agrega un bloque de valores positivos"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        if (values <= 0).any():
+            raise ValueError("El sketch solo acepta valores positivos")
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+        if self._values is not None:
+            self._values.append(values.copy())
+            self._trim()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Solo se pueden combinar sketches con la misma precisión")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        if self._values is not None and other._values is not None:
+            self._values.extend(other._values)
+            self._trim()
+        else:
+            self._values = None
+
+    def quantiles(self, qs: Iterable[float]) -> np.ndarray:
+        """Cuantiles de los valores (q = 0.5 es la mediana)"""
+        qs = np.clip(np.asarray(list(qs), dtype=np.float64), 0, 1)
+        if not self.bins:
+            return np.full(len(qs), np.nan)
+        if self._values is not None:
+            return np.quantile(np.concatenate(self._values), qs)
+        keys = np.array(sorted(self.bins), dtype=np.int64)
+        cumulative = np.cumsum([self.bins[key] for key in keys.tolist()])
+        ranks = qs * (cumulative[-1] - 1)
+        positions = np.searchsorted(cumulative, ranks, side="right")
+        # Representante de la cubeta (gamma^(k-1), gamma^k]: error relativo acotado
+        return 2 * self.gamma ** keys[positions] / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def to_dict(self) -> Dict[str, object]:
+        data = {"relative_accuracy": self.relative_accuracy, "bins": {str(key): count for key, count in self.bins.items()}}
+        if self._values is not None:
+            data["values"] = np.concatenate(self._values).tolist() if self._values else []
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "QuantileSketch":
+        bins = {int(key): int(count) for key, count in dict(data.get("bins") or {}).items()}
+        values = data.get("values")
+        if values is not None and len(values) != sum(bins.values()):
+            raise ValueError("Los valores exactos no coinciden con el conteo del sketch")
+        return cls(float(data.get("relative_accuracy") or DEFAULT_RELATIVE_ACCURACY), bins, values)
+
+    def _trim(self) -> None:
+        # Rebasado el límite, el sketch deja de guardar valores
+        if self.count > self.exact_limit:
+            self._values = None
+
+
+class PriceSummary:
+    """
+    Resumen combinable de precios de competidores. Solo cuentan los
+    precios finitos mayores a cero; el resto se reporta como descartado.
+    """
+
+    def __init__(self, stats: Optional[RunningStats] = None, sketch: Optional[QuantileSketch] = None, skipped: int = 0):
+        self.stats = stats or RunningStats()
+        self.sketch = sketch or QuantileSketch()
+        self.skipped = skipped
+
+    @property
+    def observed(self) -> int:
+        return self.stats.count + self.skipped
+
+    def update(self, prices: np.ndarray) -> None:
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = np.isfinite(prices) & (prices > 0)
+        self.skipped += int(len(prices) - np.count_nonzero(valid))
+        prices = prices[valid]
+        self.stats.update(prices)
+        self.sketch.update(prices)
+
+    def merge(self, other: "PriceSummary") -> None:
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+        self.skipped += other.skipped
+
+    def to_dict(self) -> Dict[str, object]:
+        return {**self.stats.to_dict(), "skipped": self.skipped, "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "PriceSummary":
+        stats = RunningStats.from_dict(data)
+        sketch = QuantileSketch.from_dict(data.get("sketch") or {})
+        if sketch.count != stats.count:
+            raise ValueError("El conteo del sketch no coincide con el de las estadísticas")
+        return cls(stats, sketch, int(data.get("skipped") or 0))
+
+
+async def iter_price_chunks(
+    stream: AsyncIterable[bytes],
+    column: Optional[str] = None,
+    chunk_values: int = DEFAULT_CHUNK_VALUES,
+) -> AsyncIterator[np.ndarray]:
+    """
+    Lee precios de un cuerpo en streaming y los produce por bloques.
+
+    Sin `column` el cuerpo es una lista de números separados por saltos de
+    línea, comas, punto y coma o espacios. Con `column` es un CSV cuyo
+    primer renglón es el encabezado y se toma esa columna. Los valores no
+    numéricos quedan como NaN (se descartan al resumir).
+    """
+    position = None
+    pending = b""
+    values: List[str] = []
+
+    def read_line(raw: bytes) -> None:
+        nonlocal position
+        line = raw.decode("utf-8-sig").strip()
+        if column is None:
+            values.extend(line.replace(",", " ").replace(";", " ").split())
+        elif position is None:
+            if line:
+                position = _column_position(line, column)
+        elif line:
+            cells = line.split(",")
+            values.append(cells[position] if position < len(cells) else "")
+
+    async for data in stream:
+        if column is None:
+            # Todo separador cuenta como espacio: se corta en el último y se divide el bloque entero
+            data = pending + data.replace(b",", b" ").replace(b";", b" ")
+            cut = max(data.rfind(b" "), data.rfind(b"\n"), data.rfind(b"\t"), data.rfind(b"\r"))
+            pending = data[cut + 1:]
+            values.extend(data[:cut + 1].decode("utf-8-sig").split())
+        else:
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for raw in lines:
+                read_line(raw)
+        if len(values) >= chunk_values:
+            yield _parse_prices(values)
+            values.clear()
+    read_line(pending)
+    if values:
+        yield _parse_prices(values)
+
+
+def _column_position(header: str, column: str) -> int:
+    columns = [name.strip().strip('"').lower() for name in header.split(",")]
+    if column.lower() not in columns:
+        raise ValueError(f"El CSV no tiene la columna {column}")
+    return columns.index(column.lower())
+
+
+def _parse_prices(values: List[str]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass
+    prices = np.empty(len(values))
+    for i, value in enumerate(values):
+        try:
+            prices[i] = float(value.strip().strip('"').replace("$", ""))
+        except ValueError:
+            prices[i] = np.nan
+    return prices
@@ -0,0 +1,137 @@
+"""
+Motor numérico de ROI.
+
+Los flujos de efectivo se manejan como matrices (inversiones × meses, con
+el mes 0 en la primera columna) para que VPN, TIR y recuperación de muchas
+inversiones se resuelvan con operaciones vectorizadas. Los horizontes más
+cortos se rellenan con ceros, que no alteran ninguna de las métricas.
+"""
+from typing import Optional
+import numpy as np
+
+# Límites de la búsqueda de la TIR por periodo
+IRR_LOWER = -0.9999
+IRR_UPPER = 1e6
+
+# Tolerancia de la TIR sobre la tasa y sobre el VPN relativo a la inversión
+IRR_TOLERANCE = 1e-12
+IRR_MAX_ITERATIONS = 100
+
+
+def cash_flows(investment, monthly_returns, residual_value, months, horizon: Optional[int] = None) -> np.ndarray:
+    """
+    Construye la matriz de flujos: -inversión en el mes 0, el retorno
+    mensual en los meses 1..n y el valor residual sumado al mes n.
+    Acepta escalares o vectores; `horizon` fija el número de columnas.
+    """
+    investment = np.atleast_1d(np.asarray(investment, dtype=np.float64))
+    monthly_returns = np.atleast_1d(np.asarray(monthly_returns, dtype=np.float64))
+    residual_value = np.atleast_1d(np.asarray(residual_value, dtype=np.float64))
+    months = np.atleast_1d(np.asarray(months, dtype=np.int64))
+    investment, monthly_returns, residual_value, months = np.broadcast_arrays(
+        investment, monthly_returns, residual_value, months
+    )
+    horizon = int(months.max()) if horizon is None else horizon
+
+    period = np.arange(horizon + 1)
+    flows = np.where(
+        (period >= 1) & (period <= months[:, None]),
+        monthly_returns[:, None],
+        0.0,
+    )
+    flows[:, 0] = -investment
+    flows[np.arange(len(months)), months] += residual_value
+    return flows
+
+
+def discount_factors(monthly_rate, horizon: int) -> np.ndarray:
+    """(1 + r)^-t para t = 0..horizon, una fila por tasa"""
+    monthly_rate = np.atleast_1d(np.asarray(monthly_rate, dtype=np.float64))
+    return (1.0 + monthly_rate[:, None]) ** -np.arange(horizon + 1)
+
+
+def npv(flows: np.ndarray, monthly_rate) -> np.ndarray:
+    """VPN de cada fila de flujos a su tasa mensual"""
+    flows = np.atleast_2d(flows)
+    return (flows * discount_factors(monthly_rate, flows.shape[1] - 1)).sum(axis=1)
+
+
+def payback_month(flows: np.ndarray) -> np.ndarray:
+    """
+    Primer mes en que el flujo acumulado deja de ser negativo, o -1 si no
+    se recupera la inversión dentro del horizonte.
+    """
+    flows = np.atleast_2d(flows)
+    recovered = np.cumsum(flows, axis=1)[:, 1:] >= 0
+    first = np.argmax(recovered, axis=1) + 1
+    return np.where(recovered.any(axis=1), first, -1)
+
+
+def irr(flows: np.ndarray) -> np.ndarray:
+    """
+    TIR por periodo de cada fila de flujos, o NaN si no existe.
+
+    Se evalúa el VPN en IRR_LOWER e IRR_UPPER y, si cambia de signo, la
+    raíz se refina con Newton protegido: cada paso de Newton que sale del
+    intervalo se reemplaza por bisección, de modo que el intervalo siempre
+    se reduce. Las filas sin cambio de signo en el intervalo (p. ej. flujos
+    sin recuperación o una TIR fuera de los límites) y las que no alcanzan
+    la tolerancia en IRR_MAX_ITERATIONS devuelven NaN.
+
+    Para tasas negativas se evalúa VPN × (1 + r)^T, con T el último mes
+    con flujo de cada fila, que tiene el mismo signo y las mismas raíces
+    pero no se desborda cerca de r = -1.
+    """
+    flows = np.atleast_2d(np.asarray(flows, dtype=np.float64))
+    rows, periods = flows.shape
+    t = np.arange(periods)
+    last = periods - 1 - np.argmax(flows[:, ::-1] != 0, axis=1)
+    scale = np.maximum(np.abs(flows).sum(axis=1), 1.0)
+
+    # Exponentes de (1 + r) para tasas positivas y negativas
+    positive = -t.astype(np.float64)
+    negative = np.maximum(last[:, None] - t, 0).astype(np.float64)
+
+    def value_and_slope(rate, flows, negative):
+        exponent = np.where(rate[:, None] < 0, negative, positive)
+        terms = flows * np.exp(exponent * np.log1p(rate)[:, None])
+        return terms.sum(axis=1), (terms * exponent).sum(axis=1) / (1.0 + rate)
+
+    # Signo del VPN en los extremos del intervalo de búsqueda
+    lower = np.full(rows, IRR_LOWER)
+    upper = np.full(rows, IRR_UPPER)
+    f_lower, _ = value_and_slope(lower, flows, negative)
+    f_upper, _ = value_and_slope(upper, flows, negative)
+    result = np.full(rows, np.nan)
+    result[f_lower == 0] = IRR_LOWER
+    result[(f_upper == 0) & (f_lower != 0)] = IRR_UPPER
+    bracketed = np.sign(f_lower) * np.sign(f_upper) < 0
+
+    # Solo se iteran las filas que aún no convergen
+    index = np.flatnonzero(bracketed)
+    lower, upper, f_lower = lower[index], upper[index], f_lower[index]
+    flows, negative, scale = flows[index], negative[index], scale[index]
+    rate = np.clip(np.full(len(index), 0.01), lower, upper)
+
+    for _ in range(IRR_MAX_ITERATIONS):
+        if len(index) == 0:
+            break
+        value, slope = value_and_slope(rate, flows, negative)
+        same_side = np.sign(value) == np.sign(f_lower)
+        lower = np.where(same_side, rate, lower)
+        f_lower = np.where(same_side, value, f_lower)
+        upper = np.where(same_side, upper, rate)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = rate - value / slope
+        inside = np.isfinite(newton) & (newton > lower) & (newton < upper)
+        step = np.where(inside, newton, (lower + upper) / 2)
+
+        converged = (np.abs(value) <= IRR_TOLERANCE * scale) | (np.abs(step - rate) <= IRR_TOLERANCE * (1 + np.abs(rate)))
+        result[index[converged]] = rate[converged]
+        pending = ~converged
+        index, rate, lower, upper, f_lower = index[pending], step[pending], lower[pending], upper[pending], f_lower[pending]
+        flows, negative, scale = flows[pending], negative[pending], scale[pending]
+
+    # Las filas que agotaron las iteraciones quedan en NaN
+    return result
@@ -0,0 +1,88 @@
+"""
+Respuestas precalculadas para catálogos estáticos.
+
+El cuerpo JSON se serializa y comprime una sola vez al importar el módulo.
+Cada variante lleva un ETag fuerte; las solicitudes con `If-None-Match`
+vigente reciben 304 sin cuerpo.
+"""
+from typing import Any, Dict, List, Tuple
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él solo se sirve gzip
+    brotli = None
+
+# Los catálogos cambian solo con un nuevo despliegue
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+class PrecomputedResponse:
+    def __init__(self, payload: Any, cache_control: str = DEFAULT_CACHE_CONTROL):
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = cache_control
+
+        # (codificación, cuerpo, etag) en orden de preferencia
+        self.variants: List[Tuple[str, bytes, str]] = []
+        if brotli is not None:
+            self.variants.append(("br", brotli.compress(body), f'"{digest}-br"'))
+        self.variants.append(("gzip", gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"'))
+        self.variants.append(("identity", body, f'"{digest}"'))
+        self.etags = {etag for _, _, etag in self.variants}
+
+    @property
+    def etag(self) -> str:
+        return self.variants[-1][2]
+
+    def _select(self, accept_encoding: str) -> Tuple[str, bytes, str]:
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, body, etag in self.variants[:-1]:
+            if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding, body, etag
+        return self.variants[-1]
+
+    def _not_modified(self, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match usa comparación débil: se ignora el prefijo W/
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not tags.isdisjoint(self.etags)
+
+    def respond(self, request: Request) -> Response:
+        encoding, body, etag = self._select(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        if self._not_modified(request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,135 @@
+"""
+Tablas de ISR compiladas.
+
+Cada tabla se valida y se convierte una sola vez en arreglos ordenados de
+límites inferiores, tasas y cuotas fijas, de modo que la búsqueda del
+tramo es O(log n) con `bisect` (o `np.searchsorted` para vectores).
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence
+import numpy as np
+
+# Tolerancia entre el límite superior de un tramo y el inferior del siguiente
+BRACKET_GAP = 0.01
+
+# Diferencia máxima aceptada entre la cuota fija y el impuesto acumulado
+FIXED_TOLERANCE = 1.0
+
+
+@dataclass(frozen=True)
+class IsrTable:
+    lower: List[float]
+    rates: List[float]
+    fixed: List[float]
+    lower_array: np.ndarray
+    rates_array: np.ndarray
+    fixed_array: np.ndarray
+
+    def bracket_index(self, taxable_income: float) -> int:
+        return max(bisect_right(self.lower, taxable_income) - 1, 0)
+
+    def tax(self, taxable_income: float) -> float:
+        if taxable_income <= 0:
+            return 0.0
+        i = self.bracket_index(taxable_income)
+        return (taxable_income - self.lower[i]) * self.rates[i] + self.fixed[i]
+
+    def marginal_rate(self, taxable_income: float) -> float:
+        """Tasa aplicada al siguiente peso de ingreso gravable"""
+        if taxable_income <= 0:
+            return 0.0
+        return self.rates[self.bracket_index(taxable_income)]
+
+    def next_threshold(self, taxable_income: float) -> Optional[float]:
+        """Límite inferior del tramo siguiente, o None en el último tramo"""
+        i = self.bracket_index(taxable_income) + 1
+        return self.lower[i] if i < len(self.lower) else None
+
+    def savings(self, taxable_income: float, deduction: float) -> float:
+        """
+        Reducción exacta de ISR por deducir `deduction` adicional. Como la
+        tarifa es lineal por tramos, basta evaluarla en ambos extremos.
+        """
+        if deduction <= 0 or taxable_income <= 0:
+            return 0.0
+        return self.tax(taxable_income) - self.tax(max(taxable_income - deduction, 0.0))
+
+    def bracket_indices(self, taxable_income: np.ndarray) -> np.ndarray:
+        indices = np.searchsorted(self.lower_array, taxable_income, side="right") - 1
+        return np.maximum(indices, 0)
+
+    def tax_many(self, taxable_income: np.ndarray) -> np.ndarray:
+        taxable_income = np.asarray(taxable_income, dtype=np.float64)
+        i = self.bracket_indices(taxable_income)
+        tax = (taxable_income - self.lower_array[i]) * self.rates_array[i] + self.fixed_array[i]
+        return np.where(taxable_income > 0, np.maximum(tax, 0.0), 0.0)
+
+
+def compile_table(brackets: Sequence[Mapping[str, float]], name: str = "tabla") -> IsrTable:
+    """
+    Valida y compila una tabla de tramos {"min", "max", "rate", "fixed"}.
+
+    Rechaza tablas vacías, tramos con min > max, tasas fuera de [0, 1),
+    tramos desordenados, traslapados o con huecos, y cuotas fijas que no
+    corresponden al impuesto acumulado de los tramos anteriores. El último
+    tramo se trata como abierto.
+    """
+    if not brackets:
+        raise ValueError(f"La {name} no tiene tramos")
+
+    lower, rates, fixed = [], [], []
+    previous = None
+    for position, bracket in enumerate(brackets):
+        try:
+            low = float(bracket["min"])
+            high = bracket.get("max")
+            high = float(high) if high is not None else float("inf")
+            rate = float(bracket["rate"])
+            amount = float(bracket["fixed"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Tramo {position} de la {name} mal formado: {e}")
+
+        if low < 0 or high < low:
+            raise ValueError(f"Tramo {position} de la {name}: límites inválidos ({low}, {high})")
+        if not 0 <= rate < 1:
+            raise ValueError(f"Tramo {position} de la {name}: tasa inválida ({rate})")
+
+        if previous is not None:
+            prev_low, prev_high, prev_rate, prev_fixed = previous
+            if low <= prev_high:
+                raise ValueError(f"Tramo {position} de la {name} se traslapa con el anterior")
+            if low - prev_high > BRACKET_GAP + 1e-9:
+                raise ValueError(f"Hay un hueco entre los tramos {position - 1} y {position} de la {name}")
+            expected = prev_fixed + (prev_high - prev_low) * prev_rate
+            if abs(amount - expected) > FIXED_TOLERANCE:
+                raise ValueError(f"Tramo {position} de la {name}: cuota fija {amount} no coincide con el acumulado {expected:.2f}")
+        elif amount != 0:
+            raise ValueError(f"El primer tramo de la {name} debe tener cuota fija 0")
+
+        lower.append(low)
+        rates.append(rate)
+        fixed.append(amount)
+        previous = (low, high, rate, amount)
+
+    # El primer tramo cubre cualquier ingreso positivo por debajo de su mínimo
+    lower[0] = 0.0
+    return IsrTable(
+        lower=lower,
+        rates=rates,
+        fixed=fixed,
+        lower_array=np.array(lower),
+        rates_array=np.array(rates),
+        fixed_array=np.array(fixed),
+    )
+
+
+def compile_tables(tables_by_year: Mapping[int, Mapping[str, Sequence[Mapping[str, float]]]]) -> Dict[int, Dict[str, IsrTable]]:
+    """Compila todas las tablas, indexadas por ejercicio fiscal y tipo de contribuyente"""
+    return {
+        year: {
+            taxpayer_type: compile_table(brackets, f"tabla {taxpayer_type} {year}")
+            for taxpayer_type, brackets in tables.items()
+        }
+        for year, tables in tables_by_year.items()
+    }
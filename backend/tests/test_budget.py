@@ -0,0 +1,193 @@
+import pytest
+import random
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import budget
+from app.routers.budget import BudgetCalculator, BudgetInput
+from app.services import budget_engine
+
+ITEMS = [
+    {"id": "1", "name": "Sueldo", "amount": 30000, "category": "Salario Principal", "type": "income"},
+    {"id": "2", "name": "Proyectos", "amount": 5000.5, "category": "Freelance/Consultoría", "type": "income"},
+    {"id": "3", "name": "Renta", "amount": 11000, "category": "Vivienda (Alquiler/Hipoteca)", "type": "expense"},
+    {"id": "4", "name": "Súper", "amount": 6000.25, "category": "Alimentación", "type": "expense"},
+    {"id": "5", "name": "Cine", "amount": 1500, "category": "Entretenimiento", "type": "expense"},
+    {"id": "6", "name": "Curso", "amount": 2000, "category": "Educación", "type": "expense", "is_essential": True},
+]
+
+def _reference(items):
+    """Totales calculados de cero como en calculateBudget del cliente"""
+    income = [item for item in items if item["type"] == "income"]
+    expenses = [item for item in items if item["type"] == "expense"]
+    by_category = {"income": {}, "expense": {}}
+    for item in items:
+        totals = by_category[item["type"]]
+        totals[item["category"]] = round(totals.get(item["category"], 0) + item["amount"], 2)
+    essential = sum(
+        item["amount"] for item in expenses
+        if item["category"] in budget_engine.ESSENTIAL_CATEGORIES or item.get("is_essential")
+    )
+    return {
+        "total_income": round(sum(item["amount"] for item in income), 2),
+        "total_expenses": round(sum(item["amount"] for item in expenses), 2),
+        "essential_expenses": round(essential, 2),
+        "income_by_category": by_category["income"],
+        "expenses_by_category": by_category["expense"],
+    }
+
+def test_calculate_matches_client_totals():
+    """Prueba que el resumen y la proyección coinciden con el cálculo del cliente"""
+    result = BudgetCalculator.calculate(BudgetInput(items=ITEMS))
+    reference = _reference(ITEMS)
+    summary = result.summary
+
+    assert summary.total_income == reference["total_income"]
+    assert summary.total_expenses == reference["total_expenses"]
+    assert summary.essential_expenses == reference["essential_expenses"]
+    assert summary.optional_expenses == pytest.approx(1500)
+    assert summary.income_by_category == reference["income_by_category"]
+    assert summary.expenses_by_category == reference["expenses_by_category"]
+    assert summary.savings_rate == pytest.approx(summary.balance / summary.total_income * 100)
+    assert result.analysis.status == "surplus"
+    assert result.analysis.emergency_fund_months == int(summary.balance // summary.essential_expenses)
+    assert [point.month for point in result.monthly_projection] == [f"Mes {i}" for i in range(1, 7)]
+    assert result.monthly_projection[-1].cumulative_balance == pytest.approx(summary.balance * 6)
+
+def test_dated_items_count_in_summary():
+    """Prueba que los movimientos fechados suman a categorías, totales y gasto esencial"""
+    items = [
+        {"id": "1", "name": "Sueldo", "amount": 1000, "category": "Salario Principal", "type": "income"},
+        {"id": "2", "name": "Súper", "amount": 500, "category": "Alimentación", "type": "expense", "month": "2026-03"},
+    ]
+    result = BudgetCalculator.calculate(BudgetInput(items=items))
+    summary = result.summary
+    reference = _reference(items)
+
+    assert summary.total_expenses == reference["total_expenses"] == 500
+    assert summary.expenses_by_category == reference["expenses_by_category"]
+    assert summary.essential_expenses == 500
+    assert summary.savings_rate == pytest.approx(50)
+    assert summary.recurring_balance == 1000
+    # En la proyección el gasto fechado solo pesa en su mes
+    assert [point.balance for point in result.monthly_projection] == [500] + [1000] * 5
+
+def test_incremental_totals_match_full_recompute():
+    """Prueba que tras muchas ediciones los totales incrementales son los de un cálculo de cero"""
+    rng = random.Random(7)
+    categories = list(budget.BUDGET_CATEGORIES["expense"]) + list(budget.BUDGET_CATEGORIES["income"])
+    book = budget_engine.BudgetBook()
+    items = {}
+    for step in range(2000):
+        action = rng.random()
+        if action < 0.5 or not items:
+            category = rng.choice(categories)
+            item = {
+                "id": str(step),
+                "name": f"Partida {step}",
+                "amount": round(rng.uniform(0, 5000), 2),
+                "category": category,
+                "type": "income" if category in budget.BUDGET_CATEGORIES["income"] else "expense",
+                "is_essential": rng.random() < 0.2,
+                "month": rng.choice([None, "2025-11", "2026-02"]),
+            }
+            book.add(BudgetCalculator._entry(budget.BudgetItem(**item)))
+            items[item["id"]] = item
+        elif action < 0.8:
+            item_id = rng.choice(sorted(items))
+            changes = {"amount": round(rng.uniform(0, 5000), 2), "is_essential": rng.random() < 0.5}
+            book.update(item_id, changes)
+            items[item_id].update(changes)
+        else:
+            item_id = rng.choice(sorted(items))
+            book.remove(item_id)
+            del items[item_id]
+
+    reference = _reference(list(items.values()))
+    assert book.total_income / 100 == pytest.approx(reference["total_income"], abs=1e-6)
+    assert book.total_expenses / 100 == pytest.approx(reference["total_expenses"], abs=1e-6)
+    assert book.essential_expenses / 100 == pytest.approx(reference["essential_expenses"], abs=1e-6)
+    assert {k: v / 100 for k, v in book.income_by_category.items()} == pytest.approx(reference["income_by_category"])
+    assert {k: v / 100 for k, v in book.expenses_by_category.items()} == pytest.approx(reference["expenses_by_category"])
+
+def test_projection_recomputes_only_affected_months():
+    """Prueba que un movimiento fechado solo marca su mes y los siguientes como pendientes"""
+    book = budget_engine.BudgetBook(horizon_months=12, start_month="2026-01")
+    book.apply_diff(add=[
+        budget_engine.BudgetEntry("sueldo", "Sueldo", 2000000, "Salario Principal", "income"),
+        budget_engine.BudgetEntry("renta", "Renta", 800000, "Vivienda (Alquiler/Hipoteca)", "expense"),
+    ])
+    labels, balances, cumulative = book.projection()
+    assert labels[0] == "2026-01" and labels[-1] == "2026-12"
+    assert book.pending_from() is None
+
+    book.apply_diff(add=[budget_engine.BudgetEntry("bono", "Bono", 500000, "Otros Ingresos", "income", month="2026-07")])
+    assert book.pending_from() == 6
+    # Fuera del horizonte no hay nada que recalcular
+    book.apply_diff(add=[budget_engine.BudgetEntry("viaje", "Viaje", 300000, "Entretenimiento", "expense", month="2027-03")])
+    assert book.pending_from() == 6
+
+    labels, balances, cumulative = book.projection()
+    assert balances.tolist() == [1200000] * 6 + [1700000] + [1200000] * 5
+    assert cumulative[-1] == 1200000 * 12 + 500000
+    # Los movimientos fechados cuentan en los totales pero no en el saldo recurrente
+    assert book.total_income == 2500000
+    assert book.total_expenses == 1100000
+    assert book.recurring_balance == 1200000
+
+    book.apply_diff(update=[("renta", {"amount": 9000})])
+    assert book.pending_from() == 0
+    assert book.projection()[1][0] == 1100000
+
+def test_diff_endpoint_flow():
+    """Prueba el API de cambios: respuesta parcial, versiones y conflictos"""
+    app = FastAPI()
+    app.include_router(budget.router)
+    client = TestClient(app)
+
+    created = client.post("/budget/books", json={"items": ITEMS, "start_month": "2026-01"})
+    assert created.status_code == 200
+    budget_id = created.json()["budget_id"]
+    assert created.json()["version"] == 1
+
+    diff = {
+        "base_version": 1,
+        "add": [{"id": "7", "name": "Gimnasio", "amount": 800, "category": "Salud/Seguros", "type": "expense"}],
+        "update": [{"id": "3", "amount": 12000}],
+        "remove": ["5"],
+    }
+    response = client.patch(f"/budget/books/{budget_id}", json=diff)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 2
+    assert data["expenses_by_category"] == {
+        "Salud/Seguros": 800,
+        "Vivienda (Alquiler/Hipoteca)": 12000,
+        "Entretenimiento": None,
+    }
+    assert data["income_by_category"] == {}
+    assert data["totals"]["optional_expenses"] == 0
+    assert len(data["monthly_projection"]) == 6
+
+    # Solo un movimiento fechado: se devuelven los meses desde ese
+    dated = {"base_version": 2, "add": [{"id": "8", "name": "Aguinaldo", "amount": 10000, "category": "Otros Ingresos", "type": "income", "month": "2026-05"}]}
+    data = client.patch(f"/budget/books/{budget_id}", json=dated).json()
+    assert [point["month"] for point in data["monthly_projection"]] == ["2026-05", "2026-06"]
+    assert data["expenses_by_category"] == {}
+    assert data["income_by_category"] == {"Otros Ingresos": 10000}
+    assert data["totals"]["total_income"] == 45000.5
+
+    stale = client.patch(f"/budget/books/{budget_id}", json={"base_version": 1, "remove": ["4"]})
+    assert stale.status_code == 409
+
+    # Un lote con un error no aplica ningún cambio
+    invalid = client.patch(f"/budget/books/{budget_id}", json={"remove": ["4", "no-existe"]})
+    assert invalid.status_code == 400
+    full = client.get(f"/budget/books/{budget_id}").json()
+    assert full["version"] == 3
+    assert full["result"]["summary"]["expenses_by_category"]["Alimentación"] == 6000.25
+
+    assert client.delete(f"/budget/books/{budget_id}").status_code == 200
+    assert client.get(f"/budget/books/{budget_id}").status_code == 404
+
+if __name__ == "__main__":
+    pytest.main([__file__])
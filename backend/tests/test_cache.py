@@ -0,0 +1,104 @@
+import pytest
+import os
+from app.routers.tax import TaxInput, TaxResult, TaxCalculator
+from app.services.cache import ResultCache, SqliteBackend, canonical_key
+
+def _tax_input(monthly_income=50000):
+    return TaxInput(
+        taxpayer_type="individual",
+        regime="simplified",
+        monthly_income=monthly_income,
+        annual_income=monthly_income * 12
+    )
+
+def test_canonical_key_ignores_key_order():
+    """Prueba que solicitudes equivalentes produzcan la misma llave"""
+    assert canonical_key("x", {"a": 1, "b": 2}) == canonical_key("x", {"b": 2, "a": 1})
+    assert canonical_key("x", _tax_input()) == canonical_key("x", _tax_input())
+    assert canonical_key("x", _tax_input()) != canonical_key("x", _tax_input(60000))
+    assert canonical_key("x", _tax_input()) != canonical_key("y", _tax_input())
+
+def test_hits_and_misses_are_counted():
+    """Prueba los contadores de aciertos y fallos"""
+    cache = ResultCache(max_entries=10)
+    calls = []
+
+    @cache.cached("tax", TaxResult)
+    def calculate(input_data):
+        calls.append(input_data)
+        return TaxCalculator.calculate.__wrapped__(TaxCalculator, input_data)
+
+    first = calculate(_tax_input())
+    second = calculate(_tax_input())
+
+    assert first is second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_lru_eviction_by_entries_and_bytes():
+    """Prueba que se desalojen las entradas menos usadas"""
+    result = TaxCalculator.calculate(_tax_input())
+    size = len(result.model_dump_json().encode("utf-8"))
+
+    cache = ResultCache(max_entries=2)
+    cache.set("a", result)
+    cache.set("b", result)
+    cache.get("a", TaxResult)
+    cache.set("c", result)
+
+    assert cache.get("b", TaxResult) is None
+    assert cache.get("a", TaxResult) is result
+    assert cache.stats()["evictions"] == 1
+
+    cache = ResultCache(max_entries=100, max_bytes=size * 2)
+    for key in "abc":
+        cache.set(key, result)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= size * 2
+
+def test_expired_entries_are_misses():
+    """Prueba que las entradas vencidas no se devuelvan"""
+    cache = ResultCache(ttl=-1)
+    cache.set("a", TaxCalculator.calculate(_tax_input()))
+
+    assert cache.get("a", TaxResult) is None
+    assert cache.stats()["entries"] == 0
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """Prueba que dos cachés compartan resultados a través de SQLite"""
+    path = str(tmp_path / "cache.sqlite")
+    result = TaxCalculator.calculate(_tax_input())
+
+    writer = ResultCache(backend=SqliteBackend(path))
+    reader = ResultCache(backend=SqliteBackend(path))
+    writer.set("a", result)
+
+    shared = reader.get("a", TaxResult)
+    assert shared == result
+    assert reader.stats()["shared_hits"] == 1
+
+def test_sqlite_backend_prunes_expired_rows_on_write(tmp_path):
+    """Prueba que las escrituras borren periódicamente las filas vencidas"""
+    backend = SqliteBackend(str(tmp_path / "cache.sqlite"), prune_every=10)
+    for index in range(9):
+        backend.set(f"old-{index}", b"{}", 0.0)
+    assert backend.count() == 9
+
+    backend.set("fresh", b"{}", float("inf"))
+    assert backend.count() == 1
+    assert backend.get("fresh") == b"{}"
+
+def test_sqlite_backend_reconnects_per_process(tmp_path, monkeypatch):
+    """Prueba que la conexión se abra en el primer uso y no se herede entre procesos"""
+    backend = SqliteBackend(str(tmp_path / "cache.sqlite"))
+    assert backend._connection is None
+
+    backend.set("a", b"1", float("inf"))
+    parent = backend._connection
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert backend.get("a") == b"1"
+    assert backend._connection is not parent
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,212 @@
+import pytest
+import io
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import cashflow
+from app.routers.cashflow import CashflowCalculator, CashflowInput, CashflowProjectionRequest, LedgerIngestOptions
+from app.services import ledger
+
+LEDGER_CSV = (
+    "fecha,concepto,monto\n"
+    "2024-01-03,Ventas,10000\n"
+    "2024-01-15,Nómina,5000\n"
+    "2024-02-01,ventas,\"12,000\"\n"
+    "2024-02-20,Nomina,5000\n"
+    "no es fecha,Ventas,99\n"
+    "2024-03-05,Misterio,7\n"
+    "2024-03-06,Renta,3000\n"
+    "2024-03-07,Ventas,11000\n"
+)
+
+def _cashflow_input(starting_cash=10000, revenue=20000, payroll=18000, tax_rate=0.3):
+    return CashflowInput(
+        starting_cash=starting_cash,
+        revenue=[{"name": "Ventas", "amount": revenue}],
+        cogs=[{"name": "Materia prima", "amount": 4000}],
+        payroll=[{"name": "Sueldos", "amount": payroll}],
+        tax_rate=tax_rate
+    )
+
+def test_monthly_cashflow_calculation():
+    """Prueba el flujo de caja de un mes"""
+    result = CashflowCalculator.calculate(_cashflow_input(payroll=10000))
+
+    assert result.totals.taxes_cash == 6000 * 0.3
+    assert result.totals.net_cash_flow == 20000 - 14000 - 1800
+    assert result.totals.runway_months is None
+    assert result.analysis.risk_level == "low"
+
+def test_negative_cashflow_runway():
+    """Prueba el runway y el nivel de riesgo con flujo negativo"""
+    result = CashflowCalculator.calculate(_cashflow_input())
+
+    assert result.totals.taxes_cash == 0
+    assert result.totals.burn_rate == 2000
+    assert result.totals.runway_months == 5
+    assert result.analysis.risk_level == "medium"
+    assert "Nómina" in result.analysis.recommendations[0]
+
+def test_projection_without_growth_matches_constant_runway():
+    """Prueba que sin crecimiento la proyección agote la caja en el mismo plazo"""
+    projection = CashflowCalculator.project(CashflowProjectionRequest(base=_cashflow_input(), periods=12))
+
+    assert projection.ending_cash[:3] == [8000, 6000, 4000]
+    assert projection.summary.cash_out_period == 6
+    assert projection.summary.runway_months == 5
+
+    weekly = CashflowCalculator.project(CashflowProjectionRequest(base=_cashflow_input(), periods=52, frequency="weekly"))
+    assert weekly.summary.runway_months == pytest.approx(5, abs=0.01)
+
+def test_projection_runway_follows_growth():
+    """Prueba que el runway se calcule sobre la serie proyectada con crecimiento"""
+    request = CashflowProjectionRequest(
+        base=_cashflow_input(starting_cash=5000), periods=36, growth_rates={"payroll": 0.05}
+    )
+    projection = CashflowCalculator.project(request)
+
+    # Recorrido mes a mes de referencia
+    cash, runway = 5000.0, None
+    for month in range(36):
+        payroll = 18000 * 1.05 ** month
+        profit = 20000 - 4000 - payroll
+        net = profit - max(profit, 0) * 0.3
+        if cash + net < 0 and runway is None:
+            runway = month + cash / -net
+        cash += net
+
+    assert projection.summary.runway_months == round(runway, 2)
+    assert projection.summary.ending_cash == round(cash, 2)
+    assert projection.summary.runway_months < 5000 / 2000
+
+def test_stream_matches_projection():
+    """Prueba que la proyección transmitida coincida con la proyección completa"""
+    request = CashflowProjectionRequest(
+        base=_cashflow_input(), periods=800, frequency="daily", growth_rates={"revenue": 0.02}
+    )
+    projection = CashflowCalculator.project(request)
+
+    records = [json.loads(line) for chunk in CashflowCalculator.stream_projection(request) for line in chunk.splitlines()]
+    assert len(records) == 801
+    assert [record["ending_cash"] for record in records[:-1]] == projection.ending_cash
+    assert records[-1]["type"] == "summary"
+    assert records[-1]["runway_months"] == projection.summary.runway_months
+
+def test_projection_endpoint_rejects_unknown_category():
+    """Prueba que el endpoint rechace categorías y frecuencias no válidas"""
+    app = FastAPI()
+    app.include_router(cashflow.router)
+    client = TestClient(app)
+
+    body = {"base": _cashflow_input().model_dump(), "periods": 6}
+    assert client.post("/cashflow/project", json=body).status_code == 200
+    assert client.post("/cashflow/project", json={**body, "growth_rates": {"otra": 0.1}}).status_code == 400
+    assert client.post("/cashflow/project/stream", json={**body, "frequency": "hourly"}).status_code == 400
+
+def test_ledger_aggregation_is_independent_of_chunk_size():
+    """Prueba que la agregación por bloques no dependa del tamaño del bloque"""
+    results = []
+    for chunk_rows in (1, 3, 1000):
+        aggregator = ledger.LedgerAggregator("monthly")
+        for dates, categories, amounts in ledger.iter_csv_chunks(io.BytesIO(LEDGER_CSV.encode()), "fecha", "concepto", "monto", chunk_rows):
+            aggregator.update(dates, categories, amounts)
+        labels, history = aggregator.table()
+        results.append((labels, history["revenue"].tolist(), history["payroll"].tolist(), aggregator.unmapped, aggregator.skipped))
+
+    assert results[0] == results[1] == results[2]
+    labels, revenue, payroll, unmapped, skipped = results[0]
+    assert labels == ["2024-01", "2024-02", "2024-03"]
+    assert revenue == [10000, 12000, 11000]
+    assert payroll == [5000, 5000, 0]
+    assert unmapped == {"Misterio": 7}
+    assert skipped == 1
+
+def test_ledger_counts_short_rows_as_skipped():
+    """Prueba que los renglones incompletos se cuenten como omitidos"""
+    csv_text = LEDGER_CSV + "2024-03-08,Ventas\n2024-03-09\n"
+    aggregator = ledger.LedgerAggregator("monthly")
+    for dates, categories, amounts in ledger.iter_csv_chunks(io.BytesIO(csv_text.encode()), "fecha", "concepto", "monto", 3):
+        aggregator.update(dates, categories, amounts)
+
+    assert aggregator.rows == 10
+    assert aggregator.skipped == 3
+    assert aggregator.table()[1]["revenue"].tolist() == [10000, 12000, 11000]
+
+def test_ledger_normalizes_negative_outflows():
+    """Prueba que los egresos guardados con signo negativo sigan siendo egresos"""
+    signed_csv = LEDGER_CSV.replace(",5000", ",-5000").replace(",3000", ",-3000").replace("Misterio,7", "Misterio,-7")
+    histories = {}
+    for csv_text, amount_sign in ((LEDGER_CSV, "auto"), (signed_csv, "auto"), (signed_csv, "negative"), (LEDGER_CSV, "positive")):
+        aggregator = ledger.LedgerAggregator("monthly", {"Misterio": "other_outflows"}, amount_sign)
+        for dates, categories, amounts in ledger.iter_csv_chunks(io.BytesIO(csv_text.encode()), "fecha", "concepto", "monto"):
+            aggregator.update(dates, categories, amounts)
+        assert aggregator.outflows_negative == (csv_text is signed_csv)
+        _, history = aggregator.table()
+        histories[(csv_text is signed_csv, amount_sign)] = {category: values.tolist() for category, values in history.items()}
+
+    expected = histories[(False, "auto")]
+    assert expected["payroll"] == [5000, 5000, 0]
+    assert expected["opex_fixed"] == [0, 0, 3000]
+    assert all(history == expected for history in histories.values())
+
+    # Con la convención equivocada forzada los egresos cambian de signo
+    forced = ledger.LedgerAggregator("monthly", amount_sign="positive")
+    for dates, categories, amounts in ledger.iter_csv_chunks(io.BytesIO(signed_csv.encode()), "fecha", "concepto", "monto"):
+        forced.update(dates, categories, amounts)
+    assert forced.table()[1]["payroll"].tolist() == [-5000, -5000, 0]
+
+def test_ledger_feeds_projection():
+    """Prueba que el promedio del libro alimente la proyección"""
+    options = LedgerIngestOptions(
+        date_column="fecha", category_column="concepto", amount_column="monto",
+        category_map={"Misterio": "other_outflows"}, starting_cash=20000, periods=6
+    )
+    chunks = ledger.iter_csv_chunks(io.BytesIO(LEDGER_CSV.encode()), "fecha", "concepto", "monto")
+    result = CashflowCalculator.ingest_ledger(chunks, options)
+
+    assert result.rows == 8
+    assert result.unmapped == {}
+    assert result.baseline["revenue"] == 11000
+    assert result.baseline["opex_fixed"] == 1000
+    net = 11000 - 1000 - 10000 / 3 - 7 / 3
+    assert result.projection.ending_cash[-1] == round(20000 + 6 * net, 2)
+
+def test_ledger_endpoint_reads_parquet():
+    """Prueba la ingesta de un libro en Parquet por el endpoint"""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table({
+        "date": pa.array(["2024-01-03", "2024-01-20", "2024-02-01"]).cast(pa.date32()),
+        "category": ["Ventas", "Renta", "Ventas"],
+        "amount": [100.0, 50.0, 300.0],
+    })
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+
+    app = FastAPI()
+    app.include_router(cashflow.router)
+    client = TestClient(app)
+    response = client.post(
+        "/cashflow/ingest",
+        files={"file": ("libro.parquet", buffer.getvalue())},
+        data={"options": json.dumps({"periods": 3})}
+    )
+    assert response.status_code == 200
+    assert response.json()["history"]["revenue"] == [100, 300]
+    assert response.json()["periods"] == ["2024-01", "2024-02"]
+
+    msgpack = pytest.importorskip("msgpack")
+    packed = client.post(
+        "/cashflow/ingest",
+        files={"file": ("libro.parquet", buffer.getvalue())},
+        data={"options": json.dumps({"periods": 3})},
+        headers={"accept": "application/msgpack"}
+    )
+    assert packed.headers["content-type"].startswith("application/msgpack")
+    assert msgpack.unpackb(packed.content)["history"]["revenue"] == [100, 300]
+
+    missing = client.post("/cashflow/ingest", files={"file": ("libro.csv", b"a,b\n1,2\n")})
+    assert missing.status_code == 400
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,335 @@
+import pytest
+import numpy as np
+import json
+import asyncio
+import itertools
+from app.routers.debt import DebtCalculator, Debt, DebtCalculationRequest, DebtSimulationRequest, DebtOptimizationRequest
+from fastapi.testclient import TestClient
+from app import main
+from app.routers import debt_bulk
+from app.routers.debt_bulk import calculate_bulk
+from app.services import debt_engine
+from app import responses
+
+def _sample_debts():
+    return [
+        Debt(id="card", name="Tarjeta", balance=5000, interest_rate=36, minimum_payment=250, type="credit_card"),
+        Debt(id="car", name="Auto", balance=15000, interest_rate=12, minimum_payment=400, type="car_loan"),
+        Debt(id="loan", name="Préstamo", balance=2000, interest_rate=20, minimum_payment=100, type="personal_loan"),
+    ]
+
+def test_avalanche_pays_highest_rate_first():
+    """Prueba que el método avalancha liquide primero la deuda con mayor tasa"""
+    debts = _sample_debts()
+    plan = DebtCalculator.calculate_avalanche_strategy(debts, 500, 30000)
+
+    payoff = {}
+    for payment in plan.payments:
+        if payment.is_paid_off:
+            payoff[payment.debt_id] = payment.month
+
+    assert payoff["card"] < payoff["car"]
+    assert plan.months_to_freedom == max(payoff.values())
+    assert plan.total_interest > 0
+
+def test_snowball_pays_smallest_balance_first():
+    """Prueba que el método bola de nieve liquide primero la deuda más pequeña"""
+    debts = _sample_debts()
+    plan = DebtCalculator.calculate_snowball_strategy(debts, 500, 30000)
+
+    first_paid = next(payment for payment in plan.payments if payment.is_paid_off)
+    assert first_paid.debt_id == "loan"
+
+def test_monthly_budget_is_respected():
+    """Prueba que ningún mes supere la suma de mínimos más el pago extra"""
+    debts = _sample_debts()
+    plan = DebtCalculator.calculate_snowball_strategy(debts, 500, 30000)
+
+    monthly_totals = {}
+    for payment in plan.payments:
+        monthly_totals[payment.month] = monthly_totals.get(payment.month, 0) + payment.payment
+
+    assert max(monthly_totals.values()) <= plan.monthly_payment + 0.05
+    assert plan.total_payments == pytest.approx(sum(monthly_totals.values()), abs=1)
+
+def test_custom_priorities_order():
+    """Prueba que la estrategia personalizada respete las prioridades"""
+    debts = _sample_debts()
+    plan = DebtCalculator.calculate_custom_strategy(debts, 500, 30000, {"car": 1, "card": 2, "loan": 3})
+
+    assert plan.strategy == "custom"
+    first_month = [payment for payment in plan.payments if payment.month == 1]
+    assert first_month[0].debt_id == "car"
+    assert first_month[0].payment == 900
+
+def test_minimum_below_interest_stops_at_limit():
+    """Prueba que un pago mínimo menor al interés no genere un bucle infinito"""
+    debts = [Debt(id="a", name="A", balance=10000, interest_rate=60, minimum_payment=100, type="other")]
+    plan = DebtCalculator.calculate_avalanche_strategy(debts, 0, 10000)
+
+    assert plan.months_to_freedom == 600
+    assert plan.payments[-1].remaining_balance == 10000
+
+def test_columnar_plan_matches_row_plan():
+    """Prueba que el formato columnar contenga las mismas filas que el plan normal"""
+    debts = _sample_debts()
+    plan = DebtCalculator.calculate_avalanche_strategy(debts, 500, 30000)
+    columnar = DebtCalculator.calculate_columnar_plan(debts, 500, 30000, "avalanche")
+
+    assert columnar.months_to_freedom == plan.months_to_freedom
+    assert columnar.total_interest == plan.total_interest
+    assert [debt.id for debt in columnar.debts] == ["card", "car", "loan"]
+    assert len(columnar.schedule.month) == len(plan.payments)
+
+    last = plan.payments[-1]
+    assert columnar.schedule.month[-1] == last.month
+    assert columnar.debts[columnar.schedule.debt_index[-1]].id == last.debt_id
+    assert columnar.schedule.payment[-1] == last.payment
+    assert columnar.schedule.remaining_balance[-1] == 0
+
+def test_summary_and_monthly_detail_levels():
+    """Prueba que los niveles de detalle mantengan los mismos totales"""
+    debts = _sample_debts()
+    full = DebtCalculator.calculate_snowball_strategy(debts, 500, 30000)
+    summary = DebtCalculator.calculate_snowball_strategy(debts, 500, 30000, detail="summary")
+    monthly = DebtCalculator.calculate_snowball_strategy(debts, 500, 30000, detail="monthly")
+
+    assert summary.payments == []
+    assert summary.monthly_totals is None
+    assert summary.total_interest == full.total_interest
+    assert summary.months_to_freedom == full.months_to_freedom
+
+    assert monthly.payments == []
+    assert len(monthly.monthly_totals) == full.months_to_freedom
+    assert monthly.monthly_totals[0].active_debts == 3
+    assert monthly.monthly_totals[-1].remaining_balance == 0
+    assert sum(row.interest for row in monthly.monthly_totals) == pytest.approx(full.total_interest, abs=1)
+
+def test_compare_strategies():
+    """Prueba la comparación de estrategias contra el escenario de solo mínimos"""
+    debts = _sample_debts()
+    comparison = DebtCalculator.compare_strategies(debts, 500, 30000, detail="summary")
+
+    assert set(comparison.plans) == {"avalanche", "snowball"}
+    assert comparison.analysis.total_debt == 22000
+    assert comparison.baseline.paid_off
+    assert comparison.cheapest_strategy == "avalanche"
+
+    avalanche = comparison.plans["avalanche"]
+    assert avalanche.total_interest == DebtCalculator.calculate_avalanche_strategy(debts, 500, 30000).total_interest
+    assert avalanche.savings == pytest.approx(comparison.baseline.total_interest - avalanche.total_interest, abs=0.02)
+    assert comparison.baseline.months_to_freedom > avalanche.months_to_freedom
+
+def test_compare_baseline_paid_off_with_zero_balance_debt():
+    """Prueba que una deuda que empieza en cero no impida marcar el escenario base como liquidado"""
+    debts = _sample_debts() + [Debt(id="done", name="Pagada", balance=0, interest_rate=10, minimum_payment=0, type="other")]
+    comparison = DebtCalculator.compare_strategies(debts, 500, 30000, detail="summary")
+    assert comparison.baseline.paid_off
+
+    stuck = [Debt(id="stuck", name="Sin fin", balance=50000, interest_rate=30, minimum_payment=10, type="credit_card")]
+    assert not DebtCalculator.compare_strategies(stuck, 0, 30000, detail="summary").baseline.paid_off
+
+def test_custom_plan_uses_debt_priorities_like_compare():
+    """Prueba que el plan custom y la comparación usen el mismo orden con prioridades de cada deuda"""
+    debts = [debt.model_copy(update={"priority": priority}) for debt, priority in zip(_sample_debts(), (3, 1, 2))]
+    plan = DebtCalculator.calculate_plan(DebtCalculationRequest(debts=debts, monthly_income=30000, extra_payment=500, strategy="custom", detail="summary"))
+    comparison = DebtCalculator.compare_strategies(debts, 500, 30000, detail="summary")
+
+    assert plan.total_interest == comparison.plans["custom"].total_interest
+    assert plan.months_to_freedom == comparison.plans["custom"].months_to_freedom
+    assert plan.total_interest != comparison.plans["avalanche"].total_interest
+
+def test_compare_includes_custom_with_priorities():
+    """Prueba que la comparación incluya la estrategia personalizada si hay prioridades"""
+    debts = _sample_debts()
+    comparison = DebtCalculator.compare_strategies(debts, 500, 30000, {"car": 1, "card": 2, "loan": 3}, detail="summary")
+
+    assert "custom" in comparison.plans
+
+def test_event_driven_summary_matches_monthly_steps():
+    """Prueba que el salto entre liquidaciones coincida con la simulación mes a mes"""
+    balances = np.array([250000, 1200, 800, 15000, 3000])
+    rates = np.array([9.5, 42, 0, 14, 28])
+    minimums = np.array([2200, 60, 40, 350, 90])
+    order = debt_engine.order_by_smallest_balance(balances, rates, None)
+
+    stepped = debt_engine.simulate(balances, rates, minimums, 300, order, detail="full")
+    jumped = debt_engine.simulate(balances, rates, minimums, 300, order, detail="summary")
+
+    assert jumped.months == stepped.months
+    assert list(jumped.payoff_month) == list(stepped.payoff_month)
+    assert jumped.total_interest == pytest.approx(stepped.total_interest, abs=0.01)
+    assert jumped.total_payments == pytest.approx(stepped.total_payments, abs=0.01)
+
+def test_bulk_calculation_reports_each_household():
+    """Prueba el cálculo masivo con un hogar inválido en el lote"""
+    debts = [debt.model_dump() for debt in _sample_debts()]
+    payloads = [
+        {"debts": debts, "monthly_income": 30000, "extra_payment": extra, "detail": "summary"}
+        for extra in (0, 250, 500)
+    ]
+    payloads.append({"debts": [], "monthly_income": 30000})
+
+    results = sorted(calculate_bulk(payloads, max_workers=2, chunk_size=2), key=lambda result: result[0])
+
+    assert [index for index, _, _ in results] == [0, 1, 2, 3]
+    assert results[2][1].total_interest == DebtCalculator.calculate_avalanche_strategy(_sample_debts(), 500, 30000).total_interest
+    assert results[0][1].months_to_freedom > results[2][1].months_to_freedom
+    assert results[3][1] is None
+    assert "sin deudas" in results[3][2]
+
+def test_bulk_endpoint_streams_request_body():
+    """Prueba que el endpoint masivo lea NDJSON y arreglos JSON por partes"""
+    debts = [debt.model_dump() for debt in _sample_debts()]
+    households = [{"debts": debts, "monthly_income": 30000, "extra_payment": extra, "detail": "summary"} for extra in (0, 500)]
+
+    with TestClient(main.app) as client:
+        ndjson = "\n".join(json.dumps(household) for household in households) + "\n{no es json\n"
+        response = client.post("/debt/calculate-bulk", content=ndjson, headers={"content-type": "application/x-ndjson"})
+        lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+        assert [line["index"] for line in lines] == [0, 1, 2]
+        assert lines[1]["plan"]["months_to_freedom"] < lines[0]["plan"]["months_to_freedom"]
+        assert "JSON inválido" in lines[2]["error"]
+
+        # El arreglo llega en pedazos que cortan los objetos y caracteres multibyte
+        body = json.dumps(households + [{"debts": [], "monthly_income": 30000, "nota": "añadido"}], ensure_ascii=False).encode("utf-8")
+        pieces = (body[start:start + 7] for start in range(0, len(body), 7))
+        response = client.post("/debt/calculate-bulk?chunk_size=1", content=pieces)
+        lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+        assert [line["index"] for line in lines] == [0, 1, 2]
+        assert "sin deudas" in lines[2]["error"]
+
+        assert client.post("/debt/calculate-bulk", content=b'{"debts": []}').status_code == 400
+        assert debt_bulk._executor is not None
+    # El lifespan de la aplicación cierra el pool
+    assert debt_bulk._executor is None
+
+def test_bulk_json_array_parser_handles_any_chunking():
+    """Prueba que el lector incremental coincida con json.loads sin importar dónde se corte el cuerpo"""
+    data = [{"nota": "x}]\"\\\\[{", "ñ": [1, 2.5e3, {"b": None}]}, 3, "a,]", True, None, [], {}, -1.25]
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    async def collect(size):
+        async def pieces():
+            for start in range(0, len(body), size):
+                yield body[start:start + size]
+        payloads = await debt_bulk._iter_payloads(pieces(), "application/json")
+        return [payload async for _, payload in payloads]
+
+    for size in (1, 2, 3, 5, 8, 13, len(body)):
+        assert asyncio.run(collect(size)) == data
+
+def test_rate_shock_simulation_is_reproducible():
+    """Prueba que la simulación Monte Carlo sea reproducible con semilla"""
+    request = DebtSimulationRequest(
+        debts=_sample_debts(), monthly_income=30000, extra_payment=500,
+        paths=500, seed=42, rate_volatility=3, income_volatility=0.02
+    )
+    first = DebtCalculator.simulate_rate_shocks(request)
+    second = DebtCalculator.simulate_rate_shocks(request)
+
+    assert first == second
+    assert first.months_to_freedom.p5 <= first.months_to_freedom.p50 <= first.months_to_freedom.p95
+    assert first.total_interest.p5 < first.total_interest.p95
+    assert first.probability_debt_free == 1
+
+def test_rate_shock_simulation_without_shocks_matches_plan():
+    """Prueba que sin choques todas las trayectorias coincidan con el plan determinista"""
+    request = DebtSimulationRequest(
+        debts=_sample_debts(), monthly_income=30000, extra_payment=500,
+        paths=10, seed=1, rate_volatility=0, income_volatility=0
+    )
+    result = DebtCalculator.simulate_rate_shocks(request)
+
+    assert result.months_to_freedom.p5 == result.months_to_freedom.p95 == result.deterministic_months
+    assert result.total_interest.p50 == pytest.approx(result.deterministic_interest, abs=0.01)
+
+def test_optimizer_beats_or_matches_fixed_strategies():
+    """Prueba que el orden optimizado no pague más intereses que avalancha o bola de nieve"""
+    debts = _sample_debts()
+    result = DebtCalculator.optimize(DebtOptimizationRequest(debts=debts, monthly_income=30000, extra_payment=500))
+    avalanche = DebtCalculator.calculate_avalanche_strategy(debts, 500, 30000, detail="summary")
+    snowball = DebtCalculator.calculate_snowball_strategy(debts, 500, 30000, detail="summary")
+
+    assert result.total_interest <= min(avalanche.total_interest, snowball.total_interest)
+    assert sorted(result.order) == ["car", "card", "loan"]
+    assert sorted(result.priorities.values()) == [1, 2, 3]
+
+    custom = DebtCalculator.calculate_custom_strategy(debts, 500, 30000, result.priorities, detail="summary")
+    assert custom.total_interest == result.total_interest
+
+def test_optimizer_is_exhaustive_for_few_debts():
+    """Prueba que con pocas deudas el orden coincida con el mejor por fuerza bruta"""
+    rng = np.random.default_rng(11)
+    n = debt_engine.EXHAUSTIVE_MAX_DEBTS
+    balances = rng.uniform(1000, 20000, n).round(2)
+    rates = rng.uniform(0.05, 0.40, n) / 12
+    minimums = (balances * 0.03).round(2)
+
+    for objective in debt_engine.OBJECTIVES:
+        order, result, evaluated, exhaustive = debt_engine.optimize_order(balances, rates, minimums, 300, objective)
+        best = min(
+            debt_engine._objective_key(debt_engine.simulate(balances, rates, minimums, 300, np.array(order), detail="summary"), objective)
+            for order in itertools.permutations(range(n))
+        )
+        assert exhaustive
+        assert evaluated == len(list(itertools.permutations(range(n))))
+        assert debt_engine._objective_key(result, objective) == best
+
+    # Con más deudas se usa búsqueda local y se indica en el resultado
+    more = np.concatenate([balances, [3000.0]])
+    _, _, _, exhaustive = debt_engine.optimize_order(
+        more, np.append(rates, 0.01), np.append(minimums, 90.0), 300
+    )
+    assert not exhaustive
+
+def test_required_extra_payment_for_target():
+    """Prueba que el pago extra mínimo cumpla exactamente el plazo objetivo"""
+    debts = _sample_debts()
+    result = DebtCalculator.optimize(DebtOptimizationRequest(
+        debts=debts, monthly_income=30000, objective="months", target_months=18
+    ))
+    extra = result.required_extra_payment
+
+    on_time = DebtCalculator.calculate_custom_strategy(debts, extra, 30000, result.priorities, detail="summary")
+    late = DebtCalculator.calculate_custom_strategy(debts, extra - 0.05, 30000, result.priorities, detail="summary")
+    assert on_time.months_to_freedom <= 18
+    assert late.months_to_freedom > 18
+
+def test_streamed_plan_matches_materialized_plan():
+    """Prueba que el plan transmitido por NDJSON coincida con el plan completo"""
+    debts = _sample_debts()
+    request = DebtCalculationRequest(debts=debts, monthly_income=30000, extra_payment=500, strategy="avalanche")
+    plan = DebtCalculator.calculate_plan(request)
+
+    records = [json.loads(line) for chunk in DebtCalculator.stream_plan(request) for line in chunk.splitlines()]
+    payments = [record for record in records if record["type"] == "payment"]
+    summary = records[-1]
+
+    assert summary["type"] == "summary"
+    assert summary["total_interest"] == plan.total_interest
+    assert summary["months_to_freedom"] == plan.months_to_freedom
+    assert summary["savings"] == plan.savings
+    assert len(payments) == len(plan.payments)
+    assert payments[-1]["remaining_balance"] == plan.payments[-1].remaining_balance
+
+    monthly = DebtCalculationRequest(debts=debts, monthly_income=30000, extra_payment=500, detail="monthly")
+    records = [json.loads(line) for chunk in DebtCalculator.stream_plan(monthly) for line in chunk.splitlines()]
+    assert len(records) == plan.months_to_freedom + 1
+    assert all(record["type"] == "monthly_total" for record in records[:-1])
+
+def test_encode_response_json_and_msgpack_fallback(monkeypatch):
+    """Prueba que la respuesta rápida sea el mismo JSON y que sin msgpack se responda JSON"""
+    plan = DebtCalculator.calculate_avalanche_strategy(_sample_debts(), 500, 30000)
+    response = responses.encode_response(plan)
+    assert response.media_type == "application/json"
+    assert response.body == plan.model_dump_json().encode("utf-8")
+
+    class _Request:
+        headers = {"accept": "application/msgpack"}
+
+    monkeypatch.setattr(responses, "msgpack", None)
+    assert responses.encode_response(plan, _Request()).media_type == "application/json"
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,197 @@
+import pytest
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import loans
+from app.routers.loans import LoanCalculator, LoanComparisonRequest
+from app.services import loan_engine, loan_index
+
+def _offer(loan_id, amount=100000, annual_rate=0.12, term_months=36, fee_pct=0.0, fee_flat=0.0, extra=0.0):
+    return {
+        "id": loan_id,
+        "name": f"Préstamo {loan_id}",
+        "amount": amount,
+        "annual_rate": annual_rate,
+        "term_months": term_months,
+        "origination_fee_pct": fee_pct,
+        "origination_fee_flat": fee_flat,
+        "extra_monthly_payment": extra,
+    }
+
+def _simulate(amount, annual_rate, payment):
+    """Amortización mes a mes como la del cliente"""
+    r = annual_rate / 12
+    balance, months, total = amount, 0, 0.0
+    while balance > 0.01:
+        months += 1
+        interest = r * balance
+        paid = min(payment, balance + interest)
+        balance -= paid - interest
+        total += paid
+    return months, total
+
+def test_closed_form_payoff_matches_simulation():
+    """Prueba que el mes de liquidación y el total pagado coinciden con la amortización iterativa"""
+    for amount, rate, term, extra in [(100000, 0.12, 36, 0), (100000, 0.12, 36, 750), (25000, 0.0, 24, 300), (350000, 0.095, 240, 1500)]:
+        payment = float(loan_engine.monthly_payment(amount, rate, term))
+        result = loan_engine.payoff(amount, rate, payment + extra)
+        months, total = _simulate(amount, rate, payment + extra)
+        assert result["months"] == months
+        assert result["total_paid"] == pytest.approx(total, abs=0.02)
+
+        schedule = loan_engine.schedule(amount, rate, payment + extra)
+        assert len(schedule["month"]) == months
+        assert schedule["payment"].sum() == pytest.approx(result["total_paid"])
+        assert schedule["balance"][-1] == 0
+
+def test_apr_includes_fees():
+    """Prueba que la APR es la tasa nominal sin comisiones y mayor con comisiones"""
+    apr = loan_engine.apr([100000, 100000], [0.12, 0.12], [36, 36], [0, 3000])
+    assert apr[0] == pytest.approx(0.12, abs=1e-10)
+    assert apr[1] > 0.12
+
+    # La cuota descontada a la APR reproduce el monto neto recibido
+    payment = float(loan_engine.monthly_payment(100000, 0.12, 36))
+    monthly = apr[1] / 12
+    assert payment * (1 - (1 + monthly) ** -36) / monthly == pytest.approx(97000)
+
+def test_comparison_picks_best_offers():
+    """Prueba la selección de mejores ofertas y que el calendario solo se construye si se pide"""
+    request = LoanComparisonRequest(
+        loans=[
+            _offer("a", annual_rate=0.10, term_months=60, fee_pct=0.03),
+            _offer("b", annual_rate=0.14, term_months=24),
+            _offer("c", annual_rate=0.11, term_months=36, fee_flat=500, extra=1000),
+        ],
+        user={"monthly_income": 12000, "other_monthly_debt": 500}
+    )
+    result = LoanCalculator.compare(request)
+
+    assert result.best_by_lowest_payment == "a"
+    assert result.best_by_fastest_payoff == min(result.loans, key=lambda loan: loan.payoff_months_with_extra).id
+    assert result.best_by_total_cost == min(result.loans, key=lambda loan: loan.total_cost).id
+    assert result.loans[2].payoff_months_with_extra < result.loans[2].payoff_months
+    assert result.loans[2].interest_saved > 0
+    assert result.selected_schedule == []
+    assert any("DTI" in recommendation for recommendation in result.recommendations)
+
+    with_schedule = LoanCalculator.compare(request.model_copy(update={"schedule": "c"}))
+    assert with_schedule.schedule_loan_id == "c"
+    assert len(with_schedule.selected_schedule) == result.loans[2].payoff_months_with_extra
+
+def test_compare_endpoint_handles_many_offers():
+    """Prueba el endpoint con cientos de ofertas y un calendario desconocido"""
+    app = FastAPI()
+    app.include_router(loans.router)
+    client = TestClient(app)
+
+    rng = np.random.default_rng(11)
+    offers = [
+        _offer(str(i), amount=float(rng.uniform(5000, 500000)), annual_rate=float(rng.uniform(0, 0.4)),
+               term_months=int(rng.integers(6, 361)), fee_pct=float(rng.uniform(0, 0.05)), extra=float(rng.uniform(0, 500)))
+        for i in range(500)
+    ]
+    response = client.post("/loans/compare", json={"loans": offers, "schedule": "best"})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["loans"]) == 500
+    assert data["schedule_loan_id"] == data["best_by_total_cost"]
+    assert all(loan["apr"] >= loan_input["annual_rate"] * 100 - 1e-6 for loan, loan_input in zip(data["loans"], offers))
+
+    missing = client.post("/loans/compare", json={"loans": offers[:2], "schedule": "zzz"})
+    assert missing.status_code == 400
+
+def test_compare_rejects_fees_that_consume_the_amount():
+    """Prueba que una oferta cuyas comisiones consumen el monto no se reporte como la mejor APR"""
+    app = FastAPI()
+    app.include_router(loans.router)
+    client = TestClient(app)
+
+    normal = _offer("normal", fee_pct=0.02)
+    flat = _offer("fija", amount=10000, fee_flat=12000)
+    response = client.post("/loans/compare", json={"loans": [normal, flat]})
+    assert response.status_code == 400
+    assert "fija" in response.json()["detail"]
+
+    response = client.post("/loans/compare", json={"loans": [normal, _offer("total", fee_pct=1)]})
+    assert response.status_code == 422
+
+    response = client.post("/loans/compare", json={"loans": [normal, _offer("otra", fee_pct=0.01)]})
+    assert response.status_code == 200
+    data = response.json()
+    assert all(loan["apr"] is not None for loan in data["loans"])
+    assert data["best_by_apr"] == "otra"
+
+def _catalogue(count, seed=5):
+    rng = np.random.default_rng(seed)
+    return {
+        "id": [f"P{i}" for i in range(count)],
+        "annual_rate": rng.uniform(0.0, 0.45, count).round(4).tolist(),
+        "term_months": rng.choice([12, 24, 36, 48, 60, 120, 240], count).tolist(),
+        "origination_fee_pct": rng.uniform(0, 0.05, count).round(4).tolist(),
+        "origination_fee_flat": np.where(rng.random(count) < 0.3, rng.uniform(100, 2000, count), 0).round(2).tolist(),
+        "min_amount": rng.choice([0, 50000], count).tolist(),
+    }
+
+def test_index_search_matches_brute_force():
+    """Prueba que el top-k del índice coincide con evaluar cada producto por separado"""
+    catalogue = _catalogue(2000)
+    index = loan_index.LoanIndex(catalogue)
+    filters = loan_index.SearchFilters(max_dti=0.35, max_apr=0.30)
+    found, matched = index.search(40000, 15000, 1200, "apr", 15, filters)
+
+    fees = 40000 * np.array(catalogue["origination_fee_pct"]) + np.array(catalogue["origination_fee_flat"])
+    apr = loan_engine.apr(40000, catalogue["annual_rate"], catalogue["term_months"], fees)
+    payment = loan_engine.monthly_payment(40000, catalogue["annual_rate"], catalogue["term_months"])
+    eligible = (np.array(catalogue["min_amount"]) <= 40000) & ((payment + 1200) / 15000 <= 0.35) & (apr <= 0.30)
+    expected = np.flatnonzero(eligible)[np.argsort(apr[eligible], kind="stable")][:15]
+
+    assert matched == int(eligible.sum())
+    assert found["position"].tolist() == expected.tolist()
+    assert np.allclose(found["apr"], apr[expected])
+
+def test_index_search_breaks_ties_by_position():
+    """Prueba que los empates en el límite del top-k se resuelvan por posición en el catálogo"""
+    # Solo tres tasas distintas: muchos productos empatan con el k-ésimo valor
+    count = 500
+    rng = np.random.default_rng(3)
+    index = loan_index.LoanIndex({
+        "id": [f"P{i}" for i in range(count)],
+        "annual_rate": rng.choice([0.10, 0.12, 0.15], count).tolist(),
+        "term_months": [36] * count,
+    })
+    for descending in (False, True):
+        found, _ = index.search(50000, 30000, 0, "monthly_payment", 25, descending=descending)
+        payment = index.evaluate(50000, 30000, 0)["monthly_payment"]
+        key = -payment if descending else payment
+        expected = np.lexsort((np.arange(count), key))[:25]
+        assert found["position"].tolist() == expected.tolist()
+
+def test_search_endpoint_over_large_catalogue():
+    """Prueba la carga del catálogo y la búsqueda por endpoint"""
+    app = FastAPI()
+    app.include_router(loans.router)
+    client = TestClient(app)
+
+    loaded = client.put("/loans/catalogue", json=_catalogue(100_000))
+    assert loaded.status_code == 200
+    assert loaded.json()["count"] == 100_000
+
+    response = client.post("/loans/search", json={
+        "amount": 80000, "monthly_income": 20000, "other_monthly_debt": 2000,
+        "metric": "monthly_payment", "k": 5, "max_dti": 0.4, "min_term_months": 36
+    })
+    assert response.status_code == 200
+    data = response.json()
+    payments = [hit["monthly_payment"] for hit in data["results"]]
+    assert payments == sorted(payments)
+    assert all(hit["term_months"] >= 36 and hit["dti"] <= 0.4 for hit in data["results"])
+    assert all(hit["apr"] >= hit["annual_rate"] * 100 - 1e-6 for hit in data["results"])
+
+    invalid = client.post("/loans/search", json={"amount": 80000, "monthly_income": 20000, "metric": "rate"})
+    assert invalid.status_code == 400
+    duplicated = client.put("/loans/catalogue", json={"id": ["a", "a"], "annual_rate": [0.1, 0.2], "term_months": [12, 12]})
+    assert duplicated.status_code == 400
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,159 @@
+import pytest
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import pricing
+from app.routers.pricing import PricingCalculator, PricingInput
+from app.services import price_stats
+
+def _pricing_input(**overrides):
+    data = {
+        "product_name": "Taza artesanal",
+        "cost_materials": 40,
+        "cost_labor": 30,
+        "cost_overhead": 10,
+        "desired_profit_margin": 20,
+    }
+    data.update(overrides)
+    return PricingInput(**data)
+
+def _client():
+    app = FastAPI()
+    app.include_router(pricing.router)
+    return TestClient(app)
+
+def test_pricing_calculation_matches_client_contract():
+    """Prueba el precio recomendado y las estadísticas exactas con pocos precios"""
+    result = PricingCalculator.calculate(_pricing_input(competitor_prices=[120, 95, 0, 110, 100]))
+
+    assert result.recommended_price == 100
+    assert result.cost_breakdown.total_cost == 80
+    assert result.financial_projections.roi_percentage == pytest.approx(25)
+    analysis = result.competitive_analysis
+    prices = np.array([120, 95, 110, 100])
+    assert (analysis.min_price, analysis.max_price) == (95, 120)
+    assert analysis.avg_price == round(prices.mean(), 2)
+    assert analysis.median_price == round(float(np.median(prices)), 2)
+    assert analysis.std_deviation == round(prices.std(), 2)
+    assert analysis.exact
+    assert [s.name for s in result.pricing_strategies] == ["Conservadora", "Competitiva", "Premium"]
+
+def test_competition_messages_without_valid_prices():
+    """Prueba los mensajes sin datos o sin precios válidos"""
+    assert PricingCalculator.calculate(_pricing_input()).competitive_analysis.message == "No hay datos de competidores"
+    invalid = PricingCalculator.calculate(_pricing_input(competitor_prices=[0, -5]))
+    assert invalid.competitive_analysis.message == "No hay precios válidos de competidores"
+    assert [s.name for s in invalid.pricing_strategies] == ["Conservadora", "Premium"]
+
+def test_streaming_summary_is_mergeable_and_accurate():
+    """Prueba que los resúmenes por bloques coinciden con el cálculo sobre todos los precios"""
+    rng = np.random.default_rng(7)
+    prices = rng.lognormal(mean=4.5, sigma=0.6, size=200_000)
+
+    merged = price_stats.PriceSummary()
+    for block in np.array_split(prices, 7):
+        partial = price_stats.PriceSummary()
+        partial.update(block)
+        merged.merge(price_stats.PriceSummary.from_dict(partial.to_dict()))
+
+    assert merged.stats.count == len(prices)
+    assert merged.stats.mean == pytest.approx(prices.mean(), rel=1e-12)
+    assert merged.stats.std == pytest.approx(prices.std(), rel=1e-9)
+    assert not merged.sketch.exact
+    for q in (0.1, 0.5, 0.9):
+        exact = np.quantile(prices, q)
+        assert abs(merged.sketch.quantile(q) - exact) / exact <= 2 * price_stats.DEFAULT_RELATIVE_ACCURACY
+
+def test_stats_endpoint_reads_streamed_body_and_csv_upload():
+    """Prueba el endpoint de streaming y la carga de CSV, y que su resumen alimenta el cálculo"""
+    client = _client()
+    body = "\n".join(["100", "110,120", "abc", "0"]) + "\n90"
+    streamed = client.post("/pricing/competitors/stats", content=body.encode())
+    assert streamed.status_code == 200
+    data = streamed.json()
+    assert data["analysis"]["count"] == 4
+    assert data["analysis"]["median_price"] == 105
+    assert data["summary"]["skipped"] == 2
+
+    csv = b"sku,precio\nA,100\nB,110\nC,120\nD,90\n"
+    uploaded = client.post("/pricing/competitors/upload?column=precio", files={"file": ("precios.csv", csv)})
+    assert uploaded.json()["analysis"]["avg_price"] == data["analysis"]["avg_price"]
+
+    merged = client.post("/pricing/competitors/merge", json=[data["summary"], uploaded.json()["summary"]])
+    assert merged.json()["analysis"]["count"] == 8
+
+    result = client.post("/pricing/calculate", json={
+        **_pricing_input().model_dump(), "competitor_summary": data["summary"]
+    })
+    assert result.status_code == 200
+    assert result.json()["competitive_analysis"]["avg_price"] == 105
+
+    missing = client.post("/pricing/competitors/stats?column=precio", content=b"sku,costo\nA,1\n")
+    assert missing.status_code == 400
+    assert client.get("/pricing/strategies").status_code == 200
+
+def test_batch_pricing_matches_single_calculation():
+    """Prueba que el cálculo por lotes coincide con el cálculo individual"""
+    products = [(40, 30, 10, 20, [120, 95, 110, 100]), (5, 0, 1, 35, []), (100, 80, 20, 50, [0, 410])]
+    columns = {
+        "cost_materials": [p[0] for p in products],
+        "cost_labor": [p[1] for p in products],
+        "cost_overhead": [p[2] for p in products],
+        "desired_profit_margin": [p[3] for p in products],
+        "competitor_avg_price": [float(np.mean([x for x in p[4] if x > 0])) if any(x > 0 for x in p[4]) else None for p in products],
+    }
+    batch = PricingCalculator.calculate_many(columns)
+
+    for i, (materials, labor, overhead, margin, prices) in enumerate(products):
+        single = PricingCalculator.calculate(_pricing_input(
+            cost_materials=materials, cost_labor=labor, cost_overhead=overhead,
+            desired_profit_margin=margin, competitor_prices=prices
+        ))
+        strategies = {s.name: s.price for s in single.pricing_strategies}
+        assert batch["recommended_price"][i] == single.recommended_price
+        assert batch["profit_amount"][i] == pytest.approx(single.cost_breakdown.profit_amount)
+        assert batch["conservative_price"][i] == strategies["Conservadora"]
+        assert batch["premium_price"][i] == strategies["Premium"]
+        if "Competitiva" in strategies:
+            assert batch["competitive_price"][i] == strategies["Competitiva"]
+        else:
+            assert np.isnan(batch["competitive_price"][i])
+
+def test_batch_endpoint_json_and_parquet():
+    """Prueba el endpoint por lotes con respuesta JSON y Parquet"""
+    client = _client()
+    payload = {
+        "sku": ["A", "B"],
+        "cost_materials": [40, 5],
+        "cost_labor": [30, 0],
+        "cost_overhead": [10, 1],
+        "desired_profit_margin": [20, 35],
+        "competitor_avg_price": [105, None],
+    }
+    response = client.post("/pricing/calculate-batch", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert data["competitive_price"] == [105, None]
+    assert data["price_vs_market"][0] == round((100 - 105) / 105 * 100, 2)
+
+    invalid = client.post("/pricing/calculate-batch", json={**payload, "desired_profit_margin": [20, 100]})
+    assert invalid.status_code == 400
+
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    import io
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({key: value for key, value in payload.items()}), buffer)
+    parquet = client.post(
+        "/pricing/calculate-batch?format=parquet", content=buffer.getvalue(),
+        headers={"content-type": "application/vnd.apache.parquet"}
+    )
+    assert parquet.status_code == 200
+    table = pq.read_table(io.BytesIO(parquet.content)).to_pydict()
+    assert table["sku"] == ["A", "B"]
+    assert table["recommended_price"] == data["recommended_price"]
+    assert table["competitive_price"] == [105, None]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
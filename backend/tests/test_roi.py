@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import roi
+from app.routers.roi import ROICalculator, ROIInput, ROISensitivityAxis
+from app.services import roi_engine
+
+def _roi_input(initial_amount=25000, monthly_revenue_increase=4500, residual_value=5000, months=24):
+    return ROIInput(
+        investment={"initial_amount": initial_amount, "additional_costs": 2500, "investment_date": "2024-01-01"},
+        returns={"monthly_revenue_increase": monthly_revenue_increase, "monthly_cost_savings": 1200, "residual_value": residual_value},
+        parameters={"analysis_period_months": months, "discount_rate": 0.12, "inflation_rate": 0.04}
+    )
+
+def test_roi_calculation():
+    """Prueba las métricas básicas del ROI"""
+    result = ROICalculator.calculate(_roi_input())
+
+    total_investment = 27500
+    total_returns = 5700 * 24 + 5000
+    assert result.metrics.simple_roi == round((total_returns - total_investment) / total_investment * 100, 2)
+    assert result.metrics.payback_period_months == 5
+    assert result.metrics.break_even_month == 5
+    assert [scenario.name for scenario in result.scenarios] == ["Pesimista", "Realista", "Optimista"]
+    assert result.analysis.investment_grade == "Excelente"
+
+def test_npv_matches_monthly_discounting():
+    """Prueba que el VPN vectorizado coincida con el descuento mes a mes"""
+    result = ROICalculator.calculate(_roi_input())
+
+    rate = 0.12 / 12
+    expected = -27500 + sum((5700 + (5000 if month == 24 else 0)) / (1 + rate) ** month for month in range(1, 25))
+    assert result.metrics.npv == round(expected, 2)
+    assert len(result.timeline) == 25
+    assert result.timeline[-1].cumulative == round(5700 * 24 + 5000 - 27500, 2)
+    assert sum(point.npv for point in result.timeline) == pytest.approx(expected, abs=0.5)
+
+def test_irr_is_a_root_of_npv():
+    """Prueba que la TIR anule el VPN y que se devuelva None si no existe"""
+    flows = roi_engine.cash_flows([27500, 10000, 1000], [5700, 100, 0], [5000, 0, 0], [24, 12, 6])
+    rates = roi_engine.irr(flows)
+
+    assert abs(roi_engine.npv(flows[:1], rates[0])[0]) < 1e-6
+    assert -1 < rates[1] < 0
+    assert abs(roi_engine.npv(flows[1:2], rates[1])[0]) < 1e-6
+    assert np.isnan(rates[2])
+
+    # Raíces fuera de (IRR_LOWER, IRR_UPPER) no se reportan como el límite
+    extremes = roi_engine.irr(np.array([[-1e6, 1], [-1, 1e9], [-1, 1e5], [-1e3, 1]]))
+    assert np.isnan(extremes[0]) and np.isnan(extremes[1])
+    assert extremes[2] == pytest.approx(1e5 - 1)
+    assert extremes[3] == pytest.approx(-0.999)
+
+    result = ROICalculator.calculate(ROIInput(
+        investment={"initial_amount": 1000},
+        returns={},
+        parameters={"analysis_period_months": 6}
+    ))
+    assert result.metrics.irr is None
+    assert result.metrics.payback_period_months is None
+
+def test_batch_matches_single_calculation():
+    """Prueba que el cálculo por lote coincida con el cálculo individual"""
+    items = [_roi_input(), _roi_input(initial_amount=80000, months=12), _roi_input(residual_value=0, months=60)]
+    batch = ROICalculator.calculate_many(items)
+
+    assert [metrics for metrics in batch] == [ROICalculator.calculate(item).metrics for item in items]
+
+def test_sensitivity_grid_matches_single_calculations():
+    """Prueba que cada punto de la malla coincida con el cálculo individual"""
+    base = _roi_input()
+    axes = [
+        ROISensitivityAxis(field="analysis_period_months", start=6, stop=36, steps=3),
+        ROISensitivityAxis(field="discount_rate", start=0.05, stop=0.25, steps=2),
+        ROISensitivityAxis(field="monthly_returns", start=1000, stop=5000, steps=2),
+    ]
+    result = ROICalculator.sensitivity(base, axes)
+    assert result.shape == [3, 2, 2]
+
+    for i, months in enumerate(result.values[0]):
+        for j, rate in enumerate(result.values[1]):
+            for k, monthly in enumerate(result.values[2]):
+                single = ROICalculator.calculate(ROIInput(
+                    investment=base.investment,
+                    returns={"monthly_revenue_increase": monthly, "residual_value": base.returns.residual_value},
+                    parameters={"analysis_period_months": int(months), "discount_rate": rate}
+                )).metrics
+                assert result.npv[i][j][k] == single.npv
+                assert result.payback_months[i][j][k] == single.payback_period_months
+                assert result.irr[i][j][k] == pytest.approx(single.irr, abs=0.01)
+
+def test_tornado_is_sorted_by_impact():
+    """Prueba que el tornado ordene las variables por su impacto en el VPN"""
+    result = ROICalculator.sensitivity(_roi_input(), [])
+
+    swings = [bar.swing for bar in result.tornado]
+    assert swings == sorted(swings, reverse=True)
+    assert {bar.field for bar in result.tornado} == set(ROICalculator.SENSITIVITY_FIELDS)
+    assert result.base_npv == ROICalculator.calculate(_roi_input()).metrics.npv
+    investment = next(bar for bar in result.tornado if bar.field == "total_investment")
+    assert investment.npv_low > result.base_npv > investment.npv_high
+
+    with pytest.raises(ValueError):
+        ROICalculator.sensitivity(_roi_input(), [ROISensitivityAxis(field="analysis_period_months", start=0, stop=500, steps=3)])
+
+def test_roi_endpoint():
+    """Prueba el endpoint de ROI"""
+    app = FastAPI()
+    app.include_router(roi.router)
+    client = TestClient(app)
+
+    response = client.post("/roi/calculate", json=_roi_input().model_dump())
+    assert response.status_code == 200
+    assert response.json()["metrics"]["payback_period_months"] == 5
+
+    invalid = _roi_input().model_dump()
+    invalid["parameters"]["analysis_period_months"] = 0
+    assert client.post("/roi/calculate", json=invalid).status_code == 422
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,5 +1,10 @@
 import pytest
-from app.routers.tax import TaxCalculator, TaxInput
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import tax
+from app.routers.tax import TaxCalculator, TaxInput, TaxSweepAxis
+from app.services import tax_tables
 
 def test_individual_tax_calculation():
     """Prueba cálculo de impuestos para persona física"""
@@ -202,5 +207,186 @@ def test_invalid_taxpayer_type():
     result = TaxCalculator.calculate(input_data)
     assert result is not None
 
+def test_isr_bracket_lookup():
+    """Prueba el cálculo de ISR en distintos tramos de la tabla de personas físicas"""
+    # Tramo 16%: 10,723.55 + (150,000 - 133,536.08) * 16%
+    isr = TaxCalculator._calculate_isr(150000, "individual")
+    assert isr["isr_calculated"] == pytest.approx(10723.55 + (150000 - 133536.08) * 0.16, abs=0.01)
+
+    # Límite superior de un tramo y mínimo del siguiente dan el mismo impuesto
+    upper = TaxCalculator._calculate_isr(75984.55, "individual")["isr_calculated"]
+    lower = TaxCalculator._calculate_isr(75984.56, "individual")["isr_calculated"]
+    assert upper == pytest.approx(lower, abs=0.02)
+
+    # Ingresos por encima del último tramo
+    isr = TaxCalculator._calculate_isr(5000000, "individual")
+    assert isr["isr_calculated"] == pytest.approx(1414947.85 + (5000000 - 4511707.38) * 0.35, abs=0.01)
+
+def test_overlapping_table_is_rejected():
+    """Prueba que una tabla con tramos traslapados se rechace al compilarla"""
+    with pytest.raises(ValueError):
+        tax_tables.compile_table([
+            {"min": 0, "max": 12892.32, "rate": 0.0192, "fixed": 0},
+            {"min": 12892.33, "max": 10928.33, "rate": 0.0640, "fixed": 247.23}
+        ])
+
+def test_inconsistent_fixed_amount_is_rejected():
+    """Prueba que una cuota fija que no corresponde al acumulado se rechace"""
+    with pytest.raises(ValueError):
+        tax_tables.compile_table([
+            {"min": 0, "max": 1000, "rate": 0.10, "fixed": 0},
+            {"min": 1000.01, "max": None, "rate": 0.20, "fixed": 500}
+        ])
+
+def test_unknown_fiscal_year():
+    """Prueba que un ejercicio fiscal sin tablas produzca un error"""
+    input_data = TaxInput(
+        taxpayer_type="individual",
+        regime="simplified",
+        monthly_income=50000,
+        annual_income=600000,
+        fiscal_year=1990
+    )
+
+    with pytest.raises(ValueError):
+        TaxCalculator.calculate(input_data)
+
+def test_batch_matches_single_calculation():
+    """Prueba que el cálculo por lotes coincida con el cálculo individual"""
+    rows = [
+        dict(taxpayer_type="individual", regime="simplified", monthly_income=50000, annual_income=600000,
+             medical_expenses=10000, mortgage_interest=20000, vat_collected=8000, vat_paid=6000),
+        dict(taxpayer_type="business", regime="general", monthly_income=100000, annual_income=1200000,
+             business_expenses=200000, vat_collected=16000, vat_paid=12000),
+        dict(taxpayer_type="individual", regime="general", monthly_income=0, annual_income=0),
+        dict(taxpayer_type="invalid_type", regime="general", monthly_income=200000, annual_income=2400000,
+             business_expenses=500000, vat_collected=5000, vat_paid=8000)
+    ]
+    # Montos con centavos para cubrir casos de redondeo en el último decimal
+    rng = np.random.default_rng(11)
+    for _ in range(200):
+        monthly_income = round(float(rng.uniform(1000, 250000)), 2)
+        rows.append(dict(
+            taxpayer_type=str(rng.choice(["individual", "business"])), regime=str(rng.choice(["general", "simplified"])),
+            monthly_income=monthly_income, annual_income=monthly_income * 12,
+            medical_expenses=round(float(rng.uniform(0, 50000)), 2), donations=round(float(rng.uniform(0, 20000)), 2),
+            vat_collected=round(float(rng.uniform(0, 30000)), 2), vat_paid=round(float(rng.uniform(0, 30000)), 2)
+        ))
+    columns = {
+        field: [row.get(field, 0) for row in rows]
+        for field in ("taxpayer_type", "regime") + TaxCalculator.BATCH_NUMERIC_FIELDS
+    }
+
+    batch = TaxCalculator.calculate_many(columns)
+
+    for i, row in enumerate(rows):
+        single = TaxCalculator.calculate(TaxInput(**row))
+        assert batch["isr"][i] == single.isr["isr_calculated"]
+        assert batch["effective_rate"][i] == single.isr["effective_rate"]
+        assert batch["vat_to_pay"][i] == single.vat["vat_to_pay"]
+        assert batch["vat_to_refund"][i] == single.vat["vat_to_refund"]
+        assert batch["total_taxes"][i] == single.total_taxes
+        assert batch["net_income"][i] == single.net_income
+
+def test_batch_rejects_mismatched_columns():
+    """Prueba que el lote rechace columnas de distinto largo"""
+    with pytest.raises(ValueError):
+        TaxCalculator.calculate_many({
+            "taxpayer_type": ["individual", "individual"],
+            "regime": ["general", "general"],
+            "monthly_income": [1000]
+        })
+
+def test_sweep_grid_matches_single_calculation():
+    """Prueba que cada punto del barrido coincida con el cálculo individual"""
+    base = TaxInput(
+        taxpayer_type="individual",
+        regime="general",
+        monthly_income=50000,
+        annual_income=600000,
+        vat_collected=8000,
+        vat_paid=6000
+    )
+    axes = [
+        TaxSweepAxis(field="monthly_income", start=20000, stop=200000, steps=5),
+        TaxSweepAxis(field="medical_expenses", start=0, stop=100000, steps=4)
+    ]
+
+    result = TaxCalculator.sweep(base, axes)
+
+    assert result.shape == [5, 4]
+    assert len(result.total_taxes) == 5 and len(result.total_taxes[0]) == 4
+    income, medical = result.values[0][3], result.values[1][2]
+    single = TaxCalculator.calculate(base.model_copy(update={"monthly_income": income, "medical_expenses": medical}))
+    assert result.total_taxes[3][2] == pytest.approx(single.total_taxes, abs=0.01)
+    assert result.effective_rate[3][2] == pytest.approx(single.isr["effective_rate"], abs=0.01)
+
+def test_sweep_rejects_unknown_field():
+    """Prueba que el barrido rechace campos que no existen"""
+    base = TaxInput(taxpayer_type="individual", regime="general", monthly_income=50000, annual_income=600000)
+
+    with pytest.raises(ValueError):
+        TaxCalculator.sweep(base, [TaxSweepAxis(field="regime", start=0, stop=1, steps=2)])
+
+def test_deduction_savings_are_exact():
+    """Prueba que el ahorro por deducción coincida con recalcular el impuesto"""
+    input_data = TaxInput(
+        taxpayer_type="individual",
+        regime="general",
+        monthly_income=100000,
+        annual_income=1200000,
+        business_expenses=100000,
+        medical_expenses=5000
+    )
+
+    optimization = TaxCalculator.calculate(input_data).tax_optimization
+    medical = next(o for o in optimization["deduction_opportunities"] if o["category"] == "medical")
+
+    # El tope total (15% de 1,200,000) deja 75,000 de margen antes del límite médico
+    assert optimization["total_deduction_headroom"] == 75000
+    assert medical["additional_deductible"] == 75000
+    assert medical["binding_limit"] == "total"
+
+    more_medical = input_data.model_copy(update={"medical_expenses": 5000 + 75000})
+    before = TaxCalculator.calculate(input_data).isr["isr_calculated"]
+    after = TaxCalculator.calculate(more_medical).isr["isr_calculated"]
+    assert medical["tax_savings"] == pytest.approx(before - after, abs=0.01)
+    assert optimization["potential_savings"] == pytest.approx(before - after, abs=0.01)
+    assert optimization["marginal_rate"] == 30.0
+
+def test_no_savings_when_total_cap_binds():
+    """Prueba que no haya ahorro cuando el tope total de deducciones ya se alcanzó"""
+    input_data = TaxInput(
+        taxpayer_type="individual",
+        regime="general",
+        monthly_income=50000,
+        annual_income=600000,
+        business_expenses=200000
+    )
+
+    optimization = TaxCalculator.calculate(input_data).tax_optimization
+
+    assert optimization["potential_savings"] == 0
+    assert all(o["tax_savings"] == 0 for o in optimization["deduction_opportunities"])
+
+def test_reference_endpoints_support_etag_and_gzip():
+    """Prueba que los catálogos estáticos respondan 304 y gzip precomprimido"""
+    app = FastAPI()
+    app.include_router(tax.router)
+    client = TestClient(app)
+
+    response = client.get("/tax/regimes", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.json()["general"]["name"] == "Régimen General"
+    assert "max-age" in response.headers["cache-control"]
+
+    not_modified = client.get("/tax/regimes", headers={"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    compressed = client.get("/tax/deduction-limits", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.json()["medical"]["percentage"] == 0.15
+
 if __name__ == "__main__":
     pytest.main([__file__])